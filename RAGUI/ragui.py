@@ -2,6 +2,7 @@ import streamlit as st
 import requests
 import json
 import os
+import socket
 import threading
 import time
 import numpy as np
@@ -12,18 +13,47 @@ from typing import List, Tuple
 # Assuming you have already installed faiss-cpu: pip install faiss-cpu
 
 def query_ollama_stream(server_url, prompt, model, stop_event):
+    """Stream /api/generate chunks until done or stop_event is set.
+
+    Setting stop_event (or closing the generator) closes the HTTP stream right
+    away, also while waiting for the next line, so Ollama stops generating.
+    """
     url = f"{server_url}/api/generate"
     data = {
         "model": model,
         "prompt": prompt,
         "stream": True
     }
-    with requests.post(url, json=data, stream=True) as response:
+    response = requests.post(url, json=data, stream=True, timeout=(10, None))
+    finished = threading.Event()
+
+    def close_on_stop():
+        while not finished.is_set():
+            if stop_event.wait(0.1):
+                # shutdown() wakes up a read blocked in the streaming thread
+                sock = getattr(getattr(response.raw, 'connection', None), 'sock', None)
+                if sock is not None:
+                    try:
+                        sock.shutdown(socket.SHUT_RDWR)
+                    except OSError:
+                        pass
+                response.close()
+                return
+
+    threading.Thread(target=close_on_stop, daemon=True).start()
+    try:
         for line in response.iter_lines():
             if stop_event.is_set():
                 break
             if line:
                 yield json.loads(line)
+    except Exception:
+        # Reading a stream closed by close_on_stop fails; that is the stop
+        if not stop_event.is_set():
+            raise
+    finally:
+        finished.set()
+        response.close()
 
 def get_available_models(server_url):
     try:
@@ -165,18 +195,23 @@ def main():
             full_prompt = f"Context:\n{context}\n\nUser Query: {prompt}\n\nAssistant:"
 
             with st.spinner("Generating response..."):
-                for i, chunk in enumerate(query_ollama_stream(server_url, full_prompt, selected_model, stop_event)):
-                    if stop_clicked:
-                        stop_event.set()
-                        break
-                    chunk_text = chunk.get('response', '')
-                    full_response += chunk_text
-                    response_placeholder.markdown(full_response)
+                stream = query_ollama_stream(server_url, full_prompt, selected_model, stop_event)
+                try:
+                    for i, chunk in enumerate(stream):
+                        if stop_clicked:
+                            stop_event.set()
+                            break
+                        chunk_text = chunk.get('response', '')
+                        full_response += chunk_text
+                        response_placeholder.markdown(full_response)
                     
-                    stop_clicked = stop_button_placeholder.button("Stop Generation", key=f"stop_{i}")
+                        stop_clicked = stop_button_placeholder.button("Stop Generation", key=f"stop_{i}")
                     
-                    time.sleep(0.1)
-            
+                        time.sleep(0.1)
+                finally:
+                    # Also runs when Streamlit reruns the script on the Stop click
+                    stream.close()
+
             stop_button_placeholder.empty()
             if stop_event.is_set():
                 full_response += "\n\n[Generation stopped by user]"
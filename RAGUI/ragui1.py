@@ -2,22 +2,52 @@ import streamlit as st
 import requests
 import json
 import os
+import socket
 import threading
 import time
 
 def query_ollama_stream(server_url, prompt, model, stop_event):
+    """Stream /api/generate chunks until done or stop_event is set.
+
+    Setting stop_event (or closing the generator) closes the HTTP stream right
+    away, also while waiting for the next line, so Ollama stops generating.
+    """
     url = f"{server_url}/api/generate"
     data = {
         "model": model,
         "prompt": prompt,
         "stream": True
     }
-    with requests.post(url, json=data, stream=True) as response:
+    response = requests.post(url, json=data, stream=True, timeout=(10, None))
+    finished = threading.Event()
+
+    def close_on_stop():
+        while not finished.is_set():
+            if stop_event.wait(0.1):
+                # shutdown() wakes up a read blocked in the streaming thread
+                sock = getattr(getattr(response.raw, 'connection', None), 'sock', None)
+                if sock is not None:
+                    try:
+                        sock.shutdown(socket.SHUT_RDWR)
+                    except OSError:
+                        pass
+                response.close()
+                return
+
+    threading.Thread(target=close_on_stop, daemon=True).start()
+    try:
         for line in response.iter_lines():
             if stop_event.is_set():
                 break
             if line:
                 yield json.loads(line)
+    except Exception:
+        # Reading a stream closed by close_on_stop fails; that is the stop
+        if not stop_event.is_set():
+            raise
+    finally:
+        finished.set()
+        response.close()
 
 def get_available_models(server_url):
     try:
@@ -84,20 +114,25 @@ def main():
             stop_clicked = False
 
             with st.spinner("Generating response..."):
-                for i, chunk in enumerate(query_ollama_stream(server_url, prompt, selected_model, stop_event)):
-                    if stop_clicked:
-                        stop_event.set()
-                        break
-                    chunk_text = chunk.get('response', '')
-                    full_response += chunk_text
-                    response_placeholder.markdown(full_response)
+                stream = query_ollama_stream(server_url, prompt, selected_model, stop_event)
+                try:
+                    for i, chunk in enumerate(stream):
+                        if stop_clicked:
+                            stop_event.set()
+                            break
+                        chunk_text = chunk.get('response', '')
+                        full_response += chunk_text
+                        response_placeholder.markdown(full_response)
                     
-                    # Update stop button with a unique key
-                    stop_clicked = stop_button_placeholder.button("Stop Generation", key=f"stop_{i}")
+                        # Update stop button with a unique key
+                        stop_clicked = stop_button_placeholder.button("Stop Generation", key=f"stop_{i}")
                     
-                    # Add a small delay to prevent too frequent updates
-                    time.sleep(0.1)
-            
+                        # Add a small delay to prevent too frequent updates
+                        time.sleep(0.1)
+                finally:
+                    # Also runs when Streamlit reruns the script on the Stop click
+                    stream.close()
+
             stop_button_placeholder.empty()
             if stop_event.is_set():
                 full_response += "\n\n[Generation stopped by user]"
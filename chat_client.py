@@ -0,0 +1,270 @@
+"""
+Shared async client for the interactive chat scripts.
+
+Every chat CLI (lmstudio.py, ollama_openai.py, hf_infer.py, uberlama.py,
+client_molodetz.py, tu_test.py, groqinfer3.py) talks to its server through
+this module instead of building its own client per script or per turn:
+
+- one pooled keep-alive connection pool per process (proxy_upstream's
+  UpstreamClient), so a base URL is connected to once and reused every turn
+- one ChatClient per (base URL, API key, API flavour), cached for the process
+- the same timeout and retry policy everywhere: connection errors, timeouts
+  and 408/429/5xx answers are retried with exponential backoff, but only
+  before the first byte of a reply has been read
+- streaming iterators yielding text deltas for OpenAI-compatible SSE and
+  Ollama's native NDJSON API; stopping a stream drops its connection so the
+  server stops generating
+
+Example:
+    async def main():
+        client = get_client("http://localhost:1234/v1", api_key="lm-studio")
+        history = [{"role": "user", "content": "Hello"}]
+        while True:
+            reply = await print_stream(client, "phi-2", history)
+            history.append({"role": "assistant", "content": reply})
+            history.append({"role": "user", "content": await ainput("> ")})
+
+    run(main())
+"""
+
+import asyncio
+import json
+import logging
+import random
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from proxy_upstream import UpstreamClient, UpstreamError, UpstreamResponse
+
+logger = logging.getLogger(__name__)
+
+CONNECT_TIMEOUT = 10  # seconds to establish a connection
+READ_TIMEOUT = 120  # max idle seconds between chunks; covers a slow first token
+POOL_SIZE_PER_HOST = 8  # keep-alive connections per server, a chat CLI needs few
+MAX_RETRIES = 2  # extra attempts after the first one
+RETRY_BACKOFF = 0.5  # seconds before the first retry, doubled after each
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}  # answers worth another attempt
+
+APIS = ('openai', 'ollama')  # OpenAI-compatible /chat/completions, Ollama /api/chat
+
+
+class ChatError(Exception):
+    """The server answered with an error status."""
+
+    def __init__(self, status: int, body: str):
+        super().__init__(f"HTTP {status}: {body[:500]}")
+        self.status = status
+        self.body = body
+
+
+_pool: Optional[UpstreamClient] = None
+_clients: Dict[Tuple[str, Optional[str], str], "ChatClient"] = {}
+
+
+async def get_pool() -> UpstreamClient:
+    """The process-wide connection pool, created on first use."""
+    global _pool
+    if _pool is None:
+        _pool = UpstreamClient(pool_size_per_host=POOL_SIZE_PER_HOST,
+                               connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT)
+        await _pool.start()
+    return _pool
+
+
+async def close_pool():
+    """Close all pooled connections; the next request opens a new pool."""
+    global _pool
+    if _pool is not None:
+        pool, _pool = _pool, None
+        await pool.close()
+
+
+def pool_stats() -> Dict[str, object]:
+    """Request and connection counters of the shared pool."""
+    return _pool.stats() if _pool is not None else {}
+
+
+class ChatClient:
+    """Chat API of one server, sending through the shared pool.
+
+    Args:
+        base_url: API root, e.g. 'http://localhost:1234/v1' or for Ollama's
+            native API the server root 'http://localhost:11434'
+        api_key: Sent as a Bearer token if given
+        api: 'openai' for /chat/completions and /models, 'ollama' for /api/chat and /api/tags
+        max_retries: Extra attempts on connection errors and RETRY_STATUSES
+        backoff: Seconds before the first retry, doubled after each
+    """
+
+    def __init__(self, base_url: str, api_key: Optional[str] = None, api: str = 'openai',
+                 max_retries: int = MAX_RETRIES, backoff: float = RETRY_BACKOFF):
+        if api not in APIS:
+            raise ValueError(f"Unknown api '{api}', expected one of {APIS}")
+        self.base_url = base_url.rstrip('/')
+        self.api = api
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.headers = {'Content-Type': 'application/json'}
+        if api_key:
+            self.headers['Authorization'] = f"Bearer {api_key}"
+
+    @asynccontextmanager
+    async def _request(self, method: str, path: str,
+                       body: Optional[dict] = None) -> AsyncIterator[UpstreamResponse]:
+        """Send a request, retrying until a 2xx response arrives.
+
+        Retries happen before the body is read, so a streamed reply is never
+        repeated halfway.
+
+        Raises:
+            ChatError: Error status after the last attempt
+            UpstreamError: No connection or timeout after the last attempt
+        """
+        pool = await get_pool()
+        url = f"{self.base_url}{path}"
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        for attempt in range(self.max_retries + 1):
+            last = attempt == self.max_retries
+            replied = False
+            try:
+                async with pool.request(method, url, headers=self.headers, data=data) as response:
+                    if 200 <= response.status < 300:
+                        replied = True
+                        yield response
+                        return
+                    text = (await response.read()).decode('utf-8', 'replace')
+                    if last or response.status not in RETRY_STATUSES:
+                        raise ChatError(response.status, text)
+                    delay = self._retry_after(response) or self.backoff * 2 ** attempt
+                    logger.info(f"{url} answered {response.status}, retrying in {delay:.1f}s")
+            except UpstreamError as e:
+                if last or replied:
+                    raise
+                delay = self.backoff * 2 ** attempt
+                logger.info(f"{url} failed ({e}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay * random.uniform(0.8, 1.2))
+
+    @staticmethod
+    def _retry_after(response: UpstreamResponse) -> Optional[float]:
+        try:
+            return float(response.headers.get('Retry-After'))
+        except (TypeError, ValueError):
+            return None
+
+    def _chat_body(self, model: str, messages: List[Dict[str, str]], stream: bool,
+                   params: dict) -> Tuple[str, dict]:
+        if self.api == 'ollama':
+            body = {'model': model, 'messages': messages, 'stream': stream}
+            if params:
+                options = dict(params)
+                if 'max_tokens' in options:
+                    options['num_predict'] = options.pop('max_tokens')
+                body['options'] = options
+            return '/api/chat', body
+        return '/chat/completions', {**params, 'model': model, 'messages': messages,
+                                     'stream': stream}
+
+    async def stream_chat(self, model: str, messages: List[Dict[str, str]],
+                          stop: Optional[Callable[[], bool]] = None,
+                          **params) -> AsyncIterator[str]:
+        """Yield the reply's text deltas as they arrive.
+
+        Args:
+            model: Model name
+            messages: Chat history
+            stop: Checked after every delta; when it returns True the
+                connection is dropped so the server stops generating
+            **params: Sampling parameters (temperature, max_tokens, ...); Ollama gets them as options
+        """
+        path, body = self._chat_body(model, messages, True, params)
+        async with self._request('POST', path, body) as response:
+            async for line in _iter_lines(response):
+                delta, done = self._parse_line(line)
+                if delta:
+                    yield delta
+                if done:
+                    return
+                if stop is not None and stop():
+                    await response.close()
+                    return
+
+    def _parse_line(self, line: str) -> Tuple[str, bool]:
+        """(text delta, end of stream) for one line of a streamed reply."""
+        if self.api == 'ollama':
+            chunk = json.loads(line)
+            return (chunk.get('message') or {}).get('content') or '', bool(chunk.get('done'))
+        if not line.startswith('data:'):
+            return '', False  # SSE comments and keep-alives
+        payload = line[5:].strip()
+        if payload == '[DONE]':
+            return '', True
+        choices = json.loads(payload).get('choices') or [{}]
+        return (choices[0].get('delta') or {}).get('content') or '', False
+
+    async def chat(self, model: str, messages: List[Dict[str, str]], **params) -> str:
+        """The complete reply text, streamed under the hood."""
+        return ''.join([delta async for delta in self.stream_chat(model, messages, **params)])
+
+    async def complete(self, model: str, messages: List[Dict[str, str]], **params) -> dict:
+        """One non-streamed completion as the server's JSON response."""
+        path, body = self._chat_body(model, messages, False, params)
+        async with self._request('POST', path, body) as response:
+            return json.loads(await response.read())
+
+    async def list_models(self) -> List[str]:
+        """Model names the server offers."""
+        if self.api == 'ollama':
+            async with self._request('GET', '/api/tags') as response:
+                data = json.loads(await response.read())
+            return [model['name'] for model in data.get('models', [])]
+        async with self._request('GET', '/models') as response:
+            data = json.loads(await response.read())
+        return [model['id'] for model in data.get('data', [])]
+
+
+async def _iter_lines(response: UpstreamResponse) -> AsyncIterator[str]:
+    """Non-empty lines of a streamed body, however the chunks are split."""
+    buffer = b''
+    async for chunk in response.iter_chunks():
+        buffer += chunk
+        *lines, buffer = buffer.split(b'\n')
+        for line in lines:
+            line = line.strip()
+            if line:
+                yield line.decode('utf-8')
+    if buffer.strip():
+        yield buffer.strip().decode('utf-8')
+
+
+def get_client(base_url: str, api_key: Optional[str] = None, api: str = 'openai') -> ChatClient:
+    """The process-wide ChatClient for a server, created on first use."""
+    key = (base_url.rstrip('/'), api_key, api)
+    if key not in _clients:
+        _clients[key] = ChatClient(base_url, api_key, api)
+    return _clients[key]
+
+
+async def print_stream(client: ChatClient, model: str, messages: List[Dict[str, str]],
+                       stop: Optional[Callable[[], bool]] = None, **params) -> str:
+    """Print a streamed reply as it arrives and return its text."""
+    reply = ''
+    async for delta in client.stream_chat(model, messages, stop=stop, **params):
+        print(delta, end='', flush=True)
+        reply += delta
+    return reply
+
+
+async def ainput(prompt: str = '') -> str:
+    """input() on a worker thread, so the event loop and its pool stay alive."""
+    return await asyncio.to_thread(input, prompt)
+
+
+def run(main: Awaitable):
+    """Run a chat script's main coroutine and close the shared pool afterwards."""
+    async def runner():
+        try:
+            return await main
+        finally:
+            await close_pool()
+
+    return asyncio.run(runner())
@@ -0,0 +1,182 @@
+"""
+Token-bounded chat history with rolling summarization.
+
+The terminal chat loops resend their whole history every turn, so prefill
+time grows with the session until the context overflows. ChatHistory keeps
+the request under a token budget instead:
+
+- the system prompt is always sent first
+- as many of the most recent turns as fit the budget are sent verbatim
+- once the verbatim turns pass COMPACT_AT of the budget, the oldest ones are
+  summarized into a short note appended to the system prompt. This runs as a
+  background task on the chat's event loop, typically while the user is
+  typing, so no turn waits for it.
+
+Example:
+    history = ChatHistory(client, model, system="You are a helpful assistant.")
+    history.add('user', await ainput("> "))
+    reply = await print_stream(client, model, history.messages())
+    history.add('assistant', reply)
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional
+
+from chat_client import ChatClient
+from prompt_templates import PromptTemplate
+
+try:
+    from web_agentic.token_counter import get_token_counter
+    HAS_TOKEN_COUNTER = True
+except ImportError:
+    HAS_TOKEN_COUNTER = False
+
+logger = logging.getLogger(__name__)
+
+HISTORY_TOKENS = 3000  # default budget for everything sent per request
+COMPACT_AT = 0.75  # summarize once verbatim turns pass this fraction of the budget
+KEEP_AFTER_COMPACT = 0.4  # fraction of the budget left verbatim after summarizing
+KEEP_RECENT = 2  # messages never summarized, the last exchange
+SUMMARY_WORDS = 150  # length limit asked of the summarizer
+SUMMARY_MAX_TOKENS = 400  # hard cap on the summary reply
+MESSAGE_OVERHEAD = 4  # tokens per message for role and delimiters
+
+SUMMARY_HEADER = "Summary of the earlier conversation:\n"
+
+SUMMARIZE = PromptTemplate(
+    'history_summary',
+    """
+    Update the running summary of a chat between a user and an assistant.
+    Merge the summary so far with the new turns. Keep names, facts, numbers,
+    decisions, the user's preferences and open questions; drop small talk.
+    Write at most {words} words in the language of the chat, as plain notes.
+    """,
+    system="You compress chat transcripts into short, factual notes.",
+    content_header="Summary so far and new turns:\n",
+    words=SUMMARY_WORDS,
+)
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Token count with the model's tokenizer if available, else chars // 4."""
+    if HAS_TOKEN_COUNTER:
+        return get_token_counter().count(text, model)
+    return len(text) // 4
+
+
+class ChatHistory:
+    """Chat messages kept under a token budget by summarizing old turns.
+
+    Args:
+        client: Client used for the summaries
+        model: Chat model, also used to count tokens
+        system: System prompt, always sent
+        budget: Max tokens of all messages sent per request
+        summary_model: Model for the summaries, default `model`
+    """
+
+    def __init__(self, client: ChatClient, model: str, system: Optional[str] = None,
+                 budget: int = HISTORY_TOKENS, summary_model: Optional[str] = None):
+        self.client = client
+        self.model = model
+        self.system = system
+        self.budget = budget
+        self.summary_model = summary_model or model
+        self.summary = ''
+        self.turns: List[Dict[str, str]] = []
+        self._tokens: List[int] = []
+        self._task: Optional[asyncio.Task] = None
+        self.summaries = 0
+        self.folded_messages = 0
+        self.summary_seconds = 0.0
+
+    def _count(self, message: Dict[str, str]) -> int:
+        return count_tokens(message['content'], self.model) + MESSAGE_OVERHEAD
+
+    def add(self, role: str, content: str):
+        """Append a message; starts a background summary when the turns grow too long."""
+        message = {'role': role, 'content': content}
+        self.turns.append(message)
+        self._tokens.append(self._count(message))
+        self._maybe_compact()
+
+    def _system_message(self) -> Optional[Dict[str, str]]:
+        parts = [part for part in (self.system, self.summary and SUMMARY_HEADER + self.summary)
+                 if part]
+        return {'role': 'system', 'content': '\n\n'.join(parts)} if parts else None
+
+    def messages(self) -> List[Dict[str, str]]:
+        """Messages for the next request: system prompt and summary, then recent turns.
+
+        Turns that no longer fit the budget are left out even before they
+        are summarized; the last message is always included.
+        """
+        system = self._system_message()
+        used = self._count(system) if system else 0
+        start = len(self.turns)
+        while start > 0:
+            cost = self._tokens[start - 1]
+            if start < len(self.turns) and used + cost > self.budget:
+                break
+            used += cost
+            start -= 1
+        if start:
+            logger.debug(f"History window skips {start} unsummarized messages")
+        return ([system] if system else []) + self.turns[start:]
+
+    def tokens(self) -> int:
+        """Tokens of the verbatim turns kept so far."""
+        return sum(self._tokens)
+
+    def _maybe_compact(self):
+        if self._task is not None and not self._task.done():
+            return
+        if self.tokens() <= self.budget * COMPACT_AT:
+            return
+        # Fold the oldest turns until what stays verbatim fits KEEP_AFTER_COMPACT
+        keep = self.budget * KEEP_AFTER_COMPACT
+        remaining = self.tokens()
+        count = 0
+        while count < len(self.turns) - KEEP_RECENT and remaining > keep:
+            remaining -= self._tokens[count]
+            count += 1
+        if count:
+            self._task = asyncio.get_running_loop().create_task(self._compact(count))
+
+    async def _compact(self, count: int):
+        """Summarize the oldest `count` turns together with the summary so far."""
+        started = time.monotonic()
+        transcript = '\n'.join(f"{turn['role']}: {turn['content']}" for turn in self.turns[:count])
+        content = f"{self.summary or '(none)'}\n\nNew turns:\n{transcript}"
+        try:
+            summary = await self.client.chat(self.summary_model, SUMMARIZE.messages(content),
+                                             max_tokens=SUMMARY_MAX_TOKENS, temperature=0.2)
+        except Exception as e:
+            logger.warning(f"History summary failed, keeping the turns: {e}")
+            return
+        # Turns are only ever appended, so the folded ones are still the first `count`
+        self.summary = summary.strip()
+        del self.turns[:count]
+        del self._tokens[:count]
+        self.summaries += 1
+        self.folded_messages += count
+        self.summary_seconds += time.monotonic() - started
+        logger.info(f"Summarized {count} messages in {time.monotonic() - started:.1f}s")
+
+    async def wait(self):
+        """Wait for a running summary, e.g. before printing stats."""
+        if self._task is not None:
+            await asyncio.shield(self._task)
+
+    def stats(self) -> Dict[str, object]:
+        sent = self.messages()
+        return {
+            'turns_kept': len(self.turns),
+            'summaries': self.summaries,
+            'folded_messages': self.folded_messages,
+            'summary_seconds': round(self.summary_seconds, 2),
+            'window_tokens': sum(self._count(message) for message in sent),
+            'budget': self.budget,
+        }
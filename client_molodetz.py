@@ -1,22 +1,25 @@
-from ollama import Client
-client = Client(
-    host="https://ollama.molodetz.nl"
-)
+from chat_client import ainput, get_client, print_stream, run
+from chat_history import ChatHistory
+MODEL = 'qwen2.5:latest'
 
-messages = []
+client = get_client("https://ollama.molodetz.nl", api='ollama')
 
+# Old turns are summarized in the background so each request stays under the token budget
+messages = ChatHistory(client, MODEL)
 
-def chat(message):
+
+async def chat(message):
     if message:
-        messages.append({'role': 'user', 'content': message})
-    content = ''
-    for response in client.chat(model='qwen2.5:latest', messages=messages, stream=True):
-        content += response.message.content
-        print(response.message.content, end='', flush=True)
-    messages.append({'role': 'assistant', 'content': content})
+        messages.add('user', message)
+    content = await print_stream(client, MODEL, messages.messages())
+    messages.add('assistant', content)
     print("")
 
 
-while True:
-    message = input("You: ")
-    chat(message)
+async def main():
+    while True:
+        message = await ainput("You: ")
+        await chat(message)
+
+
+run(main())
@@ -6,6 +6,7 @@ from getparams import load_api_credentials
 import re
 from ollama import AsyncClient
 import asyncio
+from prompt_templates import PromptTemplate, format_prefix_report
 
 # List of document categories
 DATEIKLASSEN = [
@@ -21,23 +22,24 @@ DATEIKLASSEN = [
     "Sonstiges"
 ]
 
-# Prompts for different analysis modes
+# Prompts for different analysis modes. Instructions and system prompt form a
+# static prefix the provider can cache; the document content always comes last.
 PROMPTS = {
-    's': """
-Basierend auf dem folgenden Inhalt, prüfe das Dokument. Erstelle Beschreibung und Dateinamen nach exakt folgendem Format. 
+    's': PromptTemplate('fnamer.s', """
+Basierend auf dem folgenden Inhalt, prüfe das Dokument. Erstelle Beschreibung und Dateinamen nach exakt folgendem Format.
 Das Dokument kann aufgrund des Scan Vorgangs einige Textfehler und geschwärzte textpassagen enthalten. Keine sonstigen Informationen oder Erklärungen hinzufügen:
 Beschreibung: (Beschreibe kurz den Inhalt und fasse die Kernaussage zusammen. Nenne wichtige Details und Schlüsselwörter sowie den Dokumentersteller.)
 Dateiname: (beschreibender Dateiname mit Endung .md)
-  """,
-    'k': f"""
+""", content_header="Inhalt:\n"),
+    'k': PromptTemplate('fnamer.k', """
     Basierend auf dem folgenden Inhalt, kategorisiere den Inhalt in eine der folgenden vorgegebenen Klassen:
-    {', '.join(DATEIKLASSEN)}
+    {klassen}
     Antworte nur mit dem Namen der Klasse. Sollte keine der Klassen passen, antworte mit 'Sonstiges'.
-    """,
-    'k0': f"""
+    """, content_header="Inhalt:\n", klassen=', '.join(DATEIKLASSEN)),
+    'k0': PromptTemplate('fnamer.k0', """
     Basierend auf dem folgenden Inhalt, kategorisiere den Inhalt in eine Dokumentenkategorie:
     Antworte nur mit dem Namen der Kategorie.
-    """
+    """, content_header="Inhalt:\n"),
 }
 
 
@@ -52,6 +54,8 @@ class ModelProvider(ABC):
 
 
 class HuggingFaceProvider(ModelProvider):
+    system_prompt = "Du bist ein Assistent der Wiener Wohnen GmbH der OCR eingescannte Dokumente von Anbietern einer Ausschreibung analysiert."
+
     def __init__(self, model_id):
         self.model_id = model_id
         self.client = None
@@ -62,11 +66,7 @@ class HuggingFaceProvider(ModelProvider):
         self.client = InferenceClient(model=self.model_id)
 
     async def analyze(self, content, mode):
-        full_prompt = f"{PROMPTS[mode]}\n\nInhalt:\n{content}\n\nAntwort:\n"
-        messages = [
-            {"role": "system", "content": "Du bist ein Assistent der Wiener Wohnen GmbH der OCR eingescannte Dokumente von Anbietern einer Ausschreibung analysiert."},
-            {"role": "user", "content": full_prompt}
-        ]
+        messages = PROMPTS[mode].messages(content, system=self.system_prompt)
         full_response = ""
         print("Analyzing with HuggingFace (streaming response):")
         try:
@@ -89,6 +89,8 @@ class HuggingFaceProvider(ModelProvider):
 
 
 class OllamaProvider(ModelProvider):
+    system_prompt = "Du bist ein Assistent der Wiener Wohnen GmbH und analysierst Anbieterdokumente einer Ausschreibung."
+
     def __init__(self, model_name):
         self.model_name = model_name
         self.client = AsyncClient(
@@ -101,11 +103,7 @@ class OllamaProvider(ModelProvider):
         pass
 
     async def analyze(self, content, mode):
-        full_prompt = f"{PROMPTS[mode]}\n\nInhalt:\n{content}\n\nAntwort:\n"
-        messages = [
-            {"role": "system", "content": "Du bist ein Assistent der Wiener Wohnen GmbH und analysierst Anbieterdokumente einer Ausschreibung."},
-            {"role": "user", "content": full_prompt}
-        ]
+        messages = PROMPTS[mode].messages(content, system=self.system_prompt)
 
         print("Analyzing with Ollama (streaming response):")
         full_response = ""
@@ -122,6 +120,8 @@ class OllamaProvider(ModelProvider):
 
 
 class OpenAIProvider(ModelProvider):
+    system_prompt = "Du bist ein Assistent der Wiener Wohnen GmbH und analysierst und berichtigst OCR-gescannte Anbieterdokumente einer Ausschreibung."
+
     def __init__(self, model_name):
         self.model_name = model_name
 
@@ -134,11 +134,7 @@ class OpenAIProvider(ModelProvider):
         pass
 
     async def analyze(self, content, mode):
-        full_prompt = f"{PROMPTS[mode]}\n\nInhalt:\n{content}\n\nAntwort:\n"
-        messages = [
-            {"role": "system", "content": "Du bist ein Assistent der Wiener Wohnen GmbH und analysierst und berichtigst OCR-gescannte Anbieterdokumente einer Ausschreibung."},
-            {"role": "user", "content": full_prompt}
-        ]
+        messages = PROMPTS[mode].messages(content, system=self.system_prompt)
         full_response = ""
         completion = self.client.chat.completions.create(
             model=self.model_name,
@@ -234,6 +230,8 @@ async def main():
             print(f"Content: {content[:500]}")
         result = await provider.analyze(content, mode)
 #        print(result)
+    if args.v:
+        print(format_prefix_report())
 
 
 if __name__ == "__main__":
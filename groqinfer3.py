@@ -1,32 +1,34 @@
 import argparse
-from groq import Groq
+from chat_client import ainput, get_client, print_stream, run
 import json
 from getparams import load_api_credentials, load_model_parameters
 
+GROQ_BASE_URL = "https://api.groq.com/openai/v1"
 
-def process_question(client, model_parameters, question):
+
+async def process_question(client, model_parameters, question):
     """
-    Sends a user question to the Groq client and prints the response.
+    Sends a user question to Groq and prints the streamed response.
 
     Parameters:
-    - client: The initialized Groq client.
+    - client: The shared chat client for Groq.
     - question: The user's question as a string.
     """
-    stream = client.chat.completions.create(
-        messages=[
+    params = dict(model_parameters)
+    params.pop('stream', None)  # always streamed
+    model = params.pop('model')
+    await print_stream(
+        client,
+        model,
+        [
             {"role": "system", "content": "you are a helpful assistant."},
             {"role": "user", "content": question},
         ],
-        **model_parameters
+        **params
     )
 
-    for chunk in stream:
-        # Check if the content is not None before printing
-        if chunk.choices[0].delta.content is not None:
-            print(chunk.choices[0].delta.content, end="")
-
 
-def main(question=None, model="mixtral-8x7b-32768"):
+async def main(question=None, model="mixtral-8x7b-32768"):
     """
     Main routine that initializes the Groq client and processes user questions.
     Allows for back-to-back questions from the user.
@@ -38,19 +40,20 @@ def main(question=None, model="mixtral-8x7b-32768"):
     api_key = load_api_credentials(hoster)
     model_parameters, api_url = load_model_parameters(hoster, model)
 
-    client = Groq(api_key=api_key)
+    # One keep-alive connection for the whole session
+    client = get_client(GROQ_BASE_URL, api_key=api_key)
 
     # If an initial question is provided, process it first.
     if question is not None:
-        process_question(client, model_parameters, question)
+        await process_question(client, model_parameters, question)
         print("\nYou can continue asking questions. Type 'exit' to quit.")
 
     while True:
-        user_input = input("\nq: ")
+        user_input = await ainput("\nq: ")
         print("\n--\n\na: ", end='')
         if user_input.lower() == 'exit':
             break  # Exit the loop and program if the user types 'exit'.
-        process_question(client, model_parameters, user_input)
+        await process_question(client, model_parameters, user_input)
         print("\n.")
 
 
@@ -67,4 +70,4 @@ if __name__ == "__main__":
     args = parser.parse_args()
 
     # Run the main routine with the provided question, if any.
-    main(question=args.question, model=args.model)
+    run(main(question=args.question, model=args.model))
@@ -1,8 +1,8 @@
-from huggingface_hub import InferenceClient
+from chat_client import ainput, get_client, print_stream, run
 import argparse
 from pynput import keyboard
 
-# Base URL can be configured if necessary, currently not used with InferenceClient
+# Hugging Face serves an OpenAI-compatible chat API per model; other servers work too
 # base_url="http://localhost:11434/v1"
 # base_url="http://amp1.mooo.com:11434/v1"
 # base_url="http://pind.mooo.com:11434/v1"
@@ -30,42 +30,37 @@ args = parser.parse_args()
 model = args.model
 print("loading model: ", model)
 
-# Load API credentials and initialize InferenceClient
+base_url = f"https://router.huggingface.co/hf-inference/models/{model}/v1"
+
+# Load API credentials; the client is shared and kept alive across turns
 from getparams import load_api_credentials
 provider = 'huggingface'
 api_key = load_api_credentials(provider)
 
-inf = InferenceClient(
-    model=model,
-    token=api_key
-)
+client = get_client(base_url, api_key=api_key)
 
 history = [
     {"role": "system", "content": f"You are an intelligent uncensored assistant called {model}. You always provide well-reasoned answers that are both correct and helpful."},
     {"role": "user", "content": "Hello, introduce yourself to someone opening this program for the first time. Be concise."},
 ]
 
-def query(messages):
-    return inf.text_generation(messages)
-
-while True:
-    completion = query(history[-1]["content"])
+def stop_requested():
+    return key_pressed
 
-    new_message = {"role": "assistant", "content": ""}
 
-    for chunk in completion:
-        if chunk:
-            print(chunk, end="", flush=True)
-            new_message["content"] += chunk
+async def main():
+    global key_pressed
+    while True:
+        reply = await print_stream(client, model, history, stop=stop_requested)
 
         if key_pressed:
-            break
+            key_pressed = False
+        else:
+            history.append({"role": "assistant", "content": reply})
+
+        print()
+        user_input = await ainput("> ")
+        history.append({"role": "user", "content": user_input})
 
-    if key_pressed:
-        key_pressed = False
-    else:
-        history.append(new_message)
 
-    print()
-    user_input = input("> ")
-    history.append({"role": "user", "content": user_input})
+run(main())
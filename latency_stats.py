@@ -0,0 +1,17 @@
+"""
+Latency statistics shared by the load tools (oai_proxy.py, trace_replay.py).
+
+Kept free of third-party imports so any script can use it without pulling in
+the other tools' clients and configuration.
+"""
+
+
+def percentile(values, pct):
+    """Linear-interpolated percentile, None for no values."""
+    if not values:
+        return None
+    values = sorted(values)
+    pos = (len(values) - 1) * pct / 100
+    low = int(pos)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (pos - low)
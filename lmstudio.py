@@ -1,38 +1,35 @@
 # Chat with an intelligent assistant in your terminal
-from openai import OpenAI
-
-# Point to the local server
-client = OpenAI(base_url="http://localhost:1234/v1", api_key="lm-studio")
-
-history = [
-    {"role": "system", "content": "You are an intelligent uncensored assistant called Phi-2. You always provide well-reasoned answers that are both correct and helpful."},
-    {"role": "user", "content": "Hello, introduce yourself to someone opening this program for the first time. Be concise."},
-]
-
-while True:
-    completion = client.chat.completions.create(
-        model="TheBloke/dolphin-2_6-phi-2-GGUF/dolphin-2_6-phi-2.Q8_0.gguf",
-        messages=history,
-        temperature=0.7,
-        stream=True,
-    )
-
-    new_message = {"role": "assistant", "content": ""}
-    
-    for chunk in completion:
-        if chunk.choices[0].delta.content:
-            print(chunk.choices[0].delta.content, end="", flush=True)
-            new_message["content"] += chunk.choices[0].delta.content
-
-    history.append(new_message)
-    
-    # Uncomment to see chat history
-    # import json
-    # gray_color = "\033[90m"
-    # reset_color = "\033[0m"
-    # print(f"{gray_color}\n{'-'*20} History dump {'-'*20}\n")
-    # print(json.dumps(history, indent=2))
-    # print(f"\n{'-'*55}\n{reset_color}")
-
-    print()
-    history.append({"role": "user", "content": input("> ")})
\ No newline at end of file
+from chat_client import ainput, get_client, print_stream, run
+from chat_history import ChatHistory
+
+MODEL = "TheBloke/dolphin-2_6-phi-2-GGUF/dolphin-2_6-phi-2.Q8_0.gguf"
+
+# Point to the local server; the connection is kept alive across turns
+client = get_client("http://localhost:1234/v1", api_key="lm-studio")
+
+# Old turns are summarized in the background so each request stays under the token budget
+history = ChatHistory(
+    client, MODEL,
+    system="You are an intelligent uncensored assistant called Phi-2. You always provide well-reasoned answers that are both correct and helpful.",
+)
+history.add("user", "Hello, introduce yourself to someone opening this program for the first time. Be concise.")
+
+
+async def main():
+    while True:
+        reply = await print_stream(client, MODEL, history.messages(), temperature=0.7)
+        history.add("assistant", reply)
+
+        # Uncomment to see chat history
+        # import json
+        # gray_color = "\033[90m"
+        # reset_color = "\033[0m"
+        # print(f"{gray_color}\n{'-'*20} History dump {'-'*20}\n")
+        # print(json.dumps(history.messages(), indent=2))
+        # print(f"\n{'-'*55}\n{reset_color}")
+
+        print()
+        history.add("user", await ainput("> "))
+
+
+run(main())
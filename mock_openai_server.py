@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Deterministic mock of an OpenAI-compatible API for offline performance tests.
+
+Implements /v1/models, /v1/chat/completions (plain and SSE streaming) and
+/v1/embeddings with configurable timing and failure injection, plus Ollama's
+native /api/generate, /api/chat and /api/tags for RAGUI and chat_client.py:
+
+    python mock_openai_server.py --port 9001 --ttft 0.3 --tps 40 --tokens 200
+    python oai_proxy.py --base-url http://127.0.0.1:9001/v1 -c 16 -n 200
+    python openai_proxy.py --mode async --no-ssl --port 8080 --target http://127.0.0.1:9001
+
+Outputs depend only on the request body and --seed, so the same request
+always yields the same completion text and embedding vector. Injected errors
+and 429s are drawn from a seeded RNG, so a run is reproducible too.
+/mock/stats reports request counts, streams in progress and streams the
+client abandoned, which is what the cancellation tests look at. Like a real
+inference server, the mock notices a disconnect right away (also while it is
+still "prefilling" before the first token) and stops generating.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import struct
+import time
+from typing import List
+
+from aiohttp import web
+
+WORDS = ("lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+         "incididunt ut labore et dolore magna aliqua ut enim ad minim veniam quis nostrud "
+         "exercitation ullamco laboris nisi aliquip ex ea commodo consequat").split()
+
+DEFAULT_MODELS = ['mock-chat', 'mock-embed']
+
+
+def body_digest(data: dict, seed: int) -> bytes:
+    canonical = json.dumps(data, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(f"{seed}:{canonical}".encode('utf-8')).digest()
+
+
+def completion_tokens(digest: bytes, count: int) -> List[str]:
+    """Deterministic pseudo-words for a request, one per token."""
+    rng = random.Random(digest)
+    return [rng.choice(WORDS) + ' ' for _ in range(count)]
+
+
+def embedding_vector(text: str, dim: int, seed: int) -> List[float]:
+    """Unit-length vector derived from a hash of the text."""
+    values = []
+    counter = 0
+    while len(values) < dim:
+        block = hashlib.sha256(f"{seed}:{counter}:{text}".encode('utf-8')).digest()
+        values.extend(v / 2 ** 31 for v in struct.unpack('>8i', block))
+        counter += 1
+    values = values[:dim]
+    norm = math.sqrt(sum(v * v for v in values)) or 1.0
+    return [v / norm for v in values]
+
+
+def prompt_token_estimate(data: dict) -> int:
+    text = json.dumps(data.get('messages') or data.get('input') or '')
+    return max(1, len(text) // 4)
+
+
+class MockState:
+    """Counters and injection RNG shared by all handlers."""
+
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.requests = 0
+        self.errors_injected = 0
+        self.rate_limited = 0
+        self.active_streams = 0
+        self.completed_streams = 0
+        self.aborted_streams = 0
+        self.tokens_sent = 0
+        self.last_abort_at = None
+
+    def injected_failure(self):
+        """A prepared error response or None, drawn from the seeded RNG."""
+        roll = self.rng.random()
+        if roll < self.args.rate_limit_rate:
+            self.rate_limited += 1
+            return web.json_response(
+                {'error': {'message': 'Rate limit exceeded (mock)', 'type': 'rate_limit_error'}},
+                status=429, headers={'Retry-After': str(self.args.retry_after)})
+        if roll < self.args.rate_limit_rate + self.args.error_rate:
+            self.errors_injected += 1
+            return web.json_response(
+                {'error': {'message': 'Injected server error (mock)', 'type': 'server_error'}},
+                status=500)
+        return None
+
+
+async def list_models(request):
+    state = request.app['state']
+    state.requests += 1
+    return web.json_response({
+        'object': 'list',
+        'data': [{'id': name, 'object': 'model', 'created': 0, 'owned_by': 'mock'}
+                 for name in state.args.models],
+    })
+
+
+async def chat_completions(request):
+    state = request.app['state']
+    args = state.args
+    state.requests += 1
+    data = await request.json()
+    failure = state.injected_failure()
+    if failure is not None:
+        return failure
+
+    digest = body_digest(data, args.seed)
+    count = min(args.tokens, data.get('max_tokens') or args.tokens)
+    tokens = completion_tokens(digest, count)
+    completion_id = 'chatcmpl-' + digest.hex()[:24]
+    model = data.get('model', args.models[0])
+    usage = {'prompt_tokens': prompt_token_estimate(data), 'completion_tokens': count,
+             'total_tokens': prompt_token_estimate(data) + count}
+
+    if not data.get('stream'):
+        await asyncio.sleep(args.ttft)
+        await asyncio.sleep(count / args.tps if args.tps else 0)
+        state.tokens_sent += count
+        return web.json_response({
+            'id': completion_id, 'object': 'chat.completion', 'created': 0, 'model': model,
+            'choices': [{'index': 0, 'finish_reason': 'length' if count == args.tokens else 'stop',
+                         'message': {'role': 'assistant', 'content': ''.join(tokens)}}],
+            'usage': usage,
+        })
+
+    def event(delta, finish_reason=None, with_usage=False):
+        chunk = {'id': completion_id, 'object': 'chat.completion.chunk', 'created': 0,
+                 'model': model,
+                 'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]}
+        if with_usage:
+            chunk['usage'] = usage
+        return f"data: {json.dumps(chunk)}\n\n".encode('utf-8')
+
+    async def generate(response):
+        await response.write(event({'role': 'assistant', 'content': ''}))
+        await stream_tokens(state, response, tokens, lambda token: event({'content': token}))
+        include_usage = (data.get('stream_options') or {}).get('include_usage')
+        await response.write(event({}, 'stop', with_usage=bool(include_usage)))
+        await response.write(b'data: [DONE]\n\n')
+
+    return await stream_response(request, {'Content-Type': 'text/event-stream',
+                                           'Cache-Control': 'no-cache'}, generate)
+
+
+async def stream_response(request, headers, generate):
+    """Run a streamed generation, counting it as completed or aborted by the client."""
+    state = request.app['state']
+    state.active_streams += 1
+    try:
+        response = web.StreamResponse(headers=headers)
+        await response.prepare(request)
+        await asyncio.sleep(state.args.ttft)
+        await generate(response)
+        state.completed_streams += 1
+    except (ConnectionResetError, asyncio.CancelledError):
+        # Client went away: stop "generating", like a real server should
+        state.aborted_streams += 1
+        state.last_abort_at = time.time()
+        raise
+    finally:
+        state.active_streams -= 1
+    return response
+
+
+async def stream_tokens(state, response, tokens, encode):
+    """Write one encoded chunk per token, paced at --tps."""
+    started = time.monotonic()
+    for i, token in enumerate(tokens):
+        if state.args.tps:
+            # Pace against the start time so timer drift does not accumulate
+            await asyncio.sleep(max(0, started + i / state.args.tps - time.monotonic()))
+        await response.write(encode(token))
+        state.tokens_sent += 1
+
+
+async def ollama_generate(request):
+    """Ollama's native /api/generate as newline-delimited JSON."""
+    state = request.app['state']
+    args = state.args
+    state.requests += 1
+    data = await request.json()
+    model = data.get('model', args.models[0])
+    tokens = completion_tokens(body_digest(data, args.seed), args.tokens)
+
+    def line(token, done=False):
+        chunk = {'model': model, 'created_at': '1970-01-01T00:00:00Z',
+                 'response': token, 'done': done}
+        return (json.dumps(chunk) + '\n').encode('utf-8')
+
+    if data.get('stream') is False:
+        await asyncio.sleep(args.ttft + (len(tokens) / args.tps if args.tps else 0))
+        state.tokens_sent += len(tokens)
+        return web.json_response({'model': model, 'response': ''.join(tokens), 'done': True})
+
+    async def generate(response):
+        await stream_tokens(state, response, tokens, line)
+        await response.write(line('', done=True))
+
+    return await stream_response(request, {'Content-Type': 'application/x-ndjson'}, generate)
+
+
+async def ollama_chat(request):
+    """Ollama's native /api/chat as newline-delimited JSON."""
+    state = request.app['state']
+    args = state.args
+    state.requests += 1
+    data = await request.json()
+    model = data.get('model', args.models[0])
+    tokens = completion_tokens(body_digest(data, args.seed), args.tokens)
+
+    def line(token, done=False):
+        chunk = {'model': model, 'created_at': '1970-01-01T00:00:00Z',
+                 'message': {'role': 'assistant', 'content': token}, 'done': done}
+        return (json.dumps(chunk) + '\n').encode('utf-8')
+
+    if data.get('stream') is False:
+        await asyncio.sleep(args.ttft + (len(tokens) / args.tps if args.tps else 0))
+        state.tokens_sent += len(tokens)
+        return web.json_response({'model': model, 'done': True,
+                                  'message': {'role': 'assistant', 'content': ''.join(tokens)}})
+
+    async def generate(response):
+        await stream_tokens(state, response, tokens, line)
+        await response.write(line('', done=True))
+
+    return await stream_response(request, {'Content-Type': 'application/x-ndjson'}, generate)
+
+
+async def ollama_tags(request):
+    state = request.app['state']
+    state.requests += 1
+    return web.json_response({'models': [{'name': name, 'model': name}
+                                         for name in state.args.models]})
+
+
+async def embeddings(request):
+    state = request.app['state']
+    args = state.args
+    state.requests += 1
+    data = await request.json()
+    failure = state.injected_failure()
+    if failure is not None:
+        return failure
+
+    inputs = data.get('input', '')
+    inputs = [inputs] if isinstance(inputs, str) else inputs
+    await asyncio.sleep(args.embedding_latency + args.embedding_latency_per_input * len(inputs))
+    tokens = sum(max(1, len(str(text)) // 4) for text in inputs)
+    return web.json_response({
+        'object': 'list',
+        'model': data.get('model', args.models[-1]),
+        'data': [{'object': 'embedding', 'index': i,
+                  'embedding': embedding_vector(str(text), args.embedding_dim, args.seed)}
+                 for i, text in enumerate(inputs)],
+        'usage': {'prompt_tokens': tokens, 'total_tokens': tokens},
+    })
+
+
+async def mock_stats(request):
+    state = request.app['state']
+    return web.json_response({
+        'requests': state.requests,
+        'errors_injected': state.errors_injected,
+        'rate_limited': state.rate_limited,
+        'active_streams': state.active_streams,
+        'completed_streams': state.completed_streams,
+        'aborted_streams': state.aborted_streams,
+        'tokens_sent': state.tokens_sent,
+        'last_abort_at': state.last_abort_at,
+    })
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Deterministic mock OpenAI-compatible server')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on')
+    parser.add_argument('--port', type=int, default=9001, help='Port to listen on')
+    parser.add_argument('--models', nargs='+', default=DEFAULT_MODELS,
+                        help='Model ids listed by /v1/models')
+    parser.add_argument('--ttft', type=float, default=0.2,
+                        help='Seconds before the first token / response')
+    parser.add_argument('--tps', type=float, default=50,
+                        help='Generated tokens per second, 0 for no pacing')
+    parser.add_argument('--tokens', type=int, default=64,
+                        help='Completion tokens per answer (capped by max_tokens)')
+    parser.add_argument('--embedding-dim', type=int, default=4096,
+                        help='Length of every embedding vector')
+    parser.add_argument('--embedding-latency', type=float, default=0.02,
+                        help='Fixed seconds per embeddings request')
+    parser.add_argument('--embedding-latency-per-input', type=float, default=0.002,
+                        help='Additional seconds per input text')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Fraction of requests answered with a 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0,
+                        help='Fraction of requests answered with a 429')
+    parser.add_argument('--retry-after', type=int, default=1,
+                        help='Retry-After seconds on injected 429s')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed for outputs and failure injection')
+    return parser
+
+
+def create_app(args=None):
+    """Build the mock application; args default to the command line defaults."""
+    if args is None:
+        args = build_parser().parse_args([])
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app['state'] = MockState(args)
+    app.router.add_get('/v1/models', list_models)
+    app.router.add_post('/v1/chat/completions', chat_completions)
+    app.router.add_post('/v1/embeddings', embeddings)
+    app.router.add_post('/api/generate', ollama_generate)
+    app.router.add_post('/api/chat', ollama_chat)
+    app.router.add_get('/api/tags', ollama_tags)
+    app.router.add_get('/mock/stats', mock_stats)
+    return app
+
+
+def main():
+    args = build_parser().parse_args()
+    web.run_app(create_app(args), host=args.host, port=args.port, handler_cancellation=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+"""
+Resolve 'provider@model' names to OpenAI-compatible backends.
+
+Model names like 'tu@deepseek-r1' or 'arli@Gemma-3-27B-it' (see oai_proxy.py)
+name a provider from providers_config.PROVIDER_CONFIGS, or one of the
+OpenAI-compatible endpoints in ROUTER_ENDPOINTS that uniinfer has no provider
+class for, and a model it serves.
+A bare alias like 'deepseek-r1' resolves to every provider that serves the
+model. A provider can have several replicas ('openai_base_url' plus
+'replicas'); among all candidate replicas the router picks the healthy one
+with the lowest recent latency:
+
+- latency is an exponentially weighted moving average of what callers report
+  through record(), so it follows the last handful of requests
+- replicas without a measurement yet are tried first, so every one gets one
+- a measurement older than LATENCY_TTL counts as none: a replica that was
+  slow once and lost its traffic gets one request to measure it again, so a
+  transient spike does not exile it for good
+- after FAILURE_THRESHOLD consecutive failures a replica is skipped for
+  COOLDOWN seconds
+
+Example:
+    router = ModelRouter()
+    route = router.resolve('deepseek-r1')
+    ... call route.base_url with route.model, measure it ...
+    router.record(route, latency=0.42, ok=True)
+"""
+
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+from providers_config import PROVIDER_CONFIGS
+
+logger = logging.getLogger(__name__)
+
+EWMA_ALPHA = 0.3  # weight of the newest latency sample
+FAILURE_THRESHOLD = 3  # consecutive failures that take a replica out
+COOLDOWN = 60  # seconds a failed replica is skipped
+MODELS_TTL = 600  # seconds a fetched /models list is reused
+LATENCY_TTL = 120  # seconds after which a replica's latency is measured again
+
+# Endpoints only the router can reach. They stay out of PROVIDER_CONFIGS,
+# which the uniinfer scripts offer as providers and uniinfer cannot build.
+ROUTER_ENDPOINTS = {
+    'tu': {
+        'name': 'TU Wien Aqueduct',
+        'default_model': 'deepseek-r1',
+        'needs_api_key': True,
+        'openai_base_url': 'https://aqueduct.ai.datalab.tuwien.ac.at/v1',
+    },
+}
+
+
+def parse_model_name(name: str) -> Tuple[Optional[str], str]:
+    """Split 'provider@model' into (provider, model); (None, name) for a bare alias."""
+    provider, sep, model = name.partition('@')
+    if sep and provider and model:
+        return provider, model
+    return None, name
+
+
+def get_provider_api_key(provider: str) -> Optional[str]:
+    """API key from credgoo like the rest of the repo, else <PROVIDER>_API_KEY."""
+    try:
+        from credgoo import get_api_key
+        key = get_api_key(provider)
+        if key:
+            return key
+    except ImportError:
+        pass
+    except Exception as e:
+        logger.warning(f"credgoo lookup for {provider} failed: {e}")
+    return os.getenv(f"{provider.upper()}_API_KEY")
+
+
+class Route:
+    """A resolved target: provider, model name as the provider knows it, and replica URL."""
+
+    def __init__(self, provider: str, model: str, base_url: str, api_key: Optional[str]):
+        self.provider = provider
+        self.model = model
+        self.base_url = base_url
+        self.api_key = api_key
+
+    def __repr__(self):
+        return f"Route({self.provider}@{self.model} via {self.base_url})"
+
+
+class ReplicaStats:
+    """Recent latency and health of one replica URL."""
+
+    def __init__(self):
+        self.latency: Optional[float] = None
+        self.measured_at = 0.0
+        self.probed_at = 0.0
+        self.failures = 0
+        self.down_until = 0.0
+        self.requests = 0
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+    @property
+    def stale(self) -> bool:
+        """True if never measured or last measured more than LATENCY_TTL ago."""
+        return self.latency is None or time.monotonic() - self.measured_at >= LATENCY_TTL
+
+    @property
+    def needs_measurement(self) -> bool:
+        """Never measured, or stale and not re-measured within the last LATENCY_TTL."""
+        return self.latency is None or (
+            self.stale and time.monotonic() - self.probed_at >= LATENCY_TTL)
+
+    def record(self, latency: Optional[float], ok: bool):
+        self.requests += 1
+        if ok:
+            self.failures = 0
+            if latency is not None:
+                # A sample after a long gap replaces the old average instead of blending in
+                self.latency = latency if self.stale else (
+                    EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * self.latency)
+                self.measured_at = time.monotonic()
+        else:
+            self.failures += 1
+            if self.failures >= FAILURE_THRESHOLD:
+                self.down_until = time.monotonic() + COOLDOWN
+
+
+class ModelRouter:
+    """Latency-aware resolver for 'provider@model' names and bare model aliases.
+
+    Args:
+        configs: Provider configurations, defaults to PROVIDER_CONFIGS plus
+            ROUTER_ENDPOINTS
+        api_key_getter: Callable returning the API key for a provider id
+    """
+
+    def __init__(self, configs: Optional[Dict[str, dict]] = None, api_key_getter=None):
+        self.configs = configs if configs is not None else {**PROVIDER_CONFIGS,
+                                                             **ROUTER_ENDPOINTS}
+        self.api_key_getter = api_key_getter or get_provider_api_key
+        self._keys: Dict[str, Optional[str]] = {}
+        self._models: Dict[str, Tuple[float, List[str]]] = {}
+        self._replicas: Dict[str, ReplicaStats] = {}
+
+    def api_key(self, provider: str) -> Optional[str]:
+        if provider not in self._keys:
+            needs_key = self.configs[provider].get('needs_api_key', True)
+            self._keys[provider] = self.api_key_getter(provider) if needs_key else 'none'
+        return self._keys[provider]
+
+    def replicas(self, provider: str) -> List[str]:
+        """Base URLs of a provider, empty if it has no OpenAI-compatible endpoint."""
+        config = self.configs.get(provider) or {}
+        urls = [config['openai_base_url']] if config.get('openai_base_url') else []
+        urls += config.get('replicas', [])
+        return [url.rstrip('/') for url in urls]
+
+    def served_models(self, provider: str, fetch: bool = True) -> List[str]:
+        """Models of a provider from its config, else from its /models endpoint.
+
+        Args:
+            provider: Provider id
+            fetch: Whether a missing or expired list may be fetched. Fetching
+                blocks, so callers on an event loop pass False and get the
+                last fetched list (or just the default model) instead, and
+                refresh with refresh_models() on a worker thread.
+        """
+        config = self.configs.get(provider) or {}
+        if config.get('models'):
+            return list(config['models'])
+        cached = self._models.get(provider)
+        if cached and (not fetch or time.monotonic() - cached[0] < MODELS_TTL):
+            return cached[1]
+
+        models = [config['default_model']] if config.get('default_model') else []
+        if not fetch:
+            return models
+        for base_url in self.replicas(provider):
+            try:
+                response = requests.get(f"{base_url}/models", timeout=10, headers={
+                    'Authorization': f"Bearer {self.api_key(provider) or 'none'}"})
+                response.raise_for_status()
+                models = sorted(set(models) | {m['id'] for m in response.json().get('data', [])})
+                break
+            except Exception as e:
+                logger.warning(f"Could not list models of {provider} at {base_url}: {e}")
+        self._models[provider] = (time.monotonic(), models)
+        return models
+
+    def refresh_models(self):
+        """Fetch every expired /models list now; blocking, run it off the event loop."""
+        for provider in self.configs:
+            if self.replicas(provider):
+                self.served_models(provider)
+
+    def candidates(self, name: str, fetch: bool = True) -> List[Tuple[str, str, str]]:
+        """All (provider, model, base_url) replicas that can serve a model name."""
+        provider, model = parse_model_name(name)
+        if provider is not None:
+            if provider not in self.configs:
+                raise ValueError(f"Unknown provider '{provider}' in '{name}'")
+            providers = [provider]
+        else:
+            providers = [p for p in self.configs
+                         if self.replicas(p) and model in self.served_models(p, fetch)]
+        return [(p, model, url) for p in providers for url in self.replicas(p)]
+
+    def resolve(self, name: str, fetch: bool = True) -> Route:
+        """Pick the fastest healthy replica for a model name.
+
+        Args:
+            name: 'provider@model' or a bare model alias
+            fetch: Whether model lists may be fetched, see served_models()
+
+        Raises:
+            ValueError: No configured provider serves the model
+        """
+        candidates = self.candidates(name, fetch)
+        if not candidates:
+            raise ValueError(f"No provider with an OpenAI-compatible endpoint serves '{name}'")
+
+        healthy = [c for c in candidates if self.stats(c[2], c[1]).healthy] or candidates
+
+        def speed(candidate):
+            stats = self.stats(candidate[2], candidate[1])
+            # Unmeasured and stale replicas sort first so each gets a measurement
+            return (not stats.needs_measurement, stats.latency or 0.0)
+
+        provider, model, base_url = min(healthy, key=speed)
+        stats = self.stats(base_url, model)
+        if stats.latency is not None and stats.needs_measurement:
+            # One request re-measures it; the others keep using the fastest replica
+            stats.probed_at = time.monotonic()
+        return Route(provider, model, base_url, self.api_key(provider))
+
+    def stats(self, base_url: str, model: str) -> ReplicaStats:
+        key = f"{base_url}|{model}"
+        if key not in self._replicas:
+            self._replicas[key] = ReplicaStats()
+        return self._replicas[key]
+
+    def record(self, route: Route, latency: Optional[float], ok: bool = True):
+        """Report how a request on `route` went; latency in seconds (e.g. TTFT)."""
+        self.stats(route.base_url, route.model).record(latency, ok)
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Current latency and health per replica and model."""
+        return {key: {'latency': stats.latency, 'healthy': stats.healthy,
+                      'failures': stats.failures, 'requests': stats.requests}
+                for key, stats in self._replicas.items()}
@@ -0,0 +1,306 @@
+"""
+Near-duplicate detection for news articles with MinHash and LSH banding.
+
+Syndicated news reappears with a different headline, an agency tag or a
+slightly edited first sentence, so exact hashes of the text miss it. Here
+each article becomes a set of word shingles (3-word windows). Articles
+whose shingle sets have a Jaccard similarity of at least `threshold` are
+near-duplicates.
+
+Comparing every pair is quadratic, so candidates come from MinHash
+signatures instead:
+
+- one-permutation MinHash: every shingle is hashed once and kept as the
+  minimum of one of NUM_PERM bins, so a signature costs one pass over the
+  shingles. Empty bins borrow from the next filled one (densification).
+- LSH banding: the signature is cut into bands. Articles sharing any band
+  bucket become candidates. Bands and rows are chosen so that pairs at the
+  threshold are very likely to collide.
+- candidates are confirmed with the exact Jaccard similarity of their
+  shingle sets, so false positives from the LSH never remove an article
+
+Only the first MAX_WORDS words of an article are shingled, so work per
+article is bounded apart from the few candidates it collides with, and a
+batch of n articles costs roughly O(n).
+
+Benchmark against the md5 check that filter_articles used before:
+
+    python near_duplicates.py --articles 5000 --copies 2
+"""
+
+import argparse
+import hashlib
+import random
+import re
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+SHINGLE_SIZE = 3  # words per shingle
+NUM_PERM = 64  # MinHash bins per signature
+MAX_WORDS = 400  # words of an article compared, enough to recognize a copy
+DEFAULT_THRESHOLD = 0.6  # Jaccard similarity from which articles count as duplicates
+FALSE_NEGATIVE_WEIGHT = 0.8  # LSH tuning: missed duplicates cost more than extra candidates
+
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+HASH_MASK = (1 << 64) - 1
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE, max_words: int = MAX_WORDS) -> Set[int]:
+    """Hashed word n-grams of the first `max_words` words of the lowercased text.
+
+    Python's hash is salted per process, which is fine here: hashes are
+    only compared within one batch.
+    """
+    words = WORD_PATTERN.findall(text.lower())[:max_words]
+    if len(words) < size:
+        return {hash(tuple(words)) & HASH_MASK} if words else set()
+    return {hash(gram) & HASH_MASK for gram in zip(*(words[i:] for i in range(size)))}
+
+
+def signature(shingle_set: Set[int], num_perm: int = NUM_PERM) -> Optional[List[Tuple[int, int]]]:
+    """One-permutation MinHash signature, None for an empty set.
+
+    Each entry is (bin minimum, distance to the bin it was borrowed from),
+    so densified bins only match bins densified from the same place.
+    """
+    if not shingle_set:
+        return None
+    empty = HASH_MASK
+    bins = [empty] * num_perm
+    for h in shingle_set:
+        index = h % num_perm
+        value = h // num_perm
+        if value < bins[index]:
+            bins[index] = value
+    result: List[Tuple[int, int]] = []
+    for i in range(num_perm):
+        distance = 0
+        while bins[(i + distance) % num_perm] == empty:
+            distance += 1
+        result.append((bins[(i + distance) % num_perm], distance))
+    return result
+
+
+def _collision_probability(similarity: float, bands: int, rows: int) -> float:
+    return 1 - (1 - similarity ** rows) ** bands
+
+
+def lsh_params(threshold: float, num_perm: int = NUM_PERM,
+               false_negative_weight: float = FALSE_NEGATIVE_WEIGHT) -> Tuple[int, int]:
+    """(bands, rows) minimizing weighted false positive and negative mass around `threshold`."""
+    steps = 100
+    best, best_error = (num_perm, 1), float('inf')
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        below = sum(_collision_probability(threshold * i / steps, bands, rows)
+                    for i in range(steps)) * threshold / steps
+        above = sum(1 - _collision_probability(threshold + (1 - threshold) * i / steps, bands, rows)
+                    for i in range(steps)) * (1 - threshold) / steps
+        error = (1 - false_negative_weight) * below + false_negative_weight * above
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+
+def jaccard(a: Set[int], b: Set[int]) -> float:
+    if not a or not b:
+        return 0.0
+    if len(a) > len(b):
+        a, b = b, a
+    common = sum(1 for h in a if h in b)
+    return common / (len(a) + len(b) - common)
+
+
+class NearDuplicateIndex:
+    """Streaming index: add texts one by one and learn which ones repeat an earlier one.
+
+    Args:
+        threshold: Jaccard similarity from which two texts are duplicates
+        num_perm: MinHash bins per signature
+        shingle_size: Words per shingle
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, num_perm: int = NUM_PERM,
+                 shingle_size: int = SHINGLE_SIZE):
+        if not 0 < threshold <= 1:
+            raise ValueError(f"threshold must be in (0, 1], got {threshold}")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = lsh_params(threshold, num_perm)
+        self._buckets: List[Dict[Tuple, List[int]]] = [defaultdict(list) for _ in range(self.bands)]
+        self._shingles: Dict[int, Set[int]] = {}
+        self.candidates_checked = 0
+
+    def _band_keys(self, sig: List[Tuple[int, int]]) -> List[Tuple]:
+        rows = self.rows
+        return [tuple(sig[band * rows:(band + 1) * rows]) for band in range(self.bands)]
+
+    def find(self, text: str) -> Tuple[Optional[int], Set[int], List[Tuple]]:
+        """(id of the most similar indexed duplicate or None, shingles, band keys)."""
+        shingle_set = shingles(text, self.shingle_size)
+        sig = signature(shingle_set, self.num_perm)
+        if sig is None:
+            return None, shingle_set, []
+        keys = self._band_keys(sig)
+        seen: Set[int] = set()
+        best, best_similarity = None, self.threshold
+        for buckets, key in zip(self._buckets, keys):
+            for other in buckets.get(key, ()):
+                if other in seen:
+                    continue
+                seen.add(other)
+                self.candidates_checked += 1
+                similarity = jaccard(shingle_set, self._shingles[other])
+                if similarity >= best_similarity:
+                    best, best_similarity = other, similarity
+        return best, shingle_set, keys
+
+    def add(self, item_id: int, text: str) -> Optional[int]:
+        """Index `text` unless it duplicates an indexed text; returns that text's id then."""
+        duplicate_of, shingle_set, keys = self.find(text)
+        if duplicate_of is not None:
+            return duplicate_of
+        if keys:
+            self._shingles[item_id] = shingle_set
+            for buckets, key in zip(self._buckets, keys):
+                buckets[key].append(item_id)
+        return None
+
+
+def find_near_duplicates(texts: Sequence[str], threshold: float = DEFAULT_THRESHOLD,
+                         num_perm: int = NUM_PERM) -> List[Optional[int]]:
+    """For each text the index of the earlier kept text it duplicates, else None.
+
+    Texts are processed in order and the first of a group is kept, like an
+    exact-hash "seen" set would do.
+    """
+    index = NearDuplicateIndex(threshold, num_perm)
+    return [index.add(i, text) for i, text in enumerate(texts)]
+
+
+def article_text(article: Dict) -> str:
+    """The text compared for an article: title and body."""
+    return f"{article.get('title', '')}\n{article.get('body', '')}"
+
+
+# --- Benchmark -------------------------------------------------------------
+
+def md5_duplicates(articles: List[Dict]) -> List[Optional[int]]:
+    """The previous filter_articles check: md5 of title plus the first 100 body characters."""
+    seen: Dict[str, int] = {}
+    result: List[Optional[int]] = []
+    for i, article in enumerate(articles):
+        digest = hashlib.md5(
+            (article.get('title', '') + article['body'][:100]).lower().encode()
+        ).hexdigest()
+        result.append(seen.get(digest))
+        seen.setdefault(digest, i)
+    return result
+
+
+def brute_force_duplicates(articles: List[Dict], threshold: float) -> List[Optional[int]]:
+    """Exact pairwise Jaccard against every kept article, O(n^2)."""
+    kept: List[Tuple[int, Set[int]]] = []
+    result: List[Optional[int]] = []
+    for i, article in enumerate(articles):
+        shingle_set = shingles(article_text(article))
+        match = next((j for j, other in kept if jaccard(shingle_set, other) >= threshold), None)
+        result.append(match)
+        if match is None:
+            kept.append((i, shingle_set))
+    return result
+
+
+def synthetic_articles(count: int, copies: int, edit_rate: float, exact_share: float, seed: int):
+    """Distinct articles plus syndicated copies with new headlines and small edits.
+
+    A share of the copies is republished verbatim, which md5 can catch too.
+
+    Returns:
+        (articles, original index of each article)
+    """
+    rng = random.Random(seed)
+    vocabulary = [''.join(rng.choices('abcdefghijklmnopqrstuvwxyzäöü', k=rng.randint(3, 10)))
+                  for _ in range(20000)]
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]  # Zipf-like word frequencies
+
+    def words(n):
+        return rng.choices(vocabulary, weights=weights, k=n)
+
+    articles, origin = [], []
+    for i in range(count):
+        title = ' '.join(words(rng.randint(6, 12)))
+        body = ' '.join(words(rng.randint(150, 400)))
+        original = {'title': title, 'body': body, 'source': f"site{i % 50}"}
+        articles.append(original)
+        origin.append(i)
+        for _ in range(copies):
+            if rng.random() < exact_share:
+                articles.append(dict(original))
+                origin.append(i)
+                continue
+            body_words = body.split()
+            for _ in range(int(len(body_words) * edit_rate)):
+                body_words[rng.randrange(len(body_words))] = rng.choice(vocabulary)
+            agency = rng.choice(['(dpa)', '(APA)', '(Reuters)', '(AFP)'])
+            articles.append({'title': ' '.join(words(rng.randint(6, 12))),
+                             'body': f"{agency} " + ' '.join(body_words),
+                             'source': f"syndicated{rng.randint(0, 50)}"})
+            origin.append(i)
+    order = list(range(len(articles)))
+    rng.shuffle(order)
+    return [articles[i] for i in order], [origin[i] for i in order]
+
+
+def score(duplicate_of: List[Optional[int]], origin: List[int]) -> Dict[str, int]:
+    """Duplicates removed, of them correct, and duplicates present in the batch."""
+    groups = defaultdict(int)
+    for group in origin:
+        groups[group] += 1
+    expected = sum(size - 1 for size in groups.values())
+    removed = [i for i, match in enumerate(duplicate_of) if match is not None]
+    correct = sum(1 for i in removed if origin[i] == origin[duplicate_of[i]])
+    return {'expected': expected, 'removed': len(removed), 'correct': correct}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark near-duplicate detection against md5')
+    parser.add_argument('--articles', type=int, default=2000, help='Distinct articles')
+    parser.add_argument('--copies', type=int, default=1, help='Syndicated copies per article')
+    parser.add_argument('--edit-rate', type=float, default=0.02,
+                        help='Share of body words replaced in a copy')
+    parser.add_argument('--exact-share', type=float, default=0.2,
+                        help='Share of copies republished verbatim')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument('--brute-force-limit', type=int, default=3000,
+                        help='Also run the O(n^2) exact check up to this many articles')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    articles, origin = synthetic_articles(args.articles, args.copies, args.edit_rate,
+                                          args.exact_share, args.seed)
+    bands, rows = lsh_params(args.threshold)
+    print(f"{len(articles)} articles, {args.articles} distinct, threshold {args.threshold}, "
+          f"LSH {bands} bands x {rows} rows")
+
+    methods = [('md5 title+body[:100]', md5_duplicates),
+               ('minhash lsh', lambda arts: find_near_duplicates(
+                   [article_text(a) for a in arts], args.threshold))]
+    if len(articles) <= args.brute_force_limit:
+        methods.append(('exact pairwise jaccard',
+                        lambda arts: brute_force_duplicates(arts, args.threshold)))
+
+    print(f"{'method':<24} {'seconds':>8} {'removed':>8} {'correct':>8} {'recall':>7}")
+    for name, method in methods:
+        started = time.perf_counter()
+        result = method(articles)
+        elapsed = time.perf_counter() - started
+        stats = score(result, origin)
+        recall = stats['correct'] / stats['expected'] if stats['expected'] else 1.0
+        print(f"{name:<24} {elapsed:8.3f} {stats['removed']:8d} {stats['correct']:8d} {recall:7.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,283 @@
+"""
+SQLite cache for uniiduck news search results and summaries.
+
+One database file (WAL mode) replaces the directory of JSON files:
+
+- queries: one row per (topic, params) with the fetch time, indexed, so a
+  lookup is a single indexed query instead of a stat plus a JSON parse
+- articles: one row per article, keyed by URL (or a hash of title, source
+  and date). An article returned for several topics is stored once.
+- query_articles: which articles a query returned, in order
+- summaries: generated summaries keyed by a hash of everything that
+  determines them (articles, provider, model, length, prompt version)
+
+Queries and summaries older than `retention` are evicted, and once the
+store exceeds `max_queries` or `max_bytes` of article data the least
+recently used queries go first. Articles no longer referenced by any query are deleted with them.
+Summaries are capped at `max_summaries`, least recently used first.
+
+Example:
+    cache = NewsCache('.cache/news.sqlite3')
+    articles = cache.get('KI', {'max_results': 5}, max_age=1800)
+    if articles is None:
+        articles = search_news('KI', token, 5)
+        cache.put('KI', {'max_results': 5}, articles)
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CACHE_RETENTION = 7 * 24 * 3600  # seconds before a query is evicted regardless of use
+CACHE_MAX_QUERIES = 5000  # cached (topic, params) results
+CACHE_MAX_BYTES = 64 * 1024 * 1024  # total JSON bytes of stored articles
+CACHE_MAX_SUMMARIES = 2000  # cached summaries
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS queries (
+    id INTEGER PRIMARY KEY,
+    topic TEXT NOT NULL,
+    params TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (topic, params)
+);
+CREATE INDEX IF NOT EXISTS queries_fetched_at ON queries (fetched_at);
+CREATE INDEX IF NOT EXISTS queries_last_used ON queries (last_used);
+
+CREATE TABLE IF NOT EXISTS articles (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    data TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS query_articles (
+    query_id INTEGER NOT NULL REFERENCES queries (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    article_id INTEGER NOT NULL REFERENCES articles (id),
+    PRIMARY KEY (query_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS query_articles_article ON query_articles (article_id);
+
+CREATE TABLE IF NOT EXISTS summaries (
+    key TEXT PRIMARY KEY,
+    topic TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    model TEXT NOT NULL,
+    text TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS summaries_created_at ON summaries (created_at);
+CREATE INDEX IF NOT EXISTS summaries_last_used ON summaries (last_used);
+"""
+
+
+def canonical_params(params: Optional[Dict]) -> str:
+    """Search parameters as a stable string: sorted keys, no whitespace."""
+    return json.dumps(params or {}, sort_keys=True, separators=(',', ':'))
+
+
+def article_key(article: Dict) -> str:
+    """Identity of an article across topics: its URL, else title, source and date."""
+    url = article.get('url') or article.get('link') or article.get('href')
+    if url:
+        return url
+    identity = '\x00'.join(str(article.get(field, '')) for field in ('title', 'source', 'date'))
+    return 'sha1:' + hashlib.sha1(identity.encode('utf-8')).hexdigest()
+
+
+class NewsCache:
+    """Search results cached in one SQLite file, safe to share between threads.
+
+    Args:
+        path: Database file, created if missing
+        retention: Seconds after which a query is evicted even if still used
+        max_queries: Most cached queries kept; least recently used go first
+        max_bytes: Most article bytes kept; least recently used queries go first
+        max_summaries: Most summaries kept; least recently used go first
+    """
+
+    def __init__(self, path: str, retention: float = CACHE_RETENTION,
+                 max_queries: int = CACHE_MAX_QUERIES, max_bytes: int = CACHE_MAX_BYTES,
+                 max_summaries: int = CACHE_MAX_SUMMARIES):
+        self.path = path
+        self.retention = retention
+        self.max_queries = max_queries
+        self.max_bytes = max_bytes
+        self.max_summaries = max_summaries
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('PRAGMA foreign_keys=ON')
+        self._db.executescript(SCHEMA)
+
+    def get(self, topic: str, params: Optional[Dict] = None,
+            max_age: Optional[float] = None) -> Optional[List[Dict]]:
+        """Cached articles for a search, None if missing or older than `max_age` seconds."""
+        entry = self.lookup(topic, params)
+        if entry is None:
+            return None
+        articles, fetched_at = entry
+        if max_age is not None and time.time() - fetched_at >= max_age:
+            return None
+        return articles
+
+    def lookup(self, topic: str, params: Optional[Dict] = None):
+        """(articles, fetched_at) for a search regardless of age, None if not cached."""
+        with self._lock:
+            rows = self._db.execute(
+                """
+                SELECT q.id, q.fetched_at, a.data
+                FROM queries q
+                LEFT JOIN query_articles qa ON qa.query_id = q.id
+                LEFT JOIN articles a ON a.id = qa.article_id
+                WHERE q.topic = ? AND q.params = ?
+                ORDER BY qa.position
+                """,
+                (topic, canonical_params(params))).fetchall()
+            if not rows:
+                return None
+            self._db.execute('UPDATE queries SET last_used = ?, hits = hits + 1 WHERE id = ?',
+                             (time.time(), rows[0][0]))
+        return [json.loads(data) for _, _, data in rows if data is not None], rows[0][1]
+
+    def put(self, topic: str, params: Optional[Dict], articles: List[Dict],
+            fetched_at: Optional[float] = None):
+        """Store the result of a search, replacing an older result for it."""
+        now = time.time()
+        fetched_at = now if fetched_at is None else fetched_at
+        with self._lock:
+            db = self._db
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                # Upsert then SELECT instead of RETURNING, which needs SQLite 3.35
+                params_text = canonical_params(params)
+                db.execute(
+                    """
+                    INSERT INTO queries (topic, params, fetched_at, last_used) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (topic, params) DO UPDATE
+                    SET fetched_at = excluded.fetched_at, last_used = excluded.last_used
+                    """,
+                    (topic, params_text, fetched_at, now))
+                query_id = db.execute('SELECT id FROM queries WHERE topic = ? AND params = ?',
+                                      (topic, params_text)).fetchone()[0]
+                db.execute('DELETE FROM query_articles WHERE query_id = ?', (query_id,))
+                for position, article in enumerate(articles):
+                    data = json.dumps(article, ensure_ascii=False, sort_keys=True)
+                    key = article_key(article)
+                    db.execute(
+                        """
+                        INSERT INTO articles (key, data, size, stored_at) VALUES (?, ?, ?, ?)
+                        ON CONFLICT (key) DO UPDATE
+                        SET data = excluded.data, size = excluded.size, stored_at = excluded.stored_at
+                        """,
+                        (key, data, len(data.encode('utf-8')), now))
+                    article_id = db.execute('SELECT id FROM articles WHERE key = ?',
+                                            (key,)).fetchone()[0]
+                    db.execute('INSERT OR IGNORE INTO query_articles (query_id, position, article_id) '
+                               'VALUES (?, ?, ?)', (query_id, position, article_id))
+                self._evict(now)
+                db.execute('COMMIT')
+            except Exception:
+                db.execute('ROLLBACK')
+                raise
+
+    def get_summary(self, key: str) -> Optional[Dict]:
+        """A cached summary as a dict with text, provider, model and created_at, or None."""
+        with self._lock:
+            row = self._db.execute(
+                'SELECT text, provider, model, created_at FROM summaries WHERE key = ?',
+                (key,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute('UPDATE summaries SET last_used = ?, hits = hits + 1 WHERE key = ?',
+                             (time.time(), key))
+        return dict(zip(('text', 'provider', 'model', 'created_at'), row))
+
+    def put_summary(self, key: str, topic: str, provider: str, model: str, text: str):
+        """Store a complete summary under `key`."""
+        now = time.time()
+        with self._lock:
+            db = self._db
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                db.execute('INSERT OR REPLACE INTO summaries '
+                           '(key, topic, provider, model, text, created_at, last_used) '
+                           'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                           (key, topic, provider, model, text, now, now))
+                self._evict(now)
+                db.execute('COMMIT')
+            except Exception:
+                db.execute('ROLLBACK')
+                raise
+
+    def _evict(self, now: float):
+        """Drop expired queries, then least recently used ones over the limits, then orphans."""
+        db = self._db
+        evicted = db.execute('DELETE FROM queries WHERE fetched_at < ?',
+                             (now - self.retention,)).rowcount
+        excess = db.execute('SELECT COUNT(*) FROM queries').fetchone()[0] - self.max_queries
+        if excess > 0:
+            evicted += db.execute(
+                'DELETE FROM queries WHERE id IN '
+                '(SELECT id FROM queries ORDER BY last_used LIMIT ?)', (excess,)).rowcount
+        self._delete_orphans()
+        while db.execute('SELECT COALESCE(SUM(size), 0) FROM articles').fetchone()[0] > self.max_bytes:
+            # Oldest tenth of the queries per round keeps this to a few statements
+            count = db.execute('SELECT COUNT(*) FROM queries').fetchone()[0]
+            if not count:
+                break
+            evicted += db.execute(
+                'DELETE FROM queries WHERE id IN '
+                '(SELECT id FROM queries ORDER BY last_used LIMIT ?)',
+                (max(1, count // 10),)).rowcount
+            self._delete_orphans()
+        if evicted:
+            logger.debug(f"Evicted {evicted} cached news queries")
+        db.execute('DELETE FROM summaries WHERE created_at < ?', (now - self.retention,))
+        db.execute('DELETE FROM summaries WHERE key IN (SELECT key FROM summaries '
+                   'ORDER BY last_used DESC LIMIT -1 OFFSET ?)', (self.max_summaries,))
+
+    def _delete_orphans(self):
+        self._db.execute('DELETE FROM articles WHERE NOT EXISTS '
+                         '(SELECT 1 FROM query_articles qa WHERE qa.article_id = articles.id)')
+
+    def evict(self):
+        """Apply retention and size limits now; put() does this on every write."""
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                self._evict(time.time())
+                self._db.execute('COMMIT')
+            except Exception:
+                self._db.execute('ROLLBACK')
+                raise
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            queries, hits = self._db.execute(
+                'SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM queries').fetchone()
+            articles, size = self._db.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM articles').fetchone()
+            links = self._db.execute('SELECT COUNT(*) FROM query_articles').fetchone()[0]
+            summaries, summary_hits = self._db.execute(
+                'SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM summaries').fetchone()
+        return {'queries': queries, 'hits': hits, 'articles': articles,
+                'article_links': links, 'article_bytes': size,
+                'summaries': summaries, 'summary_hits': summary_hits}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
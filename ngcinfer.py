@@ -7,6 +7,19 @@ from uniinfer import (
 )
 from credgoo import get_api_key
 from providers_config import PROVIDER_CONFIGS
+from prompt_templates import PromptTemplate, format_prefix_report
+
+# Static instruction first, the user's text last, so the prefix stays cacheable
+PROMPTS = {
+    "q": PromptTemplate("ngc.q"),
+    "s": PromptTemplate("ngc.s", "Write a one paragraph summary for this article:"),
+    "l": PromptTemplate("ngc.l", "Write a long elaborative summary spanning over several "
+                                 "paragraphs for this article:"),
+    "t": PromptTemplate("ngc.t", "Write a short tweet pointing to this article in the "
+                                 "articles original language:"),
+    "b": PromptTemplate("ngc.b", "Write a bullet list summarizing this article in the "
+                                 "articles original language:"),
+}
 
 
 def invoke_api(provider_name, model_parameters, user_input, choice="q"):
@@ -26,16 +39,7 @@ def invoke_api(provider_name, model_parameters, user_input, choice="q"):
         account_id=PROVIDER_CONFIGS.get(provider_name, {}).get(
             'extra_params', {}).get('account_id', None)
     )
-    if choice == "q":
-        model_input = user_input
-    elif choice == "s":
-        model_input = "Write a one paragraph summary for this article: "+user_input
-    elif choice == "l":
-        model_input = "Write a long elaborative summary spanning over several paragraphs for this article: "+user_input
-    elif choice == "t":
-        model_input = "Write a short tweet pointing to this article in the articles original language: "+user_input
-    elif choice == "b":
-        model_input = "Write a bullet list summarizing this article in the articles original language: "+user_input
+    model_input = PROMPTS[choice].render(user_input)
 
     # Create a chat request
     messages = [ChatMessage(role="user", content=model_input)]
@@ -125,6 +129,7 @@ def main():
             choice = input(
                 f"Enter a question (q), short summary (s), long summary (l), tweet (t), bullet list (b), or exit (e): ")
             if choice == "e":
+                print(format_prefix_report())
                 break
             elif choice == "q" or choice == "s" or choice == "l" or choice == "t" or choice == "b":
                 user_input = input(f"{choice}: ")
@@ -2,14 +2,20 @@
 # OPENAI_BASE=
 # OPENAI_KEY=
 
-import tty
-import termios
-import sys
+import argparse
+import asyncio
 import itertools
+import json
 import os
+import random
+import sys
+import time
 import openai
 from dotenv import load_dotenv
 
+from latency_stats import percentile
+from model_router import MODELS_TTL, ModelRouter
+
 load_dotenv()
 OPENAI_BASE = os.getenv("OPENAI_BASE")
 OPENAI_KEY = os.getenv("OPENAI_KEY")
@@ -40,85 +46,291 @@ Sample_Prompts = [
     "Wie funktioniert ein Schwarzes Loch? Erkläre es einem Kind",
 ]
 
-# write a script that runs an arbitrary sample prompt against a model (round robin)
+# Load generator for any OpenAI-compatible endpoint.
+#   closed loop: a fixed number of workers, each sends its next request as soon
+#                as the previous one finished (--concurrency)
+#   open loop:   requests arrive at a target rate (Poisson arrivals) no matter
+#                how fast the endpoint answers (--rate)
+# Models are picked from a weighted mix, e.g. --model tu@deepseek-r1=3 --model tu@qwen-32b=1
+# With --route the provider@model names are resolved client side by model_router
+# instead of by the --base-url endpoint: each request goes to the fastest healthy
+# replica, and its ttft (or total time on failure) is fed back to the router.
 
-# Load environment variables
-# OPENAI_BASE = os.getenv("OPENAI_BASE")
-# OPENAI_KEY = os.getenv("OPENAI_KEY")
 
-# Initialize OpenAI client
-client = openai.OpenAI(
-    base_url=OPENAI_BASE,
-    api_key=OPENAI_KEY
-)
+def create_client(base_url=OPENAI_BASE, api_key=OPENAI_KEY, timeout=120):
+    """Async client shared by all workers, connections are pooled."""
+    return openai.AsyncOpenAI(base_url=base_url, api_key=api_key or "EMPTY",
+                              timeout=timeout, max_retries=0)
 
 
-def getch():
-    """
-    Waits for a single character input from the user without requiring Enter.
-    """
-    fd = sys.stdin.fileno()
-    old_settings = termios.tcgetattr(fd)
-    try:
-        tty.setraw(sys.stdin.fileno())
-        ch = sys.stdin.read(1)
-    finally:
-        termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
-    return ch
+def parse_model_mix(values):
+    """Turn ['a=3', 'b'] into [('a', 3.0), ('b', 1.0)]."""
+    mix = []
+    for value in values:
+        name, sep, weight = value.rpartition('=')
+        if not sep:
+            name, weight = value, '1'
+        mix.append((name, float(weight)))
+    return mix
 
 
-def run_prompt_against_model(model_name, prompt):
+async def run_request(client, model_name, prompt, max_tokens=None, messages=None):
     """
-    Runs a single prompt against a specified model using the OpenAI API.
+    Sends one streamed chat completion and measures it.
+
+    Returns a dict with ttft (time to first token), the gaps between tokens,
+    total latency and the number of streamed tokens; errors are recorded, not raised.
     """
-    print(f"\n--- Running prompt against model: {model_name} ---")
-    print(f"Prompt: {prompt}")
+    start = time.perf_counter()
+    result = {"model": model_name, "ok": False, "error": None, "ttft": None,
+              "itl": [], "total": None, "tokens": 0}
+    kwargs = {"max_tokens": max_tokens} if max_tokens else {}
     try:
-        chat_completion = client.chat.completions.create(
+        stream = await client.chat.completions.create(
             model=model_name,
-            messages=[
-                {"role": "user", "content": prompt}
-            ],
-            stream=True
+            messages=messages or [{"role": "user", "content": prompt}],
+            stream=True,
+            **kwargs
         )
-        full_response_content = ""
-        for chunk in chat_completion:
-            if chunk.choices[0].delta.content is not None:
-                print(chunk.choices[0].delta.content, end="")
-                full_response_content += chunk.choices[0].delta.content
-        print(f"\nFull Response: {full_response_content}")
-        return full_response_content
+        last = None
+        async for chunk in stream:
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+            now = time.perf_counter()
+            if last is None:
+                result["ttft"] = now - start
+            else:
+                result["itl"].append(now - last)
+            last = now
+            result["tokens"] += 1
+        result["ok"] = True
     except Exception as e:
-        print(f"Error running prompt: {e}")
-        return None
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["total"] = time.perf_counter() - start
+    return result
 
 
-import random
-def run_round_robin_prompts(models, prompts):
-    """
-    Runs sample prompts against models in a random fashion, waiting for a keypress after each.
-    Quits when 'q' is pressed.
-    """
-    if not models or not prompts:
-        print("No models or prompts available to run.")
-        return
-
-    model_iterator = itertools.cycle(models)
-
-    # Run each prompt against each model once for demonstration
-    for i in range(len(models) * len(prompts)):
-        model = next(model_iterator)
-        prompt = random.choice(prompts) # Select a random prompt
-        run_prompt_against_model(model, prompt)
-        if i < (len(models) * len(prompts)) - 1:
-            print("\nPress any key to continue (q to quit)...")
-            key = getch()
-            if key.lower() == 'q':
-                print("\nQuitting...")
+class RoutedClients:
+    """One pooled client per replica base URL, picked by a ModelRouter per request."""
+
+    def __init__(self, router, timeout=120):
+        self.router = router
+        self.timeout = timeout
+        self.clients = {}
+
+    def client_for(self, route):
+        if route.base_url not in self.clients:
+            self.clients[route.base_url] = create_client(route.base_url, route.api_key,
+                                                         self.timeout)
+        return self.clients[route.base_url]
+
+    async def close(self):
+        for client in self.clients.values():
+            await client.close()
+
+
+async def send_request(client, model_name, prompt, max_tokens=None):
+    """run_request on a plain client, or on the routed replica for RoutedClients."""
+    if not isinstance(client, RoutedClients):
+        return await run_request(client, model_name, prompt, max_tokens)
+    try:
+        # Model lists are refreshed by refresh_routes(), never on the event loop
+        route = client.router.resolve(model_name, fetch=False)
+    except ValueError as e:
+        return {"model": model_name, "ok": False, "error": f"RoutingError: {e}", "ttft": None,
+                "itl": [], "total": 0.0, "tokens": 0}
+    result = await run_request(client.client_for(route), route.model, prompt, max_tokens)
+    client.router.record(route, result["ttft"] if result["ok"] else result["total"], result["ok"])
+    result["model"] = model_name
+    result["replica"] = route.base_url
+    return result
+
+
+async def closed_loop(client, mix, prompts, concurrency, num_requests, duration, max_tokens):
+    """Keep `concurrency` requests in flight until the request or time budget is used."""
+    results = []
+    issued = itertools.count()
+    deadline = time.perf_counter() + duration if duration else None
+    names, weights = zip(*mix)
+
+    async def worker():
+        while True:
+            if num_requests and next(issued) >= num_requests:
                 return
+            if deadline and time.perf_counter() >= deadline:
+                return
+            model = random.choices(names, weights)[0]
+            results.append(await send_request(client, model, random.choice(prompts), max_tokens))
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results
+
+
+async def open_loop(client, mix, prompts, rate, num_requests, duration, max_tokens):
+    """Start requests at `rate` per second with exponential inter-arrival times."""
+    tasks = []
+    names, weights = zip(*mix)
+    start = time.perf_counter()
+    next_at = start
+    while True:
+        if num_requests and len(tasks) >= num_requests:
+            break
+        if duration and next_at - start >= duration:
+            break
+        await asyncio.sleep(max(0, next_at - time.perf_counter()))
+        model = random.choices(names, weights)[0]
+        tasks.append(asyncio.ensure_future(
+            send_request(client, model, random.choice(prompts), max_tokens)))
+        next_at += random.expovariate(rate)
+    return list(await asyncio.gather(*tasks))
+
+
+def summarize(results, wall_time):
+    """Aggregate request results into latency percentiles and throughput."""
+    ok = [r for r in results if r["ok"]]
+    tokens = sum(r["tokens"] for r in ok)
+    decode_rates = [(r["tokens"] - 1) / (r["total"] - r["ttft"]) for r in ok
+                    if r["tokens"] > 1 and r["total"] > r["ttft"]]
+
+    def dist(values):
+        return {f"p{p}": percentile(values, p) for p in (50, 95, 99)}
+
+    errors = {}
+    for r in results:
+        if r["error"]:
+            kind = r["error"].split(":", 1)[0]
+            errors[kind] = errors.get(kind, 0) + 1
+
+    return {
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "error_rate": (len(results) - len(ok)) / len(results) if results else 0.0,
+        "error_types": errors,
+        "ttft": dist([r["ttft"] for r in ok if r["ttft"] is not None]),
+        "itl": dist([gap for r in ok for gap in r["itl"]]),
+        "latency": dist([r["total"] for r in ok]),
+        "tokens_per_second_per_request": dist(decode_rates),
+        "tokens": tokens,
+        "throughput_tokens_per_second": tokens / wall_time if wall_time else 0.0,
+        "throughput_requests_per_second": len(results) / wall_time if wall_time else 0.0,
+    }
+
+
+def build_report(results, wall_time, config):
+    """Overall and per-model summaries as one JSON-serializable dict."""
+    per_model = {}
+    for r in results:
+        per_model.setdefault(r["model"], []).append(r)
+    return {
+        "config": config,
+        "wall_time": wall_time,
+        "overall": summarize(results, wall_time),
+        "models": {model: summarize(rs, wall_time) for model, rs in sorted(per_model.items())},
+    }
+
+
+def print_table(report):
+    """Terminal table: one row per model plus the overall row, latencies in ms."""
+    def ms(value):
+        return f"{value * 1000:8.0f}" if value is not None else f"{'-':>8}"
+
+    header = (f"{'model':<28} {'reqs':>5} {'err%':>6} {'ttft50':>8} {'ttft95':>8} {'ttft99':>8} "
+              f"{'itl50':>8} {'itl99':>8} {'lat50':>8} {'lat99':>8} {'tok/s':>8}")
+    print(header)
+    print("-" * len(header))
+    rows = list(report["models"].items()) + [("ALL", report["overall"])]
+    for name, s in rows:
+        tps = s["tokens_per_second_per_request"]["p50"]
+        print(f"{name[:28]:<28} {s['requests']:>5} {s['error_rate'] * 100:>6.1f} "
+              f"{ms(s['ttft']['p50'])} {ms(s['ttft']['p95'])} {ms(s['ttft']['p99'])} "
+              f"{ms(s['itl']['p50'])} {ms(s['itl']['p99'])} "
+              f"{ms(s['latency']['p50'])} {ms(s['latency']['p99'])} "
+              f"{tps if tps is not None else 0:8.1f}")
+    overall = report["overall"]
+    print(f"\nwall time {report['wall_time']:.1f}s, "
+          f"{overall['throughput_requests_per_second']:.2f} req/s, "
+          f"{overall['throughput_tokens_per_second']:.1f} tok/s aggregate")
+
+
+async def refresh_routes(router):
+    """Refetch the router's /models lists on a worker thread as they expire."""
+    while True:
+        await asyncio.sleep(MODELS_TTL)
+        await asyncio.to_thread(router.refresh_models)
+
+
+async def run_load(args):
+    mix = parse_model_mix(args.model or Models)
+    if args.route:
+        client = RoutedClients(ModelRouter())
+        for name, _ in mix:
+            # Warm the /models lookups outside the event loop's hot path
+            try:
+                await asyncio.to_thread(client.router.candidates, name)
+            except ValueError as e:
+                print(f"Warning: {e}")
+        refresher = asyncio.create_task(refresh_routes(client.router))
+    else:
+        client = create_client(args.base_url, args.api_key)
+    start = time.perf_counter()
+    try:
+        if args.rate:
+            results = await open_loop(client, mix, Sample_Prompts, args.rate,
+                                      args.requests, args.duration, args.max_tokens)
+        else:
+            results = await closed_loop(client, mix, Sample_Prompts, args.concurrency,
+                                        args.requests, args.duration, args.max_tokens)
+    finally:
+        if args.route:
+            refresher.cancel()
+        await client.close()
+    wall_time = time.perf_counter() - start
+    config = {"mode": "open" if args.rate else "closed", "rate": args.rate,
+              "concurrency": None if args.rate else args.concurrency,
+              "requests": args.requests, "duration": args.duration,
+              "models": dict(mix), "base_url": None if args.route else args.base_url}
+    report = build_report(results, wall_time, config)
+    if args.route:
+        report["routes"] = client.router.snapshot()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load generator for OpenAI-compatible endpoints")
+    parser.add_argument("--base-url", default=OPENAI_BASE, help="API base URL (OPENAI_BASE)")
+    parser.add_argument("--api-key", default=OPENAI_KEY, help="API key (OPENAI_KEY)")
+    parser.add_argument("-m", "--model", action="append", metavar="MODEL[=WEIGHT]",
+                        help="Model in the mix, repeatable; defaults to all Models equally")
+    parser.add_argument("-c", "--concurrency", type=int, default=4,
+                        help="Closed loop: requests kept in flight")
+    parser.add_argument("-r", "--rate", type=float, default=None,
+                        help="Open loop: arrivals per second (overrides --concurrency)")
+    parser.add_argument("-n", "--requests", type=int, default=None,
+                        help="Stop after this many requests")
+    parser.add_argument("-d", "--duration", type=float, default=None,
+                        help="Stop starting requests after this many seconds")
+    parser.add_argument("--route", action="store_true",
+                        help="Resolve provider@model names via model_router instead of --base-url")
+    parser.add_argument("--max-tokens", type=int, default=256, help="max_tokens per request")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for model/prompt choice")
+    parser.add_argument("--json", metavar="PATH", help="Also write the report as JSON here")
+    args = parser.parse_args()
+
+    if not args.requests and not args.duration:
+        args.requests = len(args.model or Models) * len(Sample_Prompts)
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    report = asyncio.run(run_load(args))
+    print_table(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
 
 
 if __name__ == "__main__":
-    print("Starting random prompt execution...")
-    run_round_robin_prompts(Models, Sample_Prompts)
-    print("Random execution finished.")
+    main()
@@ -1,6 +1,23 @@
 import asyncio
 import argparse
 from ollama import AsyncClient
+from prompt_templates import PromptTemplate, format_prefix_report
+
+# Instructions (including "return only ...") go before the text, so every
+# request of a command shares a byte-identical, cacheable prefix
+PROMPTS = {
+    '/q': PromptTemplate('ollama./q'),
+    '/s': PromptTemplate('ollama./s', 'Write a one paragraph summary for this article:',
+                         content_header='BEGIN_OF_ARTICLE:\n', suffix='\nEND_OF_ARTICLE.'),
+    '/l': PromptTemplate('ollama./l', 'Write a long summary for this article:',
+                         content_header='BEGIN_OF_ARTICLE:\n', suffix='\nEND_OF_ARTICLE.'),
+    '/t': PromptTemplate('ollama./t', 'Write a short engaging tweet pointing to this article, '
+                                      'use emojis if appropriate. Return only the tweet.',
+                         content_header='BEGIN_OF_ARTICLE:\n', suffix='\nEND_OF_ARTICLE.'),
+    '/n': PromptTemplate('ollama./n', 'Improve this text for better readability. '
+                                      'Return only the improved text.',
+                         content_header='BEGIN_OF_TEXT:\n', suffix='\nEND_OF_TEXT.'),
+}
 
 
 def check_command(user_input):
@@ -19,20 +36,7 @@ def check_command(user_input):
 
 
 async def chat(command: str, user_input: str):
-    if command == '/q':
-        message = {'role': 'user', 'content': user_input}
-    elif command == '/s':
-        message = {'role': 'user', 'content': 'Write a one paragraph summary for this article:\n BEGIN_OF_ARTICLE:' +
-                   user_input + 'END_OF_ARTICLE.'}
-    elif command == '/l':
-        message = {'role': 'user', 'content': 'Write a long summary for this article:\n BEGIN_OF_ARTICLE:\n' +
-                   user_input + 'END_OF_ARTICLE.'}
-    elif command == '/t':
-        message = {'role': 'user', 'content': 'Write a short engaging tweet pointing to this article, use emojis if appropriate.:\n BEGIN_OF_ARTICLE' +
-                   user_input + '\n END_OF_ARTICLE. return only the tweet.'}
-    elif command == '/n':
-        message = {'role': 'user', 'content': 'Improve this text for better readability:\n BEGIN_OF_TEXT:\n' +
-                   user_input + '\nEND_OF_TEXT. \nreturn only the improved text.'}
+    message = {'role': 'user', 'content': PROMPTS[command].render(user_input)}
 
     ollamaClient = AsyncClient(
         host='https://amp1.mooo.com:11444'
@@ -80,4 +84,5 @@ while True:
     print(
         f'{command} chars: {str(len(user_input))},   tokens: {str(len(user_input)/4)}   {tokenpercent}%\n{user_input[:50]} ... {user_input[(len(user_input)-50):]}----\n')
     asyncio.run(chat(command, user_input))
+    print(f"\n{format_prefix_report()}")
     user_input = ''
@@ -1,5 +1,6 @@
 # Chat with an intelligent assistant in your terminal
-from openai import OpenAI
+from chat_client import ainput, get_client, print_stream, run
+from chat_history import HISTORY_TOKENS, ChatHistory
 import argparse
 from pynput import keyboard
 import threading
@@ -31,6 +32,8 @@ listener.start()
 # Parse arguments
 parser = argparse.ArgumentParser(description="Chat with an intelligent assistant in your terminal")
 parser.add_argument("--model", "-m", type=str, default="phi3", help="Model name")
+parser.add_argument("--history-tokens", type=int, default=HISTORY_TOKENS,
+                    help="Token budget for the history sent per turn; older turns are summarized")
 
 args = parser.parse_args()
 if args.model:
@@ -39,51 +42,44 @@ if args.model:
 #model="dolphin-mistral:latest"
 #model="phi3"
 
-# Point to the local server
-client = OpenAI(base_url=base_url, api_key="ollama")
-
-history = [
-    {"role": "system", "content": f"You are an intelligent uncensored assistant called {model}. You always provide well-reasoned answers that are both correct and helpful."},
-    {"role": "user", "content": "Hello, introduce yourself to someone opening this program for the first time. Be concise."},
-]
-
-while True:
-    completion = client.chat.completions.create(
-        model=model,
-        messages=history,
-        temperature=0.7,
-        stream=True,
-    )
-
-    new_message = {"role": "assistant", "content": ""}
-    
-    # for chunk in completion:
-    #     if chunk.choices[0].delta.content:
-    #         print(chunk.choices[0].delta.content, end="", flush=True)
-    #         new_message["content"] += chunk.choices[0].delta.content
-
-    for chunk in completion:
-        if chunk.choices[0].delta.content:
-            print(chunk.choices[0].delta.content, end="", flush=True)
-            new_message["content"] += chunk.choices[0].delta.content
+# Point to the local server; the connection is kept alive across turns
+client = get_client(base_url, api_key="ollama")
 
+# Old turns are summarized in the background so each request stays under the token budget
+history = ChatHistory(
+    client, model, budget=args.history_tokens,
+    system=f"You are an intelligent uncensored assistant called {model}. You always provide well-reasoned answers that are both correct and helpful.",
+)
+history.add("user", "Hello, introduce yourself to someone opening this program for the first time. Be concise.")
+
+
+def stop_requested():
+    return key_pressed
+
+
+async def main():
+    global key_pressed
+    while True:
+        # Pressing 'q' drops the connection, so the server stops generating too
+        reply = await print_stream(client, model, history.messages(), stop=stop_requested,
+                                   temperature=0.7)
+
+        # skip
         if key_pressed:
-            # print("...\n\n")
-            break
-
-    # skip
-    if key_pressed:
-        key_pressed = False
-    else:
-        history.append(new_message)
-    
-    # Uncomment to see chat history
-    # import json
-    # gray_color = "\033[90m"
-    # reset_color = "\033[0m"
-    # print(f"{gray_color}\n{'-'*20} History dump {'-'*20}\n")
-    # print(json.dumps(history, indent=2))
-    # print(f"\n{'-'*55}\n{reset_color}")
-
-    print()
-    history.append({"role": "user", "content": input("> ")})
\ No newline at end of file
+            key_pressed = False
+        else:
+            history.add("assistant", reply)
+
+        # Uncomment to see chat history
+        # import json
+        # gray_color = "\033[90m"
+        # reset_color = "\033[0m"
+        # print(f"{gray_color}\n{'-'*20} History dump {'-'*20}\n")
+        # print(json.dumps(history.messages(), indent=2))
+        # print(f"\n{'-'*55}\n{reset_color}")
+
+        print()
+        history.add("user", await ainput("> "))
+
+
+run(main())
@@ -1,16 +1,62 @@
+import argparse
+import asyncio
+import logging
+import ssl
+import time
+from datetime import datetime, timezone
+from contextlib import AsyncExitStack, asynccontextmanager
+
 from flask import Flask, request, Response
 import requests
+from requests.adapters import HTTPAdapter
 from OpenSSL import SSL
+from aiohttp import web
+
+import proxy_cache
+import proxy_upstream
+from proxy_cache import CachedResponse, ResponseCache
+from proxy_singleflight import SingleFlight, flight_key
+import proxy_balancer
+import proxy_ratelimit
+import proxy_batcher
+from proxy_batcher import EmbeddingBatcher
+from proxy_metrics import ProxyMetrics
+import proxy_requestlog
+from proxy_requestlog import RequestLogWriter
+from proxy_ratelimit import AdmissionController, AdmissionRejected
+from proxy_balancer import NoUpstreamAvailable, UpstreamPool
+from proxy_upstream import UpstreamClient, UpstreamError, UpstreamTimeout, UpstreamConnectionError
 
 app = Flask(__name__)
 TARGET_API = "https://aqueduct.ai.datalab.tuwien.ac.at"
 
+# Sync mode: one keep-alive session shared by all Flask worker threads
+session = requests.Session()
+session.mount('https://', HTTPAdapter(pool_connections=4,
+                                      pool_maxsize=proxy_upstream.POOL_SIZE_PER_HOST))
+session.mount('http://', HTTPAdapter(pool_connections=4,
+                                     pool_maxsize=proxy_upstream.POOL_SIZE_PER_HOST))
+
+# Async streaming mode settings
+CLIENT_BUFFER_LIMIT = 64 * 1024  # client write buffer before we stop reading upstream
+LOG_TAIL_BYTES = 8 * 1024  # end of each response kept to find its token usage
+CACHE_HEADER = 'X-Proxy-Cache'  # HIT, MISS or BYPASS on every async response
+COALESCED_HEADER = 'X-Proxy-Coalesced'  # LEADER or FOLLOWER on coalesced responses
+
+# Hop-by-hop headers must not be forwarded by a proxy (RFC 7230, section 6.1)
+HOP_BY_HOP_HEADERS = {
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+    'te', 'trailers', 'transfer-encoding', 'upgrade',
+}
+
+logger = logging.getLogger(__name__)
+
 @app.route('/', defaults={'path': ''}, methods=['GET', 'POST', 'PUT', 'DELETE'])
 @app.route('/<path:path>', methods=['GET', 'POST', 'PUT', 'DELETE'])
 def proxy(path):
     try:
         # Forward request to target API
-        resp = requests.request(
+        resp = session.request(
             method=request.method,
             url=f"{TARGET_API}/{path}",
             headers={key: value for key, value in request.headers if key != 'Host'},
@@ -19,14 +65,14 @@ def proxy(path):
             allow_redirects=False,
             timeout=30  # 30-second timeout
         )
-        
+
         # Build response from target API
         response = Response(resp.content, resp.status_code)
         for key, value in resp.headers.items():
             if key.lower() not in ['content-encoding', 'transfer-encoding']:
                 response.headers[key] = value
         return response
-        
+
     except requests.exceptions.Timeout:
         return "Target API timeout", 504
     except requests.exceptions.ConnectionError:
@@ -34,8 +80,617 @@ def proxy(path):
     except Exception as e:
         return f"Proxy error: {str(e)}", 500
 
+
+def forward_request_headers(headers):
+    """Headers to send upstream: everything except Host, length and hop-by-hop."""
+    return {key: value for key, value in headers.items()
+            if key.lower() not in HOP_BY_HOP_HEADERS | {'host', 'content-length'}}
+
+
+def forward_response_headers(headers):
+    """Headers to send downstream; the body is re-framed, so drop length/encoding."""
+    return {key: value for key, value in headers.items()
+            if key.lower() not in HOP_BY_HOP_HEADERS | {'content-length', 'content-encoding'}}
+
+
+def request_model(body):
+    """Model named in a JSON request body, 'none' if there is none."""
+    data = proxy_cache.parse_body(body) if body else None
+    model = data.get('model') if data else None
+    return str(model) if model else 'none'
+
+
+@web.middleware
+async def metrics_middleware(request, handler):
+    """Count, time and log every proxied request by model and status."""
+    if request.path.startswith('/_proxy/') or request.path == '/metrics':
+        return await handler(request)
+
+    metrics = request.app['metrics']
+    request['received_at'] = time.time()
+    request['started'] = time.monotonic()
+    request['body'] = await request.read()
+    request['model'] = model = request_model(request['body'])
+    metrics.in_flight.inc()
+    status = 500
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except (ConnectionResetError, asyncio.CancelledError):
+        status = 499  # client closed the request
+        raise
+    finally:
+        metrics.in_flight.dec()
+        metrics.requests.inc(model, str(status))
+        metrics.latency.observe(model, value=time.monotonic() - request['started'])
+        if 'headers_at' in request:
+            metrics.upstream_latency.observe(
+                model, request['backend'],
+                value=request['headers_at'] - request['started'] - request.get('queue_wait', 0.0))
+        if request.app['request_log'] is not None:
+            request.app['request_log'].log(request_record(request, model, status))
+
+
+def request_record(request, model, status):
+    """One structured request log line; all latencies in seconds."""
+    started = request['started']
+
+    def since(key, origin=started):
+        at = request.get(key)
+        return round(at - origin, 4) if at is not None and origin is not None else None
+
+    usage = request.get('usage') or {}
+    completion_tokens = usage.get('completion_tokens')
+    if completion_tokens is None and request.get('stream_events'):
+        completion_tokens = request['stream_events']  # about one token per SSE chunk
+
+    record = {
+        'ts': datetime.fromtimestamp(request['received_at'], timezone.utc)
+                      .isoformat(timespec='milliseconds'),
+        'method': request.method,
+        'path': request.path,
+        'model': model,
+        'status': status,
+        'stream': bool(request.get('stream_events')),
+        'prompt_tokens': usage.get('prompt_tokens'),
+        'completion_tokens': completion_tokens,
+        'latency': {
+            'total': round(time.monotonic() - started, 4),
+            'queue': round(request.get('queue_wait', 0.0), 4),
+            'upstream_headers': since('headers_at'),
+            'first_byte': since('first_byte_at'),
+        },
+        'cache': request.get('cache'),
+        'upstream': request.get('upstream'),
+    }
+    if request.app['log_bodies']:
+        record['request'] = proxy_cache.parse_body(request['body']) if request.get('body') else None
+    return record
+
+
+async def async_proxy(request):
+    """Forward a request upstream and stream the response body back as it arrives.
+
+    Upstream chunks (e.g. SSE events of a streamed chat completion) are written to
+    the client immediately instead of being buffered until the completion finishes.
+    Each write waits for the client transport to drain below CLIENT_BUFFER_LIMIT,
+    so a slow reader stops us from reading upstream and back-pressure reaches the
+    upstream TCP connection instead of piling up in proxy memory.
+    """
+    cache = request.app['cache']
+    singleflight = request.app['singleflight']
+    body = await request.read()
+
+    key = None
+    if cache is not None:
+        key = proxy_cache.request_cache_key(request.method, request.path, body,
+                                            request.headers.get('Authorization', ''))
+        if key is not None:
+            cached = await cache.get(key)
+            if cached is not None:
+                return await replay_cached(request, cached)
+    cache_status = 'BYPASS' if key is None else 'MISS'
+    request['cache'] = cache_status
+
+    try:
+        batcher = request.app['batcher']
+        if batcher is not None and request.method == 'POST' and request.path.endswith('/embeddings'):
+            data = proxy_cache.parse_body(body)
+            text = proxy_batcher.single_input(data) if data is not None else None
+            if text is not None:
+                return await proxy_batched(request, data, text, key, cache_status)
+        if singleflight is not None:
+            fkey = flight_key(request.method, str(request.rel_url), body,
+                              request.headers.get('Authorization', ''))
+            if fkey is not None:
+                return await proxy_coalesced(request, body, fkey, key, cache_status)
+        return await proxy_direct(request, body, key, cache_status)
+
+    except AdmissionRejected as e:
+        return web.Response(text=f"Rate limited: {e}", status=429,
+                            headers={'Retry-After': str(max(1, round(e.retry_after)))})
+    except UpstreamTimeout:
+        return web.Response(text="Target API timeout", status=504)
+    except NoUpstreamAvailable:
+        return web.Response(text="No healthy target API available", status=503)
+    except UpstreamConnectionError:
+        return web.Response(text="Target API connection failed", status=502)
+    except ConnectionResetError:
+        # Client went away; the upstream call was dropped on the way out
+        raise
+    except Exception as e:
+        return web.Response(text=f"Proxy error: {str(e)}", status=500)
+
+
+@asynccontextmanager
+async def open_upstream(app, method, rel_url, headers, body):
+    """Send a request to the least loaded upstream and yield its response.
+
+    Connection failures and 502/503/504 answers are retried on the next
+    upstream as long as nothing has been streamed to the client yet. If the
+    caller is cancelled or its client disconnects, the upstream connection is
+    closed instead of being returned to the pool. The response's `backend` is
+    the base URL of the upstream that answered; set its `failed` if the body
+    broke off after the caller handled the error itself, so the upstream's
+    breaker still counts the failure.
+    """
+    pool = app['balancer']
+    tried = []
+    last_error = None
+    while True:
+        try:
+            backend = pool.acquire(exclude=tried)
+        except NoUpstreamAvailable:
+            if last_error is not None:
+                raise last_error
+            raise
+        tried.append(backend.url)
+
+        stack = AsyncExitStack()
+        try:
+            upstream = await stack.enter_async_context(app['upstream'].request(
+                method, f"{backend.url}{rel_url}", headers=headers, data=body))
+            more_candidates = any(u.available and u.url not in tried for u in pool.upstreams)
+            retry = upstream.status in proxy_balancer.FAILOVER_STATUSES and more_candidates
+            if retry:
+                logger.warning(f"Upstream {backend.url} answered {upstream.status}, trying next")
+                last_error = UpstreamConnectionError(f"upstream answered {upstream.status}")
+                await upstream.close()
+        except UpstreamError as e:
+            logger.warning(f"Upstream {backend.url} failed, trying next: {e}")
+            last_error = e
+            retry = True
+        except BaseException:
+            # Cancelled (the client left before the headers) or a bug: the
+            # upstream must still be released, or its outstanding count and a
+            # half-open breaker's trial stay taken for good
+            pool.release(backend, ok=False)
+            await stack.aclose()
+            raise
+        if not retry:
+            break
+        pool.release(backend, ok=False)
+        await stack.aclose()
+
+    upstream.backend = backend.url
+    upstream.failed = False
+    ok = upstream.status not in proxy_balancer.FAILOVER_STATUSES
+    try:
+        async with stack:
+            try:
+                yield upstream
+            except (ConnectionResetError, asyncio.CancelledError):
+                # The client is gone: drop the upstream connection right away so
+                # the backend stops generating instead of finishing for nobody
+                await upstream.close()
+                raise
+    except UpstreamError:
+        ok = False
+        raise
+    finally:
+        pool.release(backend, ok=ok and not upstream.failed)
+
+
+async def admit(app, headers, body):
+    """Wait for the rate limiter to let this request go upstream; returns the wait."""
+    admission = app['admission']
+    if admission is None:
+        return 0.0
+    data = proxy_cache.parse_body(body) if body else None
+    model = str(data.get('model', '')) if data else ''
+    return await admission.admit(headers.get('Authorization', ''), model)
+
+
+async def proxy_direct(request, body, key, cache_status):
+    """Send the request upstream on its own and stream the answer back."""
+    request['queue_wait'] = await admit(request.app, request.headers, body)
+    async with open_upstream(
+        request.app,
+        request.method,
+        request.rel_url,
+        forward_request_headers(request.headers),
+        body,
+    ) as upstream:
+        request['headers_at'] = time.monotonic()
+        request['upstream'] = upstream.url
+        request['backend'] = upstream.backend
+        headers = forward_response_headers(upstream.headers)
+        # Keep a copy of the body only for cacheable successful responses
+        captured = [] if key is not None and upstream.status == 200 else None
+        response, complete = await stream_to_client(
+            request, upstream.status, upstream.reason, headers, cache_status,
+            upstream.iter_chunks(), captured)
+        upstream.failed = not complete
+        if complete and captured:
+            store_in_cache(request.app, key, upstream.status, headers, captured)
+        return response
+
+
+async def proxy_coalesced(request, body, fkey, key, cache_status):
+    """Share one upstream call among all identical in-flight requests."""
+    app = request.app
+    rel_url = request.rel_url
+    upstream_headers = forward_request_headers(request.headers)
+    method = request.method
+
+    async def fetch(flight):
+        await admit(app, upstream_headers, body)
+        async with open_upstream(app, method, rel_url, upstream_headers, body) as upstream:
+            await flight.start(upstream.status, upstream.reason,
+                               forward_response_headers(upstream.headers))
+            async for chunk in upstream.iter_chunks():
+                await flight.feed(chunk)
+        if key is not None and flight.status == 200:
+            store_in_cache(app, key, flight.status, flight.headers, flight.chunks)
+
+    singleflight = app['singleflight']
+    flight, leader = singleflight.join(fkey, fetch)
+    try:
+        await flight.wait_started()
+        headers = dict(flight.headers)
+        headers[COALESCED_HEADER] = 'LEADER' if leader else 'FOLLOWER'
+        response, _ = await stream_to_client(
+            request, flight.status, flight.reason, headers, cache_status,
+            flight.subscribe())
+        return response
+    finally:
+        singleflight.leave(flight)
+
+
+async def proxy_batched(request, data, text, key, cache_status):
+    """Send a single-text embedding request as part of an upstream batch."""
+    status, headers, payload = await request.app['batcher'].submit(
+        str(request.rel_url), forward_request_headers(request.headers), data, text)
+    if key is not None and status == 200:
+        store_in_cache(request.app, key, status, headers, [payload])
+    request['usage'] = proxy_requestlog.extract_usage(payload[-LOG_TAIL_BYTES:])
+    headers = dict(headers)
+    headers[CACHE_HEADER] = cache_status
+    return web.Response(status=status, headers=headers, body=payload)
+
+
+async def send_embedding_batch(app, rel_url, headers, body):
+    """Upstream call for EmbeddingBatcher: one request for the whole batch."""
+    await admit(app, headers, body)
+    async with open_upstream(app, 'POST', rel_url, headers, body) as upstream:
+        payload = await upstream.read()
+        return upstream.status, forward_response_headers(upstream.headers), payload
+
+
+async def stream_to_client(request, status, reason, headers, cache_status, chunks,
+                           captured=None):
+    """Write upstream chunks to the client as they arrive.
+
+    Args:
+        captured: Optional list that receives a copy of every chunk; it is
+            emptied again if the body outgrows CACHE_MAX_ENTRY_BYTES
+
+    Returns:
+        (response, complete) where complete is False if upstream broke off
+    """
+    headers = dict(headers)
+    headers[CACHE_HEADER] = cache_status
+    response = web.StreamResponse(status=status, reason=reason, headers=headers)
+    await response.prepare(request)
+    if request.transport is not None:
+        request.transport.set_write_buffer_limits(high=CLIENT_BUFFER_LIMIT)
+
+    metrics = request.app['metrics']
+    model = request.get('model', 'none')
+    is_stream = response.content_type == 'text/event-stream'
+    first_at = None
+    events = 0
+    tail = b'' if request.app['request_log'] is not None else None
+
+    complete = True
+    captured_bytes = 0
+    try:
+        async for chunk in chunks:
+            await response.write(chunk)
+            if 'first_byte_at' not in request:
+                request['first_byte_at'] = time.monotonic()
+            if tail is not None:
+                tail = (tail + chunk)[-LOG_TAIL_BYTES:]
+            if is_stream:
+                if first_at is None:
+                    first_at = time.monotonic()
+                    metrics.ttfb.observe(model, value=first_at - request['started'])
+                events += chunk.count(b'data:') - chunk.count(b'data: [DONE]')
+            if captured is not None:
+                captured.append(chunk)
+                captured_bytes += len(chunk)
+                if captured_bytes > proxy_cache.CACHE_MAX_ENTRY_BYTES:
+                    captured.clear()
+                    captured = None
+    except (UpstreamTimeout, UpstreamConnectionError) as e:
+        # Headers are already sent, all we can do is end the stream
+        logger.warning(f"Upstream failed while streaming {request.rel_url}: {e}")
+        complete = False
+    await response.write_eof()
+
+    if tail:
+        request['usage'] = proxy_requestlog.extract_usage(tail)
+    request['stream_events'] = events
+    if events:
+        metrics.stream_tokens.inc(model, amount=events)
+        elapsed = time.monotonic() - first_at
+        if events > 1 and elapsed > 0:
+            metrics.tokens_per_second.observe(model, value=(events - 1) / elapsed)
+    return response, complete
+
+
+def store_in_cache(app, key, status, headers, chunks):
+    """Put a complete upstream response into the response cache."""
+    cache = app['cache']
+    if cache is None:
+        return
+    headers = {k: v for k, v in headers.items() if k not in (CACHE_HEADER, COALESCED_HEADER)}
+    cache.put(key, CachedResponse(status, headers, b''.join(chunks)))
+
+
+async def replay_cached(request, cached):
+    """Answer from the cache; streamed responses are replayed event by event."""
+    request['cache'] = 'HIT'
+    headers = dict(cached.headers)
+    headers[CACHE_HEADER] = 'HIT'
+    if not cached.is_event_stream:
+        return web.Response(status=cached.status, headers=headers, body=cached.body)
+
+    response = web.StreamResponse(status=cached.status, headers=headers)
+    await response.prepare(request)
+    for event in cached.sse_events():
+        await response.write(event)
+    await response.write_eof()
+    return response
+
+
+async def pool_stats(request):
+    """Expose upstream connection pool statistics for sizing the pool."""
+    return web.json_response(request.app['upstream'].stats())
+
+
+async def cache_stats(request):
+    """Expose response cache hit/miss counters."""
+    cache = request.app['cache']
+    return web.json_response(cache.stats() if cache is not None else {'enabled': False})
+
+
+async def flight_stats(request):
+    """Expose single-flight coalescing counters."""
+    singleflight = request.app['singleflight']
+    return web.json_response(singleflight.stats() if singleflight is not None
+                             else {'enabled': False})
+
+
+async def upstream_stats(request):
+    """Expose per-upstream load, health and circuit breaker state."""
+    return web.json_response(request.app['balancer'].stats())
+
+
+async def admission_stats(request):
+    """Expose admission queue depth and wait times."""
+    admission = request.app['admission']
+    return web.json_response(admission.stats() if admission is not None
+                             else {'enabled': False})
+
+
+async def batcher_stats(request):
+    """Expose embedding micro-batching counters."""
+    batcher = request.app['batcher']
+    return web.json_response(batcher.stats() if batcher is not None else {'enabled': False})
+
+
+async def metrics_endpoint(request):
+    """Prometheus scrape endpoint."""
+    return web.Response(text=request.app['metrics'].render(request.app),
+                        content_type='text/plain', charset='utf-8',
+                        headers={'X-Prometheus-Format': '0.0.4'})
+
+
+def build_parser():
+    """Command line options; create_async_app() takes the parsed namespace."""
+    parser = argparse.ArgumentParser(description='OpenAI-compatible reverse proxy')
+    parser.add_argument('--mode', choices=['sync', 'async'], default='sync',
+                        help='sync: buffered Flask proxy, async: streaming aiohttp proxy')
+    parser.add_argument('--host', default='0.0.0.0', help='Address to listen on')
+    parser.add_argument('--port', type=int, default=443, help='Port to listen on')
+    parser.add_argument('--target', default=TARGET_API, help='Upstream API base URL')
+    parser.add_argument('--upstream', action='append', default=None, metavar='URL',
+                        help='Balance across several upstream base URLs (repeatable, '
+                             'async mode); defaults to --target')
+    parser.add_argument('--health-path', default=proxy_balancer.HEALTH_PATH,
+                        help="Path probed on every upstream, '' to disable probing")
+    parser.add_argument('--health-interval', type=float, default=proxy_balancer.HEALTH_INTERVAL,
+                        help='Seconds between upstream health probes')
+    parser.add_argument('--no-ssl', action='store_true',
+                        help='Serve plain HTTP (local testing, TLS terminated elsewhere)')
+
+    pool = parser.add_argument_group('upstream connection pool (async mode)')
+    pool.add_argument('--pool-size', type=int, default=proxy_upstream.POOL_SIZE,
+                      help='Maximum upstream connections in total')
+    pool.add_argument('--pool-size-per-host', type=int,
+                      default=proxy_upstream.POOL_SIZE_PER_HOST,
+                      help='Maximum upstream connections per host')
+    pool.add_argument('--keepalive', type=float, default=proxy_upstream.KEEPALIVE_TIMEOUT,
+                      help='Seconds an idle upstream connection is kept open')
+    pool.add_argument('--dns-ttl', type=int, default=proxy_upstream.DNS_CACHE_TTL,
+                      help='Seconds upstream DNS lookups are cached')
+    pool.add_argument('--http2', action='store_true',
+                      help='Multiplex upstream requests over HTTP/2 (needs httpx[http2])')
+
+    cache = parser.add_argument_group('deterministic response cache (async mode)')
+    cache.add_argument('--cache', action='store_true',
+                       help='Cache embeddings and temperature-0/seeded completions')
+    cache.add_argument('--cache-ttl', type=float, default=proxy_cache.CACHE_TTL,
+                       help='Seconds a cached response is served')
+    cache.add_argument('--cache-size', type=int, default=proxy_cache.CACHE_MAX_ENTRIES,
+                       help='Maximum number of responses kept in memory')
+    cache.add_argument('--cache-dir', default=None,
+                       help='Also keep cached responses on disk in this directory')
+    cache.add_argument('--cache-disk-mb', type=float,
+                       default=proxy_cache.CACHE_DISK_MAX_BYTES / (1024 * 1024),
+                       help='Megabytes of responses kept in --cache-dir, oldest dropped first')
+
+    limits = parser.add_argument_group('admission control (async mode)')
+    limits.add_argument('--key-rate', type=float, default=None,
+                        help='Requests per second allowed per API key')
+    limits.add_argument('--model-rate', action='append', default=None, metavar='[MODEL=]RATE',
+                        help='Requests per second per model; without MODEL= it applies '
+                             'to every model (repeatable)')
+    limits.add_argument('--queue-size', type=int, default=proxy_ratelimit.QUEUE_SIZE,
+                        help='Requests that may wait for admission at once')
+    limits.add_argument('--queue-timeout', type=float, default=proxy_ratelimit.QUEUE_TIMEOUT,
+                        help='Seconds a request may wait before it gets a 429')
+
+    batching = parser.add_argument_group('embedding micro-batching (async mode)')
+    batching.add_argument('--batch-embeddings', action='store_true',
+                          help='Merge concurrent single-text /v1/embeddings requests')
+    batching.add_argument('--batch-delay-ms', type=float, default=proxy_batcher.MAX_DELAY * 1000,
+                          help='Milliseconds the first request of a batch may wait')
+    batching.add_argument('--batch-size', type=int, default=proxy_batcher.MAX_BATCH_SIZE,
+                          help='Inputs per upstream batch')
+    batching.add_argument('--batch-tokens', type=int, default=proxy_batcher.MAX_BATCH_TOKENS,
+                          help='Estimated input tokens per upstream batch')
+
+    log = parser.add_argument_group('structured request log (async mode)')
+    log.add_argument('--request-log', nargs='?', const=proxy_requestlog.DEFAULT_PATH,
+                     default=None, metavar='PATH',
+                     help=f'Append one JSON line per request (default path: '
+                          f'{proxy_requestlog.DEFAULT_PATH})')
+    log.add_argument('--log-bodies', action='store_true',
+                     help='Include request bodies, making the log replayable')
+    log.add_argument('--log-max-mb', type=float,
+                     default=proxy_requestlog.MAX_BYTES / (1024 * 1024),
+                     help='Rotate the request log beyond this size')
+    log.add_argument('--log-zstd', action='store_true',
+                     help='Compress rotated request logs with zstd (needs zstandard)')
+
+    parser.add_argument('--no-coalesce', action='store_true',
+                        help='Send identical concurrent requests upstream separately')
+    return parser
+
+
+def create_async_app(args=None):
+    """Build the aiohttp application for the streaming pass-through mode."""
+    if args is None:
+        args = build_parser().parse_args([])
+
+    async def request_log_ctx(app):
+        app['request_log'] = None
+        if args.request_log:
+            app['request_log'] = RequestLogWriter(
+                args.request_log,
+                max_bytes=int(args.log_max_mb * 1024 * 1024),
+                compress=args.log_zstd,
+            )
+        yield
+        if app['request_log'] is not None:
+            app['request_log'].close()
+
+    async def upstream_ctx(app):
+        app['upstream'] = UpstreamClient(
+            pool_size=args.pool_size,
+            pool_size_per_host=args.pool_size_per_host,
+            keepalive_timeout=args.keepalive,
+            dns_cache_ttl=args.dns_ttl,
+            http2=args.http2,
+        )
+        await app['upstream'].start()
+        app['balancer'].start_health_checks(app['upstream'])
+        yield
+        if app['cache'] is not None:
+            await app['cache'].flush()
+        await app['balancer'].stop_health_checks()
+        await app['upstream'].close()
+
+    async_app = web.Application(client_max_size=64 * 1024 * 1024,
+                                middlewares=[metrics_middleware])
+    async_app['metrics'] = ProxyMetrics()
+    async_app['balancer'] = UpstreamPool(args.upstream or [args.target],
+                                         health_path=args.health_path,
+                                         health_interval=args.health_interval)
+    async_app['admission'] = None
+    if args.key_rate or args.model_rate:
+        async_app['admission'] = AdmissionController(
+            key_rate=args.key_rate,
+            model_rates=proxy_ratelimit.parse_model_rates(args.model_rate),
+            queue_size=args.queue_size,
+            queue_timeout=args.queue_timeout,
+        )
+    async_app['batcher'] = None
+    if args.batch_embeddings:
+        async_app['batcher'] = EmbeddingBatcher(
+            lambda rel_url, headers, body: send_embedding_batch(async_app, rel_url, headers, body),
+            max_delay=args.batch_delay_ms / 1000,
+            max_batch_size=args.batch_size,
+            max_batch_tokens=args.batch_tokens,
+        )
+    async_app['cache'] = None
+    async_app['singleflight'] = None if args.no_coalesce else SingleFlight()
+    if args.cache:
+        async_app['cache'] = ResponseCache(ttl=args.cache_ttl, max_entries=args.cache_size,
+                                           disk_dir=args.cache_dir,
+                                           disk_max_bytes=int(args.cache_disk_mb * 1024 * 1024))
+    async_app['log_bodies'] = args.log_bodies
+    async_app.cleanup_ctx.append(request_log_ctx)
+    async_app.cleanup_ctx.append(upstream_ctx)
+    async_app.router.add_get('/metrics', metrics_endpoint)
+    async_app.router.add_get('/_proxy/pool', pool_stats)
+    async_app.router.add_get('/_proxy/cache', cache_stats)
+    async_app.router.add_get('/_proxy/flights', flight_stats)
+    async_app.router.add_get('/_proxy/upstreams', upstream_stats)
+    async_app.router.add_get('/_proxy/admission', admission_stats)
+    async_app.router.add_get('/_proxy/batches', batcher_stats)
+    async_app.router.add_route('*', '/{path:.*}', async_proxy)
+    return async_app
+
+
+def main():
+    global TARGET_API
+
+    args = build_parser().parse_args()
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    TARGET_API = args.target.rstrip('/')
+
+    if args.mode == 'async':
+        ssl_context = None
+        if not args.no_ssl:
+            ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            ssl_context.load_cert_chain('cert.pem', 'key.pem')
+        # handler_cancellation: a client disconnect cancels its handler at once,
+        # even while it still waits for upstream headers or the first token
+        web.run_app(create_async_app(args), host=args.host, port=args.port,
+                    ssl_context=ssl_context, handler_cancellation=True)
+    else:
+        context = None
+        if not args.no_ssl:
+            context = SSL.Context(SSL.TLSv1_2_METHOD)
+            context.use_privatekey_file('key.pem')
+            context.use_certificate_file('cert.pem')
+        app.run(host=args.host, port=args.port, ssl_context=context, threaded=True)
+
+
 if __name__ == '__main__':
-    context = SSL.Context(SSL.TLSv1_2_METHOD)
-    context.use_privatekey_file('key.pem')
-    context.use_certificate_file('cert.pem')
-    app.run(host='0.0.0.0', port=443, ssl_context=context, threaded=True)
\ No newline at end of file
+    main()
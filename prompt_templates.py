@@ -0,0 +1,136 @@
+"""
+Prefix-stable prompt templates.
+
+Providers (vLLM, Ollama, OpenAI, ...) reuse the KV cache of a prompt prefix
+they have already seen, but only if it is byte-identical. A template
+therefore renders as
+
+    [system prompt] + [static instruction + content header] + content + [suffix]
+
+The system prompt, the instruction and everything else known up front are
+compiled into one cached prefix string. The variable content goes last,
+followed only by a short static suffix such as a closing delimiter.
+
+Example:
+    SUMMARY = PromptTemplate('summary', "Write a one paragraph summary for this article:",
+                             content_header="BEGIN_OF_ARTICLE:\\n", suffix="\\nEND_OF_ARTICLE.")
+    messages = SUMMARY.messages(article_text)
+    print(format_prefix_report())
+"""
+
+import hashlib
+import textwrap
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+
+@lru_cache(maxsize=256)
+def compile_prefix(instruction: str, content_header: str, static: Tuple[Tuple[str, str], ...]) -> str:
+    """Static part of the user message, built once per distinct template."""
+    text = textwrap.dedent(instruction).strip()
+    if static:
+        text = text.format(**dict(static))
+    text = '\n'.join(line.rstrip() for line in text.splitlines())
+    return f"{text}\n\n{content_header}" if text else content_header
+
+
+class PrefixCacheStats:
+    """How much of each rendered prompt a provider-side prefix cache could reuse.
+
+    A render counts as a potential hit when its system prompt and static
+    prefix were rendered before in this process; its prefix characters
+    are then reusable. hit_potential is reusable characters / all prompt
+    characters.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seen = set()
+        self._templates: Dict[str, Dict[str, int]] = {}
+
+    def record(self, name: str, system: str, prefix: str, prompt_chars: int):
+        digest = hashlib.sha1(f"{system}\x00{prefix}".encode('utf-8')).hexdigest()
+        prefix_chars = len(system) + len(prefix)
+        with self._lock:
+            stats = self._templates.setdefault(name, {
+                'renders': 0, 'prefix_hits': 0, 'prefix_chars': 0,
+                'reusable_chars': 0, 'prompt_chars': 0})
+            stats['renders'] += 1
+            stats['prefix_chars'] = prefix_chars
+            stats['prompt_chars'] += prompt_chars
+            if digest in self._seen:
+                stats['prefix_hits'] += 1
+                stats['reusable_chars'] += prefix_chars
+            else:
+                self._seen.add(digest)
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            report = {}
+            for name, stats in self._templates.items():
+                entry = dict(stats)
+                entry['hit_potential'] = (stats['reusable_chars'] / stats['prompt_chars']
+                                          if stats['prompt_chars'] else 0.0)
+                report[name] = entry
+            return report
+
+    def reset(self):
+        with self._lock:
+            self._seen.clear()
+            self._templates.clear()
+
+
+PREFIX_STATS = PrefixCacheStats()
+
+
+class PromptTemplate:
+    """A prompt with a static, cacheable prefix and the variable content last.
+
+    Args:
+        name: Name used in the prefix cache report
+        instruction: Static instruction; {placeholders} are filled from `static`
+            once at compile time, never per request
+        system: Default system prompt, part of the cached prefix
+        content_header: Static text right before the content (e.g. 'Inhalt:\\n')
+        suffix: Short static text after the content, e.g. a closing delimiter
+        static: Values for the instruction's placeholders
+    """
+
+    def __init__(self, name: str, instruction: str = '', system: Optional[str] = None,
+                 content_header: str = '', suffix: str = '', **static):
+        self.name = name
+        self.instruction = instruction
+        self.system = system
+        self.content_header = content_header
+        self.suffix = suffix
+        self.static = tuple(sorted((k, str(v)) for k, v in static.items()))
+
+    @property
+    def prefix(self) -> str:
+        """Static start of the user message."""
+        return compile_prefix(self.instruction, self.content_header, self.static)
+
+    def render(self, content: str, system: Optional[str] = None) -> str:
+        """The user message: cached prefix, then content, then the suffix."""
+        prompt = f"{self.prefix}{content}{self.suffix}"
+        system = (self.system if system is None else system) or ''
+        PREFIX_STATS.record(self.name, system, self.prefix, len(system) + len(prompt))
+        return prompt
+
+    def messages(self, content: str, system: Optional[str] = None) -> List[Dict[str, str]]:
+        """Chat messages with the system prompt (if any) first."""
+        system = self.system if system is None else system
+        messages = [{'role': 'system', 'content': system}] if system else []
+        messages.append({'role': 'user', 'content': self.render(content, system)})
+        return messages
+
+
+def format_prefix_report() -> str:
+    """One line per template: renders, static prefix size and hit potential."""
+    lines = []
+    for name, stats in sorted(PREFIX_STATS.report().items()):
+        lines.append(f"{name}: {stats['renders']} renders, prefix {stats['prefix_chars']} chars, "
+                     f"{stats['prefix_hits']} prefix repeats, "
+                     f"hit potential {stats['hit_potential']:.0%}")
+    return '\n'.join(lines) if lines else 'no prompts rendered'
@@ -8,6 +8,11 @@ To add a new provider configuration:
    - 'default_model': Default model to use
    - 'needs_api_key': Boolean indicating if API key is required
    - Optional 'extra_params' for provider-specific settings
+   - Optional 'openai_base_url': OpenAI-compatible endpoint, used by
+     model_router to resolve 'provider@model' names
+   - Optional 'replicas': further base URLs serving the same models
+   - Optional 'models': models served, otherwise fetched from /models
+   - Optional 'context_window': context size of 'default_model' in tokens
 
 Example:
 add_provider('new_provider', {
@@ -73,6 +78,7 @@ PROVIDER_CONFIGS = {
         'name': 'Mistral AI',
         'default_model': 'mistral-small-latest',
         'needs_api_key': True,
+        'openai_base_url': 'https://api.mistral.ai/v1',
     },
     'anthropic': {
         'name': 'Anthropic (Claude)',
@@ -83,11 +89,13 @@ PROVIDER_CONFIGS = {
         'name': 'OpenAI',
         'default_model': 'gpt-3.5-turbo',
         'needs_api_key': True,
+        'openai_base_url': 'https://api.openai.com/v1',
     },
     'ollama': {
         'name': 'Ollama (Local)',
         'default_model': 'gemma3:4b',
         'needs_api_key': False,
+        'openai_base_url': 'http://localhost:11434/v1',
         'extra_params': {
             'base_url': 'http://localhost:11434'
         }
@@ -96,11 +104,13 @@ PROVIDER_CONFIGS = {
         'name': 'ArliAI',
         'default_model': 'Mistral-Nemo-12B-Instruct-2407',
         'needs_api_key': True,
+        'openai_base_url': 'https://api.arliai.com/v1',
     },
     'openrouter': {
         'name': 'OpenRouter',
         'default_model': 'moonshotai/moonlight-16b-a3b-instruct:free',
         'needs_api_key': True,
+        'openai_base_url': 'https://openrouter.ai/api/v1',
     },
     'internlm': {
         'name': 'InternLM',
@@ -114,11 +124,14 @@ PROVIDER_CONFIGS = {
         'name': 'StepFun AI',
         'default_model': 'step-1-8k',
         'needs_api_key': True,
+        'context_window': 8000,
+        'openai_base_url': 'https://api.stepfun.com/v1',
     },
     'sambanova': {
         'name': 'SambaNova',
         'default_model': 'Meta-Llama-3.1-8B-Instruct',
         'needs_api_key': True,
+        'openai_base_url': 'https://api.sambanova.ai/v1',
     },
     'upstage': {
         'name': 'Upstage AI',
@@ -129,6 +142,7 @@ PROVIDER_CONFIGS = {
         'name': 'NVIDIA GPU Cloud (NGC)',
         'default_model': 'deepseek-ai/deepseek-r1-distill-llama-8b',
         'needs_api_key': True,
+        'openai_base_url': 'https://integrate.api.nvidia.com/v1',
     },
     'cloudflare': {
         'name': 'Cloudflare Workers AI',
@@ -162,6 +176,7 @@ if HAS_MOONSHOT:
         'name': 'Moonshot AI',
         'default_model': 'moonshot-v1-8k',
         'needs_api_key': True,
+        'context_window': 8192,
     }
 
 # Add Groq if available
@@ -0,0 +1,206 @@
+"""
+Upstream pool for openai_proxy.py: load balancing, health checks and circuit breaking.
+
+Requests go to the available upstream with the fewest outstanding requests
+(ties broken at random). An upstream is available when its last health
+probes succeeded and its circuit breaker lets traffic through:
+
+- closed: normal operation, consecutive failures are counted
+- open: after FAILURE_THRESHOLD consecutive failures no traffic is sent for
+  OPEN_SECONDS
+- half-open: afterwards a single trial request decides whether the breaker
+  closes again or re-opens
+
+Stand-in upstreams for local testing are just more base URLs, e.g.
+`--upstream http://127.0.0.1:9001 --upstream http://127.0.0.1:9002`.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from typing import Dict, Iterable, List, Optional
+
+from proxy_upstream import UpstreamConnectionError, UpstreamError
+
+logger = logging.getLogger(__name__)
+
+FAILURE_THRESHOLD = 5  # consecutive failures that open the breaker
+OPEN_SECONDS = 30  # how long an open breaker rejects traffic
+HEALTH_PATH = '/v1/models'
+HEALTH_INTERVAL = 10  # seconds between active probes
+HEALTH_TIMEOUT = 5  # seconds a probe may take
+UNHEALTHY_AFTER = 2  # consecutive failed probes that take an upstream out
+FAILOVER_STATUSES = {502, 503, 504}  # upstream answers worth retrying elsewhere
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+
+class NoUpstreamAvailable(UpstreamConnectionError):
+    """Every upstream is unhealthy or has an open circuit breaker."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for one upstream."""
+
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD,
+                 open_seconds: float = OPEN_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_running = False
+
+    def allows(self) -> bool:
+        """True if a request may be sent now; does not change the state."""
+        if self.state == OPEN:
+            return time.monotonic() - self.opened_at >= self.open_seconds
+        if self.state == HALF_OPEN:
+            return not self.trial_running
+        return True
+
+    def on_dispatch(self):
+        """A request was sent: an expired open breaker turns half-open for its trial."""
+        if self.state == OPEN:
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            self.trial_running = True
+
+    def on_success(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.trial_running = False
+
+    def on_failure(self):
+        self.failures += 1
+        self.trial_running = False
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                logger.warning(f"Circuit opened after {self.failures} failures")
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+
+class Upstream:
+    """One upstream base URL with its load and health state."""
+
+    def __init__(self, url: str, breaker: Optional[CircuitBreaker] = None):
+        self.url = url.rstrip('/')
+        self.breaker = breaker or CircuitBreaker()
+        self.outstanding = 0
+        self.healthy = True
+        self.probe_failures = 0
+        self.requests_total = 0
+        self.failures_total = 0
+
+    @property
+    def available(self) -> bool:
+        return self.healthy and self.breaker.allows()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            'url': self.url,
+            'healthy': self.healthy,
+            'breaker': self.breaker.state,
+            'outstanding': self.outstanding,
+            'requests_total': self.requests_total,
+            'failures_total': self.failures_total,
+        }
+
+
+class UpstreamPool:
+    """Least-outstanding-requests balancer over several upstreams.
+
+    Args:
+        urls: Upstream base URLs
+        health_path: Path probed on every upstream, '' disables probing
+        health_interval: Seconds between probes
+        failure_threshold: Consecutive failures that open a breaker
+        open_seconds: Seconds an open breaker rejects traffic
+    """
+
+    def __init__(self, urls: Iterable[str], health_path: str = HEALTH_PATH,
+                 health_interval: float = HEALTH_INTERVAL,
+                 failure_threshold: int = FAILURE_THRESHOLD, open_seconds: float = OPEN_SECONDS):
+        self.upstreams: List[Upstream] = [
+            Upstream(url, CircuitBreaker(failure_threshold, open_seconds)) for url in urls]
+        if not self.upstreams:
+            raise ValueError("at least one upstream URL is required")
+        self.health_path = health_path
+        self.health_interval = health_interval
+        self._probe_task: Optional[asyncio.Task] = None
+
+    def acquire(self, exclude: Iterable[str] = ()) -> Upstream:
+        """Pick the available upstream with the fewest outstanding requests.
+
+        Raises:
+            NoUpstreamAvailable: No upstream outside `exclude` can take traffic
+        """
+        exclude = set(exclude)
+        candidates = [u for u in self.upstreams if u.url not in exclude and u.available]
+        if not candidates:
+            raise NoUpstreamAvailable("no healthy upstream available")
+        fewest = min(u.outstanding for u in candidates)
+        upstream = random.choice([u for u in candidates if u.outstanding == fewest])
+        upstream.breaker.on_dispatch()
+        upstream.outstanding += 1
+        upstream.requests_total += 1
+        return upstream
+
+    def release(self, upstream: Upstream, ok: bool):
+        """Return an upstream after a request and record the outcome."""
+        upstream.outstanding -= 1
+        if ok:
+            upstream.breaker.on_success()
+        else:
+            upstream.failures_total += 1
+            upstream.breaker.on_failure()
+
+    def start_health_checks(self, client):
+        """Start probing every upstream in the background with the shared client."""
+        if self.health_path and self._probe_task is None:
+            self._probe_task = asyncio.ensure_future(self._probe_loop(client))
+
+    async def stop_health_checks(self):
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            try:
+                await self._probe_task
+            except asyncio.CancelledError:
+                pass
+            self._probe_task = None
+
+    async def probe(self, client, upstream: Upstream):
+        """Probe one upstream; any answer below 500 within HEALTH_TIMEOUT counts as healthy."""
+        async def check():
+            async with client.request('GET', f"{upstream.url}{self.health_path}") as resp:
+                await resp.read()
+                return resp.status < 500
+
+        try:
+            # One bound for connect, headers and body: an upstream that accepts
+            # connections but never answers must fail here, not hang
+            ok = await asyncio.wait_for(check(), HEALTH_TIMEOUT)
+        except (UpstreamError, asyncio.TimeoutError):
+            ok = False
+
+        if ok:
+            if not upstream.healthy:
+                logger.info(f"Upstream {upstream.url} is healthy again")
+            upstream.healthy = True
+            upstream.probe_failures = 0
+        else:
+            upstream.probe_failures += 1
+            if upstream.healthy and upstream.probe_failures >= UNHEALTHY_AFTER:
+                logger.warning(f"Upstream {upstream.url} failed {upstream.probe_failures} probes")
+                upstream.healthy = False
+
+    async def _probe_loop(self, client):
+        while True:
+            await asyncio.gather(*(self.probe(client, u) for u in self.upstreams),
+                                 return_exceptions=True)
+            await asyncio.sleep(self.health_interval)
+
+    def stats(self) -> List[Dict[str, object]]:
+        return [u.stats() for u in self.upstreams]
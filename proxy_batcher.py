@@ -0,0 +1,162 @@
+"""
+Micro-batching of /v1/embeddings requests for openai_proxy.py.
+
+Clients like vllm_embedder.get_embedding send one text per request, while the
+embedding backend is much more efficient on batches. Concurrent single-text
+requests that share a model, API key and embedding options are collected for
+at most MAX_DELAY seconds and sent upstream as one batch; the batch is sent
+earlier once it reaches MAX_BATCH_SIZE inputs or MAX_BATCH_TOKENS estimated
+tokens. The returned vectors are split back so every caller gets a normal
+single-input response.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAX_DELAY = 0.005  # seconds the first request of a batch may wait
+MAX_BATCH_SIZE = 32  # inputs per upstream request
+MAX_BATCH_TOKENS = 8192  # estimated input tokens per upstream request
+
+# Upstream answer: status, headers, body
+UpstreamResult = Tuple[int, Dict[str, str], bytes]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate used for the batch size limit."""
+    return max(1, len(text) // 4)
+
+
+def single_input(data: dict) -> Optional[str]:
+    """The text of a single-input embedding request, None if it is not one."""
+    value = data.get('input')
+    if isinstance(value, list) and len(value) == 1:
+        value = value[0]
+    return value if isinstance(value, str) else None
+
+
+def batch_key(path: str, authorization: str, data: dict) -> str:
+    """Requests with the same key can share an upstream batch."""
+    options = {k: v for k, v in data.items() if k != 'input'}
+    return '\n'.join((path, authorization, json.dumps(options, sort_keys=True)))
+
+
+class _Batch:
+    def __init__(self, path: str, data: dict, headers: Dict[str, str]):
+        self.path = path
+        self.data = data
+        self.headers = headers
+        self.texts: List[str] = []
+        self.futures: List[asyncio.Future] = []
+        self.tokens = 0
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class EmbeddingBatcher:
+    """Merge concurrent single-text embedding requests into upstream batches.
+
+    Args:
+        send: Coroutine sending (path, headers, body) upstream and returning
+            (status, headers, body)
+        max_delay: Seconds to wait for more requests after the first one
+        max_batch_size: Inputs that trigger an immediate flush
+        max_batch_tokens: Estimated tokens that trigger an immediate flush
+    """
+
+    def __init__(self, send: Callable[[str, Dict[str, str], bytes], Awaitable[UpstreamResult]],
+                 max_delay: float = MAX_DELAY, max_batch_size: int = MAX_BATCH_SIZE,
+                 max_batch_tokens: int = MAX_BATCH_TOKENS):
+        self.send = send
+        self.max_delay = max_delay
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self._open: Dict[str, _Batch] = {}
+        self.requests_total = 0
+        self.batches_total = 0
+
+    async def submit(self, path: str, headers: Dict[str, str], data: dict,
+                     text: str) -> UpstreamResult:
+        """Queue one text and wait for its share of the batch response."""
+        key = batch_key(path, headers.get('Authorization', ''), data)
+        tokens = estimate_tokens(text)
+
+        batch = self._open.get(key)
+        if batch is not None and batch.tokens + tokens > self.max_batch_tokens:
+            self._flush(key)
+            batch = None
+        if batch is None:
+            batch = _Batch(path, data, headers)
+            self._open[key] = batch
+            batch.timer = asyncio.get_running_loop().call_later(self.max_delay, self._flush, key)
+
+        future = asyncio.get_running_loop().create_future()
+        batch.texts.append(text)
+        batch.futures.append(future)
+        batch.tokens += tokens
+        self.requests_total += 1
+        if len(batch.texts) >= self.max_batch_size or batch.tokens >= self.max_batch_tokens:
+            self._flush(key)
+        return await future
+
+    def _flush(self, key: str):
+        batch = self._open.pop(key, None)
+        if batch is None:
+            return
+        batch.timer.cancel()
+        self.batches_total += 1
+        asyncio.ensure_future(self._send_batch(batch))
+
+    async def _send_batch(self, batch: _Batch):
+        body = dict(batch.data)
+        body['input'] = batch.texts
+        try:
+            status, headers, payload = await self.send(batch.path, batch.headers,
+                                                     json.dumps(body).encode())
+        except Exception as e:
+            for future in batch.futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        results = self._split(status, headers, payload, batch.texts)
+        for future, result in zip(batch.futures, results):
+            if not future.done():
+                future.set_result(result)
+
+    def _split(self, status, headers, payload, texts) -> List[UpstreamResult]:
+        """Cut a batch response into one single-input response per caller."""
+        try:
+            data = json.loads(payload) if status == 200 else None
+            items = sorted(data['data'], key=lambda item: item.get('index', 0))
+            if len(items) != len(texts):
+                raise ValueError(f"expected {len(texts)} embeddings, got {len(items)}")
+        except (ValueError, KeyError, TypeError) as e:
+            if status == 200:
+                logger.warning(f"Could not split embedding batch: {e}")
+            # Errors are passed through unchanged to every caller
+            return [(status, headers, payload)] * len(texts)
+
+        usage = data.get('usage') or {}
+        total_chars = sum(len(text) for text in texts) or 1
+        results = []
+        for text, item in zip(texts, items):
+            share = len(text) / total_chars
+            single = {key: value for key, value in data.items() if key not in ('data', 'usage')}
+            single['data'] = [dict(item, index=0)]
+            # Upstream only reports usage for the whole batch; split it by text length
+            single['usage'] = {key: round(value * share) for key, value in usage.items()
+                               if isinstance(value, (int, float))}
+            results.append((status, headers, json.dumps(single).encode()))
+        return results
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            'requests_total': self.requests_total,
+            'batches_total': self.batches_total,
+            'avg_batch_size': round(self.requests_total / self.batches_total, 2)
+            if self.batches_total else 0,
+            'open_batches': len(self._open),
+        }
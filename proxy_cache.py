@@ -0,0 +1,281 @@
+"""
+Deterministic-response cache for openai_proxy.py.
+
+Only requests whose answer cannot change between calls are cached:
+- /v1/embeddings
+- chat/completions with temperature 0 or a fixed seed
+
+The key is a hash of the request path, the canonicalized JSON body (sorted
+keys, no whitespace, fields that do not influence the output removed) and the
+Authorization header, so the model and every sampling parameter are part of it
+and callers with different credentials never share an answer. Entries live in
+an in-memory LRU with a TTL and can optionally be written to a directory on
+disk as a second tier that survives restarts. Disk reads and writes run on
+worker threads; the disk tier is capped in bytes and drops its oldest entries
+first, expired ones as they come up.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+CACHE_TTL = 3600  # seconds an entry is served
+CACHE_MAX_ENTRIES = 1024
+CACHE_MAX_BYTES = 256 * 1024 * 1024  # total body bytes held in memory
+CACHE_MAX_ENTRY_BYTES = 8 * 1024 * 1024  # larger responses are not cached
+CACHE_DISK_MAX_BYTES = 1024 * 1024 * 1024  # total body bytes kept on disk
+
+# Request fields that never change the generated output
+IGNORED_FIELDS = {'user', 'metadata', 'store'}
+
+CACHEABLE_PATHS = ('/v1/embeddings', '/v1/chat/completions', '/v1/completions')
+
+
+def parse_body(body: bytes) -> Optional[dict]:
+    """Parse a JSON request body, None if it is not a JSON object."""
+    try:
+        data = json.loads(body)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def is_deterministic(path: str, data: dict) -> bool:
+    """True if the upstream answer for this request is reproducible."""
+    if path.endswith('/embeddings'):
+        return True
+    if data.get('seed') is not None:
+        return True
+    return data.get('temperature') == 0
+
+
+def cache_key(path: str, data: dict, authorization: str = '') -> str:
+    """Hash of the credential, path and canonicalized body."""
+    canonical = {k: v for k, v in data.items() if k not in IGNORED_FIELDS}
+    payload = json.dumps(canonical, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(f"{authorization}\n{path}\n{payload}".encode('utf-8')).hexdigest()
+
+
+def request_cache_key(method: str, path: str, body: bytes,
+                      authorization: str = '') -> Optional[str]:
+    """Cache key for a proxied request, or None if it must not be cached."""
+    if method != 'POST' or not path.startswith(CACHEABLE_PATHS):
+        return None
+    data = parse_body(body)
+    if data is None or not is_deterministic(path, data):
+        return None
+    return cache_key(path, data, authorization)
+
+
+class CachedResponse:
+    """A complete upstream response kept for replay."""
+
+    def __init__(self, status: int, headers: Dict[str, str], body: bytes,
+                 stored_at: Optional[float] = None):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.stored_at = stored_at if stored_at is not None else time.time()
+
+    @property
+    def is_event_stream(self) -> bool:
+        content_type = next((v for k, v in self.headers.items() if k.lower() == 'content-type'), '')
+        return content_type.startswith('text/event-stream')
+
+    def sse_events(self):
+        """Split a streamed body back into its SSE events for replay."""
+        for event in self.body.split(b'\n\n'):
+            if event.strip():
+                yield event + b'\n\n'
+
+
+class ResponseCache:
+    """In-memory LRU with TTL and an optional on-disk tier.
+
+    Args:
+        ttl: Seconds an entry stays valid
+        max_entries: Maximum number of entries in memory
+        max_bytes: Maximum total body size held in memory
+        disk_dir: Directory for the on-disk tier, None to keep memory only
+        disk_max_bytes: Maximum total body size kept on disk
+    """
+
+    def __init__(self, ttl: float = CACHE_TTL, max_entries: int = CACHE_MAX_ENTRIES,
+                 max_bytes: int = CACHE_MAX_BYTES, disk_dir: Optional[str] = None,
+                 disk_max_bytes: int = CACHE_DISK_MAX_BYTES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        # Disk entries by key, oldest stored first: (body bytes, stored_at)
+        self._disk_index: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self._disk_bytes = 0
+        self._disk_lock = threading.Lock()  # disk I/O runs on worker threads
+        self._disk_writes: Set[asyncio.Future] = set()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._load_disk_index()
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        """Return a fresh entry from memory or disk, None on a miss."""
+        entry = self._entries.get(key)
+        if entry is not None and self._fresh(entry):
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+        if entry is not None:
+            self._remove(key)
+
+        entry = await asyncio.to_thread(self._disk_get, key) if self.disk_dir else None
+        if entry is not None:
+            self._memory_put(key, entry)
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, entry: CachedResponse):
+        """Store an entry in memory and, if configured, on disk in the background.
+
+        Must be called on the event loop when a disk tier is configured.
+        """
+        if len(entry.body) > CACHE_MAX_ENTRY_BYTES:
+            return
+        self._memory_put(key, entry)
+        if self.disk_dir:
+            write = asyncio.ensure_future(asyncio.to_thread(self._disk_put, key, entry))
+            self._disk_writes.add(write)
+            write.add_done_callback(self._disk_writes.discard)
+
+    async def flush(self):
+        """Wait for background disk writes, e.g. before shutting down."""
+        if self._disk_writes:
+            await asyncio.gather(*self._disk_writes, return_exceptions=True)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'disk_entries': len(self._disk_index),
+            'disk_bytes': self._disk_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+    def _fresh(self, entry: CachedResponse) -> bool:
+        return time.time() - entry.stored_at < self.ttl
+
+    def _memory_put(self, key: str, entry: CachedResponse):
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        self._bytes += len(entry.body)
+        while self._entries and (len(self._entries) > self.max_entries
+                                 or self._bytes > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= len(entry.body)
+
+    def _disk_paths(self, key: str):
+        base = os.path.join(self.disk_dir, key)
+        return f"{base}.json", f"{base}.body"
+
+    def _load_disk_index(self):
+        """Index the entries already on disk; drops bodies without meta (torn writes)."""
+        found = []
+        for name in os.listdir(self.disk_dir):
+            key, ext = os.path.splitext(name)
+            meta_path, body_path = self._disk_paths(key)
+            try:
+                if ext == '.body' and not os.path.exists(meta_path):
+                    os.remove(body_path)
+                elif ext == '.json':
+                    with open(meta_path, 'r', encoding='utf-8') as f:
+                        stored_at = json.load(f)['stored_at']
+                    found.append((stored_at, key, os.path.getsize(body_path)))
+            except Exception as e:
+                logger.warning(f"Dropping unreadable cache entry {key}: {e}")
+                self._disk_remove_files(key)
+        with self._disk_lock:
+            for stored_at, key, size in sorted(found):
+                self._disk_index[key] = (size, stored_at)
+                self._disk_bytes += size
+            self._disk_evict()
+
+    def _disk_remove_files(self, key: str):
+        for path in self._disk_paths(key):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _disk_discard(self, key: str):
+        """Forget a disk entry and delete its files; caller holds _disk_lock."""
+        size, _ = self._disk_index.pop(key, (0, 0.0))
+        self._disk_bytes -= size
+        self._disk_remove_files(key)
+
+    def _disk_evict(self):
+        """Drop expired and, over disk_max_bytes, oldest entries; caller holds _disk_lock."""
+        expired_before = time.time() - self.ttl
+        while self._disk_index:
+            key, (_, stored_at) = next(iter(self._disk_index.items()))
+            if stored_at >= expired_before and self._disk_bytes <= self.disk_max_bytes:
+                break
+            self._disk_discard(key)
+
+    def _disk_get(self, key: str) -> Optional[CachedResponse]:
+        """Read an entry from disk; blocking, runs on a worker thread."""
+        with self._disk_lock:
+            if key not in self._disk_index:
+                return None
+            meta_path, body_path = self._disk_paths(key)
+            try:
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+                if time.time() - meta['stored_at'] >= self.ttl:
+                    self._disk_discard(key)
+                    return None
+                with open(body_path, 'rb') as f:
+                    body = f.read()
+            except Exception as e:
+                logger.warning(f"Failed to load cache entry {key}: {e}")
+                self._disk_discard(key)
+                return None
+        return CachedResponse(meta['status'], meta['headers'], body, meta['stored_at'])
+
+    def _disk_put(self, key: str, entry: CachedResponse):
+        """Write an entry to disk and evict; blocking, runs on a worker thread."""
+        meta_path, body_path = self._disk_paths(key)
+        with self._disk_lock:
+            self._disk_discard(key)
+            try:
+                # Body first: a meta file only exists once its body is complete
+                with open(body_path, 'wb') as f:
+                    f.write(entry.body)
+                with open(meta_path, 'w', encoding='utf-8') as f:
+                    json.dump({'status': entry.status, 'headers': entry.headers,
+                               'stored_at': entry.stored_at}, f)
+            except Exception as e:
+                logger.warning(f"Failed to save cache entry {key}: {e}")
+                self._disk_remove_files(key)
+                return
+            self._disk_index[key] = (len(entry.body), entry.stored_at)
+            self._disk_bytes += len(entry.body)
+            self._disk_evict()
@@ -0,0 +1,169 @@
+"""
+Prometheus metrics for openai_proxy.py, rendered in the text exposition format.
+
+Deliberately tiny instead of depending on prometheus_client: every update is
+a dict lookup plus an addition on the event loop thread (no locks needed), and
+the text is only built when /metrics is scraped. Pool, cache and queue gauges
+are read from their components at scrape time, so they cost nothing between
+scrapes.
+"""
+
+import bisect
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+TTFB_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+TOKENS_PER_SECOND_BUCKETS = (1, 5, 10, 20, 40, 60, 100, 200, 500)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, labels)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    def set(self, *labels: str, value: float):
+        self.values[labels] = value
+
+    def dec(self, *labels: str, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # per label set: [count per bucket (+Inf last), sum]
+        self.values: Dict[Labels, List] = {}
+
+    def observe(self, *labels: str, value: float):
+        entry = self.values.get(labels)
+        if entry is None:
+            entry = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                bucket_labels = _format_labels(self.labels, labels, 'le="%s"' % le)
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, labels)} {cumulative}")
+        return lines
+
+
+class ProxyMetrics:
+    """All metrics exported by the async proxy."""
+
+    def __init__(self):
+        self.requests = Counter('proxy_requests_total',
+                                'Proxied requests by model and status code', ('model', 'status'))
+        self.in_flight = Gauge('proxy_requests_in_flight', 'Requests currently being handled')
+        self.latency = Histogram('proxy_request_duration_seconds',
+                                 'Time from request arrival to the end of the response',
+                                 ('model',), LATENCY_BUCKETS)
+        self.upstream_latency = Histogram('proxy_upstream_latency_seconds',
+                                          'Time from request arrival to the upstream response '
+                                          'headers, minus admission queue wait',
+                                          ('model', 'upstream'), TTFB_BUCKETS)
+        self.ttfb = Histogram('proxy_stream_ttfb_seconds',
+                              'Time from request arrival to the first streamed body byte',
+                              ('model',), TTFB_BUCKETS)
+        self.tokens_per_second = Histogram('proxy_stream_tokens_per_second',
+                                           'Streamed SSE chunks per second after the first one',
+                                           ('model',), TOKENS_PER_SECOND_BUCKETS)
+        self.stream_tokens = Counter('proxy_stream_tokens_total',
+                                     'Streamed SSE chunks (about one token each)', ('model',))
+        self.in_flight.set(value=0)
+
+    def metrics(self) -> Iterable:
+        return (self.requests, self.in_flight, self.latency, self.upstream_latency, self.ttfb,
+                self.tokens_per_second, self.stream_tokens)
+
+    def render(self, app) -> str:
+        """Prometheus text format including component gauges read right now."""
+        lines = []
+        for metric in self.metrics():
+            lines.extend(metric.render())
+        for metric in component_gauges(app):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+def component_gauges(app) -> List[Gauge]:
+    """Snapshot gauges of the upstream pool, cache, admission queue and balancer."""
+    gauges = []
+
+    pool = app['upstream'].stats()
+    connections = Gauge('proxy_upstream_connections', 'Upstream connections in the pool',
+                        ('state',))
+    connections.set('active', value=pool['connections_active'])
+    connections.set('idle', value=pool['connections_idle'])
+    limit = Gauge('proxy_upstream_pool_size', 'Configured upstream connection limit')
+    limit.set(value=pool['pool_size'])
+    upstream_in_flight = Gauge('proxy_upstream_requests_in_flight',
+                               'Requests currently waiting on an upstream')
+    upstream_in_flight.set(value=pool['in_flight'])
+    gauges += [connections, limit, upstream_in_flight]
+
+    outstanding = Gauge('proxy_upstream_outstanding', 'Outstanding requests per upstream',
+                        ('upstream',))
+    healthy = Gauge('proxy_upstream_healthy', '1 if the upstream passes health checks',
+                    ('upstream',))
+    for upstream in app['balancer'].stats():
+        outstanding.set(upstream['url'], value=upstream['outstanding'])
+        healthy.set(upstream['url'], value=int(upstream['healthy'] and upstream['breaker'] != 'open'))
+    gauges += [outstanding, healthy]
+
+    if app['cache'] is not None:
+        cache = app['cache'].stats()
+        lookups = Gauge('proxy_cache_lookups', 'Response cache lookups since start', ('result',))
+        lookups.set('hit', value=cache['hits'])
+        lookups.set('miss', value=cache['misses'])
+        gauges.append(lookups)
+
+    if app['admission'] is not None:
+        admission = app['admission'].stats()
+        queued = Gauge('proxy_admission_queued', 'Requests waiting for admission')
+        queued.set(value=admission['queued'])
+        gauges.append(queued)
+
+    return gauges
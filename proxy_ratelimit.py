@@ -0,0 +1,207 @@
+"""
+Token-bucket admission control for openai_proxy.py.
+
+Every request takes one token from the bucket of its API key and one from the
+bucket of its model before it may go upstream. When a bucket is empty the
+request waits instead of being forwarded and bounced with a 429 by the
+upstream. Each bucket keeps its waiters in FIFO order, so requests of other
+keys sharing a model's bucket are served in arrival order too. A request is
+rejected only when the bounded queue is full or its deadline passes, and then
+with a Retry-After hint.
+"""
+
+import asyncio
+import hashlib
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+QUEUE_SIZE = 256  # waiting requests across all keys and models
+QUEUE_TIMEOUT = 30  # seconds a request may wait for admission
+BURST_SECONDS = 2  # bucket capacity in seconds worth of rate
+PRUNE_INTERVAL = 60  # seconds between sweeps of idle buckets
+
+
+class AdmissionRejected(Exception):
+    """Request could not be admitted; answered with 429 and Retry-After."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at `rate` tokens per second."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1.0, rate * BURST_SECONDS)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.waiters: Deque[asyncio.Event] = deque()  # queued requests, oldest first
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        """Seconds until one token is available, 0 if it is available now."""
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self._refill()
+        self.tokens -= 1
+
+    def idle(self) -> bool:
+        """True if nobody waits and the bucket is full, i.e. like a new one."""
+        self._refill()
+        return not self.waiters and self.tokens >= self.capacity
+
+
+def key_id(authorization: str) -> str:
+    """Stable identifier for an API key that does not keep the key itself."""
+    return hashlib.sha256(authorization.encode('utf-8')).hexdigest()[:16]
+
+
+class AdmissionController:
+    """Per-API-key and per-model token buckets with a bounded waiting queue.
+
+    Args:
+        key_rate: Requests per second allowed per API key, None for unlimited
+        model_rates: Requests per second per model; the '*' entry applies to
+            models without their own entry
+        queue_size: Maximum number of requests waiting at once
+        queue_timeout: Seconds a request may wait before it is rejected
+    """
+
+    def __init__(self, key_rate: Optional[float] = None,
+                 model_rates: Optional[Dict[str, float]] = None,
+                 queue_size: int = QUEUE_SIZE, queue_timeout: float = QUEUE_TIMEOUT):
+        self.key_rate = key_rate
+        self.model_rates = model_rates or {}
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self._key_buckets: Dict[str, TokenBucket] = {}
+        self._model_buckets: Dict[str, TokenBucket] = {}
+        self._pruned_at = time.monotonic()
+
+        self.queued = 0
+        self.peak_queued = 0
+        self.admitted_total = 0
+        self.rejected_total = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _prune(self):
+        """Drop idle buckets so one-off keys and models do not pile up."""
+        for buckets in (self._key_buckets, self._model_buckets):
+            for name in [name for name, bucket in buckets.items() if bucket.idle()]:
+                del buckets[name]
+        self._pruned_at = time.monotonic()
+
+    def _buckets(self, key: str, model: str):
+        if time.monotonic() - self._pruned_at >= PRUNE_INTERVAL:
+            self._prune()
+        buckets = []
+        if self.key_rate:
+            if key not in self._key_buckets:
+                self._key_buckets[key] = TokenBucket(self.key_rate)
+            buckets.append(self._key_buckets[key])
+        rate = self.model_rates.get(model, self.model_rates.get('*'))
+        if model and rate:
+            if model not in self._model_buckets:
+                self._model_buckets[model] = TokenBucket(rate)
+            buckets.append(self._model_buckets[model])
+        return buckets
+
+    async def admit(self, authorization: str, model: str = '') -> float:
+        """Wait until the request may go upstream.
+
+        Returns:
+            Seconds the request spent waiting
+
+        Raises:
+            AdmissionRejected: Queue full or deadline exceeded
+        """
+        key = key_id(authorization)
+        buckets = self._buckets(key, model)
+        if not buckets:
+            return 0.0
+        if not any(bucket.waiters for bucket in buckets) and \
+                all(bucket.wait_time() == 0 for bucket in buckets):
+            for bucket in buckets:
+                bucket.take()
+            self.admitted_total += 1
+            return 0.0
+
+        if self.queued >= self.queue_size:
+            self.rejected_total += 1
+            raise AdmissionRejected("admission queue full",
+                                    max(bucket.wait_time() for bucket in buckets))
+
+        started = time.monotonic()
+        deadline = started + self.queue_timeout
+        self.queued += 1
+        self.peak_queued = max(self.peak_queued, self.queued)
+        # Joining every queue at once keeps them all in arrival order, so the
+        # oldest waiting request is always at the head of each of its queues
+        turn = asyncio.Event()
+        for bucket in buckets:
+            bucket.waiters.append(turn)
+        try:
+            while True:
+                turn.clear()
+                if all(bucket.waiters[0] is turn for bucket in buckets):
+                    wait = max(bucket.wait_time() for bucket in buckets)
+                    if wait == 0:
+                        break
+                    if time.monotonic() + wait > deadline:
+                        raise AdmissionRejected("admission deadline exceeded", wait)
+                    await asyncio.sleep(wait)
+                else:
+                    # Set by a request ahead of this one when it leaves a queue
+                    await asyncio.wait_for(turn.wait(), timeout=deadline - time.monotonic())
+            for bucket in buckets:
+                bucket.take()
+        except asyncio.TimeoutError:
+            self.rejected_total += 1
+            raise AdmissionRejected("admission deadline exceeded", self.queue_timeout)
+        except AdmissionRejected:
+            self.rejected_total += 1
+            raise
+        finally:
+            self.queued -= 1
+            for bucket in buckets:
+                bucket.waiters.remove(turn)
+                if bucket.waiters:
+                    bucket.waiters[0].set()
+
+        waited = time.monotonic() - started
+        self.admitted_total += 1
+        self.wait_seconds_total += waited
+        self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        return waited
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            'queued': self.queued,
+            'peak_queued': self.peak_queued,
+            'queue_size': self.queue_size,
+            'admitted_total': self.admitted_total,
+            'rejected_total': self.rejected_total,
+            'wait_seconds_total': round(self.wait_seconds_total, 3),
+            'wait_seconds_max': round(self.wait_seconds_max, 3),
+        }
+
+
+def parse_model_rates(values) -> Dict[str, float]:
+    """Turn ['2', 'gpt-4o=0.5'] into {'*': 2.0, 'gpt-4o': 0.5}."""
+    rates = {}
+    for value in values or []:
+        model, _, rate = value.rpartition('=')
+        rates[model or '*'] = float(rate)
+    return rates
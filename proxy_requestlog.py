@@ -0,0 +1,146 @@
+"""
+Structured request log for openai_proxy.py.
+
+Every proxied request becomes one JSON line (timestamp, model, token counts,
+latency breakdown, status, cache result). The request path only puts the
+record on an in-memory queue; a background thread batches the lines, appends
+them to the log file, rotates it by size and optionally compresses rotated
+files with zstd (`pip install zstandard`). When the queue is full, records are
+dropped and counted instead of ever blocking a request.
+
+With `openai_proxy.py --log-bodies` the JSON request body is stored too,
+which makes the log a replayable traffic trace.
+"""
+
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from typing import Dict, Optional
+
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = 'requests.jsonl'
+QUEUE_SIZE = 10000  # records buffered before new ones are dropped
+BATCH_SIZE = 256  # records written per file append
+FLUSH_INTERVAL = 1.0  # seconds a record may wait for its batch
+MAX_BYTES = 100 * 1024 * 1024  # rotate the log beyond this size
+BACKUP_COUNT = 5  # rotated files kept
+
+USAGE_PATTERN = re.compile(rb'"usage"\s*:\s*(\{[^{}]*\})')
+
+
+def extract_usage(tail: bytes) -> Optional[Dict[str, int]]:
+    """Find the last OpenAI `usage` object in the end of a response body."""
+    matches = USAGE_PATTERN.findall(tail)
+    for match in reversed(matches):
+        try:
+            usage = json.loads(match)
+        except ValueError:
+            continue
+        if isinstance(usage, dict):
+            return usage
+    return None
+
+
+class RequestLogWriter:
+    """Background JSONL writer with batching and size-based rotation.
+
+    Args:
+        path: Log file to append to
+        max_bytes: Size that triggers a rotation, 0 to never rotate
+        backup_count: Rotated files kept as path.1 ... path.N
+        compress: Compress rotated files with zstd
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH, max_bytes: int = MAX_BYTES,
+                 backup_count: int = BACKUP_COUNT, compress: bool = False):
+        if compress and not HAS_ZSTD:
+            raise RuntimeError("zstd compression needs: pip install zstandard")
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.compress = compress
+        self.written = 0
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[dict]]" = queue.Queue(maxsize=QUEUE_SIZE)
+        self._thread = threading.Thread(target=self._run, name='request-log', daemon=True)
+        self._thread.start()
+
+    def log(self, record: dict):
+        """Queue a record; never blocks."""
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout: float = 5):
+        """Write everything still queued and stop the writer thread."""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            try:
+                record = self._queue.get(timeout=FLUSH_INTERVAL)
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + FLUSH_INTERVAL
+            while record is not None:
+                batch.append(record)
+                if len(batch) >= BATCH_SIZE:
+                    break
+                try:
+                    record = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if record is None:
+                stopping = True
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch):
+        lines = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in batch)
+        try:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(lines)
+                size = f.tell()
+            self.written += len(batch)
+            if self.max_bytes and size >= self.max_bytes:
+                self._rotate()
+        except Exception as e:
+            logger.warning(f"Failed to write request log: {e}")
+
+    def _rotated_name(self, index: int) -> str:
+        return f"{self.path}.{index}" + ('.zst' if self.compress else '')
+
+    def _rotate(self):
+        """path -> path.1(.zst), path.1 -> path.2, ... dropping the oldest."""
+        oldest = self._rotated_name(self.backup_count)
+        if os.path.exists(oldest):
+            os.remove(oldest)
+        for index in range(self.backup_count - 1, 0, -1):
+            if os.path.exists(self._rotated_name(index)):
+                os.replace(self._rotated_name(index), self._rotated_name(index + 1))
+
+        if self.compress:
+            with open(self.path, 'rb') as src, open(self._rotated_name(1), 'wb') as dst:
+                zstandard.ZstdCompressor().copy_stream(src, dst)
+            os.remove(self.path)
+        else:
+            os.replace(self.path, self._rotated_name(1))
+
+    def stats(self) -> Dict[str, int]:
+        return {'written': self.written, 'dropped': self.dropped,
+                'queued': self._queue.qsize()}
@@ -0,0 +1,152 @@
+"""
+Single-flight request coalescing for openai_proxy.py.
+
+When identical requests arrive while one of them is still being answered, only
+the first goes upstream. The upstream response is read by a background task
+into a Flight; every caller subscribes to the flight and receives the same
+status, headers and body chunks, starting from the first chunk even if it
+joined late. Streamed responses therefore fan out to all subscribers as the
+chunks arrive.
+
+Only requests whose answer is the same for every caller are coalesced: GETs
+and deterministic POSTs (see proxy_cache.request_cache_key).
+"""
+
+import asyncio
+import hashlib
+import logging
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import proxy_cache
+
+logger = logging.getLogger(__name__)
+
+
+def flight_key(method: str, path_qs: str, body: bytes, authorization: str = '') -> Optional[str]:
+    """Key for coalescing a request, None if it must go upstream on its own.
+
+    The Authorization header is part of the key so callers with different
+    credentials never share an answer.
+    """
+    auth = hashlib.sha256(authorization.encode('utf-8')).hexdigest()[:16]
+    if method == 'GET':
+        return f"GET {path_qs} {auth}"
+    key = proxy_cache.request_cache_key(method, path_qs.split('?', 1)[0], body)
+    return f"{key} {auth}" if key is not None else None
+
+
+class Flight:
+    """One upstream call shared by every identical concurrent request."""
+
+    def __init__(self):
+        self.status: Optional[int] = None
+        self.reason = ''
+        self.headers: Dict[str, str] = {}
+        self.chunks: List[bytes] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._started = asyncio.Event()
+        self._changed = asyncio.Condition()
+
+    # Producer side, used by the task that reads upstream
+
+    async def start(self, status: int, reason: str, headers: Dict[str, str]):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self._started.set()
+
+    async def feed(self, chunk: bytes):
+        async with self._changed:
+            self.chunks.append(chunk)
+            self._changed.notify_all()
+
+    async def finish(self, error: Optional[BaseException] = None):
+        async with self._changed:
+            self.done = True
+            self.error = error
+            self._started.set()
+            self._changed.notify_all()
+
+    # Consumer side, used by every waiting request
+
+    async def wait_started(self):
+        """Wait for upstream headers; re-raise the upstream error if there were none."""
+        await self._started.wait()
+        if self.status is None:
+            raise self.error or RuntimeError("flight finished without a response")
+
+    async def subscribe(self) -> AsyncIterator[bytes]:
+        """Yield every body chunk from the beginning, then follow new ones."""
+        index = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: index < len(self.chunks) or self.done)
+                pending = self.chunks[index:]
+                finished = self.done
+                error = self.error
+            index += len(pending)
+            for chunk in pending:
+                yield chunk
+            if finished and index >= len(self.chunks):
+                if error is not None:
+                    raise error
+                return
+
+
+class SingleFlight:
+    """Registry of in-flight upstream calls keyed by flight_key()."""
+
+    def __init__(self):
+        self._flights: Dict[str, Flight] = {}
+        self.flights_total = 0
+        self.coalesced_total = 0
+
+    def join(self, key: str, fetch: Callable[[Flight], Awaitable[None]]) -> Tuple[Flight, bool]:
+        """Join the flight for key, starting `fetch(flight)` if there is none.
+
+        Returns:
+            (flight, is_leader) where is_leader is True for the caller that
+            started the upstream call
+        """
+        flight = self._flights.get(key)
+        if flight is not None:
+            flight.subscribers += 1
+            self.coalesced_total += 1
+            return flight, False
+
+        flight = Flight()
+        flight.subscribers = 1
+        self._flights[key] = flight
+        self.flights_total += 1
+        flight.task = asyncio.ensure_future(self._run(key, flight, fetch))
+        return flight, True
+
+    def leave(self, flight: Flight):
+        """Drop a subscriber; the upstream call is cancelled once nobody listens."""
+        flight.subscribers -= 1
+        if flight.subscribers <= 0 and not flight.done and flight.task is not None:
+            flight.task.cancel()
+
+    async def _run(self, key: str, flight: Flight, fetch):
+        try:
+            await fetch(flight)
+            await flight.finish()
+        except asyncio.CancelledError:
+            await flight.finish(ConnectionResetError("all subscribers disconnected"))
+        except Exception as e:
+            logger.debug(f"Coalesced upstream call failed: {e}")
+            await flight.finish(e)
+        finally:
+            # New arrivals after this point start a fresh upstream call
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'in_flight': len(self._flights),
+            'flights_total': self.flights_total,
+            'coalesced_total': self.coalesced_total,
+        }
@@ -0,0 +1,256 @@
+"""
+Shared upstream HTTP client for openai_proxy.py.
+
+One client is created per proxy process and reused by every request, so
+connections to the upstream API stay alive between calls instead of paying a
+TCP+TLS handshake each time.
+
+Two backends are available:
+- aiohttp (default): HTTP/1.1 keep-alive pool with a DNS cache
+- httpx (http2=True): HTTP/2, many requests multiplexed over few connections.
+  Needs `pip install httpx[http2]`.
+
+Both expose the same small interface (`request()` as an async context manager
+yielding an UpstreamResponse) and pool statistics via `stats()`.
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+import aiohttp
+
+try:
+    import httpx
+    HAS_HTTPX = True
+except ImportError:
+    HAS_HTTPX = False
+
+# Pool defaults
+POOL_SIZE = 100  # total connections across all upstream hosts
+POOL_SIZE_PER_HOST = 32  # connections per upstream host (HTTP/1.1)
+KEEPALIVE_TIMEOUT = 60  # seconds an idle connection is kept open
+DNS_CACHE_TTL = 300  # seconds a resolved upstream address is reused
+CONNECT_TIMEOUT = 10  # seconds to establish a connection
+READ_TIMEOUT = 30  # max idle seconds between upstream chunks
+READ_BUFSIZE = 16 * 1024  # read buffer per connection
+
+
+class UpstreamError(Exception):
+    """Base class for upstream failures, independent of the HTTP backend."""
+
+
+class UpstreamTimeout(UpstreamError):
+    """Upstream did not connect or answer in time."""
+
+
+class UpstreamConnectionError(UpstreamError):
+    """Upstream could not be reached or dropped the connection."""
+
+
+class UpstreamResponse:
+    """Backend-neutral view of an upstream response."""
+
+    def __init__(self, url: str, status: int, reason: str, headers,
+                 chunks: AsyncIterator[bytes], close):
+        self.url = url
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self._chunks = chunks
+        self._close = close
+
+    async def iter_chunks(self) -> AsyncIterator[bytes]:
+        """Yield body chunks as they arrive from upstream."""
+        try:
+            async for chunk in self._chunks:
+                yield chunk
+        except (asyncio.TimeoutError, *_timeout_errors()) as e:
+            raise UpstreamTimeout(str(e)) from e
+        except (aiohttp.ClientError, *_connection_errors()) as e:
+            raise UpstreamConnectionError(str(e)) from e
+
+    async def read(self) -> bytes:
+        """Read the whole body."""
+        return b''.join([chunk async for chunk in self.iter_chunks()])
+
+    async def close(self):
+        """Drop the upstream connection without reading the rest of the body."""
+        await self._close()
+
+
+def _timeout_errors():
+    return (httpx.TimeoutException,) if HAS_HTTPX else ()
+
+
+def _connection_errors():
+    return (httpx.TransportError,) if HAS_HTTPX else ()
+
+
+class UpstreamClient:
+    """Pooled keep-alive client shared by all proxy requests.
+
+    Args:
+        pool_size: Maximum number of open connections in total
+        pool_size_per_host: Maximum number of connections per upstream host
+        keepalive_timeout: Seconds an idle connection stays in the pool
+        dns_cache_ttl: Seconds resolved addresses are cached (aiohttp backend)
+        http2: Use the httpx backend and negotiate HTTP/2 with the upstream
+        connect_timeout: Seconds to wait for a connection
+        read_timeout: Max idle seconds between chunks of a response
+    """
+
+    def __init__(self, pool_size: int = POOL_SIZE, pool_size_per_host: int = POOL_SIZE_PER_HOST,
+                 keepalive_timeout: float = KEEPALIVE_TIMEOUT, dns_cache_ttl: int = DNS_CACHE_TTL,
+                 http2: bool = False, connect_timeout: float = CONNECT_TIMEOUT,
+                 read_timeout: float = READ_TIMEOUT):
+        if http2 and not HAS_HTTPX:
+            raise RuntimeError("HTTP/2 upstream needs httpx: pip install 'httpx[http2]'")
+        self.pool_size = pool_size
+        self.pool_size_per_host = pool_size_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.http2 = http2
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._connector: Optional[aiohttp.TCPConnector] = None
+        self._httpx: Optional["httpx.AsyncClient"] = None
+
+        self.requests_total = 0
+        self.errors_total = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.started_at = time.time()
+
+    async def start(self):
+        """Create the connection pool. Call once from inside the event loop."""
+        if self.http2:
+            self._httpx = httpx.AsyncClient(
+                http2=True,
+                limits=httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=self.pool_size_per_host,
+                    keepalive_expiry=self.keepalive_timeout,
+                ),
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout,
+                                      pool=self.connect_timeout),
+                follow_redirects=False,
+            )
+        else:
+            self._connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                limit_per_host=self.pool_size_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=self.dns_cache_ttl,
+                use_dns_cache=True,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=self._connector,
+                timeout=aiohttp.ClientTimeout(
+                    total=None,
+                    connect=self.connect_timeout,
+                    sock_read=self.read_timeout,
+                ),
+                read_bufsize=READ_BUFSIZE,
+                cookie_jar=aiohttp.DummyCookieJar(),
+                auto_decompress=True,
+            )
+
+    async def close(self):
+        """Close all pooled connections."""
+        if self._session is not None:
+            await self._session.close()
+        if self._httpx is not None:
+            await self._httpx.aclose()
+
+    @asynccontextmanager
+    async def request(self, method: str, url: str, headers: Optional[Dict[str, str]] = None,
+                      data: Optional[bytes] = None) -> AsyncIterator[UpstreamResponse]:
+        """Send a request upstream and yield the response with an unread body.
+
+        The connection goes back to the pool when the context exits after the
+        body was consumed; call `response.close()` to drop it early instead.
+
+        Raises:
+            UpstreamTimeout: Connecting or waiting for headers timed out
+            UpstreamConnectionError: The upstream could not be reached
+        """
+        self.requests_total += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            if self._httpx is not None:
+                async with self._httpx_request(method, url, headers, data) as response:
+                    yield response
+            else:
+                async with self._aiohttp_request(method, url, headers, data) as response:
+                    yield response
+        except UpstreamError:
+            self.errors_total += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+    @asynccontextmanager
+    async def _aiohttp_request(self, method, url, headers, data):
+        try:
+            resp = await self._session.request(method, url, headers=headers, data=data,
+                                               allow_redirects=False)
+        except asyncio.TimeoutError as e:
+            raise UpstreamTimeout(str(e)) from e
+        except aiohttp.ClientConnectionError as e:
+            raise UpstreamConnectionError(str(e)) from e
+
+        async def close():
+            resp.close()
+
+        async with resp:
+            yield UpstreamResponse(url, resp.status, resp.reason or '', resp.headers,
+                                   resp.content.iter_any(), close)
+
+    @asynccontextmanager
+    async def _httpx_request(self, method, url, headers, data):
+        req = self._httpx.build_request(method, url, headers=headers, content=data)
+        try:
+            resp = await self._httpx.send(req, stream=True)
+        except httpx.TimeoutException as e:
+            raise UpstreamTimeout(str(e)) from e
+        except httpx.TransportError as e:
+            raise UpstreamConnectionError(str(e)) from e
+
+        try:
+            yield UpstreamResponse(url, resp.status_code, resp.reason_phrase, resp.headers,
+                                   resp.aiter_bytes(), resp.aclose)
+        finally:
+            await resp.aclose()
+
+    def stats(self) -> Dict[str, object]:
+        """Pool statistics for sizing: request counters and connection usage."""
+        stats = {
+            'backend': 'httpx-h2' if self._httpx is not None else 'aiohttp',
+            'pool_size': self.pool_size,
+            'pool_size_per_host': self.pool_size_per_host,
+            'requests_total': self.requests_total,
+            'errors_total': self.errors_total,
+            'in_flight': self.in_flight,
+            'peak_in_flight': self.peak_in_flight,
+            'uptime_seconds': round(time.time() - self.started_at, 1),
+        }
+        stats.update(self._connection_stats())
+        return stats
+
+    def _connection_stats(self) -> Dict[str, int]:
+        # Neither library has a public pool API, so read their internals defensively
+        if self._connector is not None:
+            idle = sum(len(conns) for conns in getattr(self._connector, '_conns', {}).values())
+            active = len(getattr(self._connector, '_acquired', ()))
+            return {'connections_active': active, 'connections_idle': idle}
+        if self._httpx is not None:
+            pool = getattr(self._httpx._transport, '_pool', None)
+            connections = list(getattr(pool, 'connections', []))
+            idle = sum(1 for conn in connections if conn.is_idle())
+            return {'connections_active': len(connections) - idle, 'connections_idle': idle}
+        return {'connections_active': 0, 'connections_idle': 0}
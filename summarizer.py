@@ -1,21 +1,29 @@
 import asyncio
 from ollama import AsyncClient
+from prompt_templates import PromptTemplate
+
+# Static instruction first, the page text last (prefix-cache friendly)
+PROMPTS = {
+    'paragraph': PromptTemplate('summarizer.paragraph',
+                                'Write a one paragraph summary for this article:',
+                                content_header='BEGIN_OF_ARTICLE:\n', suffix='\nEND_OF_ARTICLE.'),
+    'long': PromptTemplate('summarizer.long', 'Write a long summary for this article:',
+                           content_header='BEGIN_OF_ARTICLE:\n', suffix='\nEND_OF_ARTICLE.'),
+    'bullet': PromptTemplate('summarizer.bullet',
+                             'Liste die Top 5 Headlines aus dem gesamten Context dieser News Website:',
+                             content_header='BEGIN_OF_CONTEXT:\n', suffix='\nEND_OF_CONTEXT'),
+}
+
 
 class Summarizer:
     def __init__(self):
         self.client = AsyncClient()
 
     async def summarize(self, user_input: str, summary_type: str = 'bullet'):
-        if summary_type == 'paragraph':
-            message_content = 'Write a one paragraph summary for this article:\n BEGIN_OF_ARTICLE:' + user_input + 'END_OF_ARTICLE.'
-        elif summary_type == 'long':
-            message_content = 'Write a long summary for this article:\n BEGIN_OF_ARTICLE:\n' + user_input + 'END_OF_ARTICLE.'
-        elif summary_type == 'bullet':
-            message_content = 'Liste die Top 5 Headlines aus dem gesamten Context dieser News Website :\n BEGIN_OF_CONTEXT:\n' + user_input + 'END_OF_CONTEXT'
-        else:
-            raise ValueError("Unsupported summary type. Choose 'paragraph' or 'long'.")
-        
-        message = {'role': 'user', 'content': message_content}
+        if summary_type not in PROMPTS:
+            raise ValueError("Unsupported summary type. Choose 'paragraph', 'long' or 'bullet'.")
+
+        message = {'role': 'user', 'content': PROMPTS[summary_type].render(user_input)}
         response_parts = []
         async for part in await self.client.chat(model='dolphin-mistral', messages=[message], stream=True):
             response_parts.append(part['message']['content'])
@@ -0,0 +1,264 @@
+"""
+Cancellation tests: how long does the upstream keep generating after the
+downstream client is gone?
+
+Runs mock_openai_server.py and the async openai_proxy.py in-process on free
+ports, disconnects a streaming client and reads /mock/stats to see when the
+mock noticed the abort. The reported time is client disconnect -> upstream
+stream aborted.
+
+    python test_cancellation.py        # print the timings
+    python -m pytest -q test_cancellation.py
+"""
+
+import asyncio
+import importlib.util
+import os
+import threading
+import time
+
+import aiohttp
+from aiohttp import web
+
+import mock_openai_server
+import openai_proxy
+
+FREE_WITHIN = 1.0  # seconds the upstream may keep generating after a disconnect
+RAGUI_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'RAGUI', 'ragui.py')
+
+
+async def start_site(app):
+    """Serve an app on a free local port; returns (runner, base_url)."""
+    runner = web.AppRunner(app, handler_cancellation=True)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    return runner, f"http://{host}:{port}"
+
+
+async def mock_stats(session, mock_url):
+    async with session.get(f"{mock_url}/mock/stats") as resp:
+        return await resp.json()
+
+
+async def wait_for_abort(session, mock_url, timeout=5.0):
+    """Poll the mock until it counted an aborted stream; returns its stats."""
+    deadline = time.monotonic() + timeout
+    while True:
+        stats = await mock_stats(session, mock_url)
+        if stats['aborted_streams'] or time.monotonic() > deadline:
+            return stats
+        await asyncio.sleep(0.01)
+
+
+def chat_body(temperature=0.7):
+    return {'model': 'mock-chat', 'stream': True, 'temperature': temperature,
+            'messages': [{'role': 'user', 'content': 'Tell me a long story'}]}
+
+
+async def open_stream(session, url, body, first_token):
+    """Start a streamed completion; wait for the first token or just the headers."""
+    resp = await session.post(url, json=body)
+    if first_token:
+        async for line in resp.content:
+            if b'"content": "' in line and b'"content": ""' not in line:
+                break
+    return resp
+
+
+async def measure_proxy_disconnect(first_token=True, coalesce=False, clients=1, leave=None):
+    """Seconds from client disconnect to upstream abort through the proxy.
+
+    Args:
+        first_token: Disconnect while tokens flow; otherwise during the time to first token
+        coalesce: Let the proxy share one upstream call among identical requests
+        clients: Identical concurrent requests to send
+        leave: How many of them disconnect, default all
+
+    Returns:
+        (seconds or None if the upstream was never aborted, mock stats)
+    """
+    mock_args = mock_openai_server.build_parser().parse_args(
+        ['--ttft', '0.05' if first_token else '3', '--tps', '50', '--tokens', '100'])
+    proxy_args = openai_proxy.build_parser().parse_args(
+        ['--no-ssl'] + ([] if coalesce else ['--no-coalesce']))
+    leave = clients if leave is None else leave
+
+    mock_runner, mock_url = await start_site(mock_openai_server.create_app(mock_args))
+    proxy_args.target = mock_url
+    proxy_runner, proxy_url = await start_site(openai_proxy.create_async_app(proxy_args))
+    try:
+        async with aiohttp.ClientSession() as control:
+            body = chat_body(temperature=0 if coalesce else 0.7)
+            sessions = [aiohttp.ClientSession() for _ in range(clients)]
+            try:
+                streams = await asyncio.gather(*(
+                    open_stream(s, f"{proxy_url}/v1/chat/completions", body, first_token)
+                    for s in sessions))
+                if not first_token:
+                    await asyncio.sleep(0.3)  # still "prefilling" upstream
+                closed_at = time.time()
+                for resp in streams[:leave]:
+                    resp.close()  # drops the TCP connection like a closed tab
+                stats = await wait_for_abort(control, mock_url,
+                                             timeout=5.0 if leave == clients else 1.0)
+                for resp in streams[leave:]:
+                    await resp.read()
+                    resp.close()
+                if leave < clients:
+                    stats = await mock_stats(control, mock_url)
+            finally:
+                for s in sessions:
+                    await s.close()
+        if not stats['last_abort_at']:
+            return None, stats
+        return stats['last_abort_at'] - closed_at, stats
+    finally:
+        await proxy_runner.cleanup()
+        await mock_runner.cleanup()
+
+
+async def outstanding_after_early_disconnect():
+    """Upstream outstanding counts after a client leaves before the headers arrive."""
+    mock_args = mock_openai_server.build_parser().parse_args(['--ttft', '3'])
+    proxy_args = openai_proxy.build_parser().parse_args(['--no-ssl', '--no-coalesce'])
+    mock_runner, mock_url = await start_site(mock_openai_server.create_app(mock_args))
+    proxy_args.target = mock_url
+    proxy_app = openai_proxy.create_async_app(proxy_args)
+    proxy_runner, proxy_url = await start_site(proxy_app)
+    try:
+        body = dict(chat_body(), stream=False)
+        async with aiohttp.ClientSession() as session:
+            call = asyncio.ensure_future(
+                session.post(f"{proxy_url}/v1/chat/completions", json=body))
+            await asyncio.sleep(0.3)
+            call.cancel()
+            await asyncio.gather(call, return_exceptions=True)
+        await asyncio.sleep(0.2)  # let the proxy's handler unwind
+        return [upstream.outstanding for upstream in proxy_app['balancer'].upstreams]
+    finally:
+        await proxy_runner.cleanup()
+        await mock_runner.cleanup()
+
+
+def load_ragui():
+    """RAGUI/ragui.py as a module, None without its dependencies (streamlit, faiss)."""
+    try:
+        spec = importlib.util.spec_from_file_location('ragui', RAGUI_PATH)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    except ImportError:
+        return None
+
+
+def measure_ragui_stop(ragui, first_token=True):
+    """Seconds from the RAGUI stop event to the Ollama (mock) stream being aborted."""
+    mock_args = mock_openai_server.build_parser().parse_args(
+        ['--ttft', '0.05' if first_token else '3', '--tps', '50', '--tokens', '100'])
+    loop = asyncio.new_event_loop()
+    runner, mock_url = loop.run_until_complete(
+        start_site(mock_openai_server.create_app(mock_args)))
+    serving = threading.Thread(target=loop.run_forever, daemon=True)
+    serving.start()
+    try:
+        stop_event = threading.Event()
+        stream = ragui.query_ollama_stream(mock_url, 'Tell me a long story', 'mock-chat',
+                                           stop_event)
+        if first_token:
+            next(stream)
+            stopped_at = time.time()
+            stop_event.set()
+            stream.close()
+        else:
+            # The UI thread sits in the blocking read; Stop arrives from elsewhere
+            reader = threading.Thread(target=lambda: list(stream), daemon=True)
+            reader.start()
+            time.sleep(0.3)
+            stopped_at = time.time()
+            stop_event.set()
+            reader.join(5)
+
+        async def poll():
+            async with aiohttp.ClientSession() as session:
+                return await wait_for_abort(session, mock_url)
+
+        stats = asyncio.run_coroutine_threadsafe(poll(), loop).result(10)
+        if not stats['last_abort_at']:
+            return None, stats
+        return stats['last_abort_at'] - stopped_at, stats
+    finally:
+        asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result(10)
+        loop.call_soon_threadsafe(loop.stop)
+        serving.join(5)
+        loop.close()
+
+
+def assert_freed(seconds, stats):
+    assert seconds is not None, f"upstream kept generating: {stats}"
+    assert seconds < FREE_WITHIN, f"upstream freed only after {seconds:.3f}s"
+
+
+def test_proxy_disconnect_while_streaming():
+    assert_freed(*asyncio.run(measure_proxy_disconnect(first_token=True)))
+
+
+def test_proxy_disconnect_before_first_token():
+    assert_freed(*asyncio.run(measure_proxy_disconnect(first_token=False)))
+
+
+def test_proxy_coalesced_all_clients_leave():
+    assert_freed(*asyncio.run(measure_proxy_disconnect(coalesce=True, clients=2)))
+
+
+def test_proxy_coalesced_one_client_stays():
+    seconds, stats = asyncio.run(measure_proxy_disconnect(coalesce=True, clients=2, leave=1))
+    assert seconds is None and stats['completed_streams'] == 1, stats
+
+
+def test_proxy_disconnect_before_headers_releases_upstream():
+    assert asyncio.run(outstanding_after_early_disconnect()) == [0]
+
+
+def test_ragui_stop_while_streaming():
+    ragui = load_ragui()
+    if ragui is None:
+        import pytest
+        pytest.skip("RAGUI needs streamlit and faiss")
+    assert_freed(*measure_ragui_stop(ragui, first_token=True))
+
+
+def test_ragui_stop_before_first_token():
+    ragui = load_ragui()
+    if ragui is None:
+        import pytest
+        pytest.skip("RAGUI needs streamlit and faiss")
+    assert_freed(*measure_ragui_stop(ragui, first_token=False))
+
+
+def main():
+    cases = [
+        ('proxy, disconnect while streaming', lambda: asyncio.run(
+            measure_proxy_disconnect(first_token=True))),
+        ('proxy, disconnect before first token', lambda: asyncio.run(
+            measure_proxy_disconnect(first_token=False))),
+        ('proxy coalesced, both clients leave', lambda: asyncio.run(
+            measure_proxy_disconnect(coalesce=True, clients=2))),
+    ]
+    ragui = load_ragui()
+    if ragui is not None:
+        cases += [
+            ('RAGUI stop while streaming', lambda: measure_ragui_stop(ragui, True)),
+            ('RAGUI stop before first token', lambda: measure_ragui_stop(ragui, False)),
+        ]
+    for name, measure in cases:
+        seconds, _ = measure()
+        shown = f"{seconds * 1000:8.1f} ms" if seconds is not None else "  not freed"
+        print(f"{name:<40} {shown}")
+    if ragui is None:
+        print("RAGUI cases skipped (needs streamlit and faiss)")
+
+
+if __name__ == '__main__':
+    main()
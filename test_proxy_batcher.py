@@ -0,0 +1,103 @@
+"""
+Tests for embedding micro-batching (proxy_batcher.py): which requests share
+a batch, and how a batch response is split back per caller.
+
+    python -m pytest -q test_proxy_batcher.py
+"""
+
+import asyncio
+import json
+
+from proxy_batcher import EmbeddingBatcher, single_input
+
+PATH = '/v1/embeddings'
+
+
+class FakeUpstream:
+    """Embeds every text as [len(text)] and reports usage as one token per char."""
+
+    def __init__(self, status=200):
+        self.status = status
+        self.batches = []
+
+    async def send(self, path, headers, body):
+        data = json.loads(body)
+        self.batches.append((headers.get('Authorization'), data))
+        if self.status != 200:
+            return self.status, {}, b'{"error": "overloaded"}'
+        texts = data['input']
+        chars = sum(len(text) for text in texts)
+        payload = {
+            'object': 'list', 'model': data['model'],
+            # Reversed on purpose: the batcher must order by index
+            'data': [{'index': i, 'embedding': [float(len(text))]}
+                     for i, text in reversed(list(enumerate(texts)))],
+            'usage': {'prompt_tokens': chars, 'total_tokens': chars},
+        }
+        return 200, {'Content-Type': 'application/json'}, json.dumps(payload).encode()
+
+
+def submit_all(requests, **batcher_args):
+    """Submit (authorization, options, text) requests concurrently.
+
+    Returns:
+        (decoded single responses, statuses, upstream batches sent)
+    """
+    async def run():
+        upstream = FakeUpstream(batcher_args.pop('status', 200))
+        batcher = EmbeddingBatcher(upstream.send, **batcher_args)
+        results = await asyncio.gather(*(
+            batcher.submit(PATH, {'Authorization': auth}, dict(options, input=text), text)
+            for auth, options, text in requests))
+        return results, upstream.batches
+
+    results, batches = asyncio.run(run())
+    return [json.loads(body) for _, _, body in results], [status for status, _, _ in results], batches
+
+
+def test_single_input():
+    assert single_input({'input': 'hi'}) == 'hi'
+    assert single_input({'input': ['hi']}) == 'hi'
+    assert single_input({'input': ['a', 'b']}) is None
+    assert single_input({'input': [1, 2]}) is None
+
+
+def test_concurrent_requests_share_one_batch_and_keep_their_vectors():
+    texts = ['a', 'bbb', 'cc']
+    responses, _, batches = submit_all([('Bearer A', {'model': 'e'}, text) for text in texts])
+    assert len(batches) == 1 and batches[0][1]['input'] == texts
+    assert [response['data'] for response in responses] == [
+        [{'index': 0, 'embedding': [float(len(text))]}] for text in texts]
+
+
+def test_batches_split_by_credential_and_options():
+    _, _, batches = submit_all([
+        ('Bearer A', {'model': 'e'}, 'one'),
+        ('Bearer B', {'model': 'e'}, 'two'),
+        ('Bearer A', {'model': 'e', 'dimensions': 8}, 'three'),
+        ('Bearer A', {'model': 'e'}, 'four'),
+    ])
+    grouped = sorted((auth, data.get('dimensions', 0), data['input']) for auth, data in batches)
+    assert grouped == [('Bearer A', 0, ['one', 'four']), ('Bearer A', 8, ['three']),
+                       ('Bearer B', 0, ['two'])]
+
+
+def test_usage_is_split_by_text_length():
+    responses, _, _ = submit_all([('Bearer A', {'model': 'e'}, text)
+                                  for text in ('x' * 30, 'y' * 10)])
+    assert [response['usage'] for response in responses] == [
+        {'prompt_tokens': 30, 'total_tokens': 30}, {'prompt_tokens': 10, 'total_tokens': 10}]
+
+
+def test_batch_size_limit_flushes_early():
+    _, _, batches = submit_all([('Bearer A', {'model': 'e'}, str(i)) for i in range(5)],
+                               max_batch_size=2, max_delay=0.2)
+    assert [len(data['input']) for _, data in batches] == [2, 2, 1]
+
+
+def test_upstream_errors_reach_every_caller():
+    responses, statuses, batches = submit_all(
+        [('Bearer A', {'model': 'e'}, text) for text in ('a', 'b')], status=503)
+    assert len(batches) == 1
+    assert statuses == [503, 503]
+    assert responses == [{'error': 'overloaded'}] * 2
@@ -0,0 +1,101 @@
+"""
+Tests for the deterministic response cache (proxy_cache.py): keys, the
+in-memory tier and the size-capped disk tier with its TTL.
+
+    python -m pytest -q test_proxy_cache.py
+"""
+
+import asyncio
+import json
+import os
+import time
+
+import proxy_cache
+from proxy_cache import CachedResponse, ResponseCache
+
+
+def entry(size=10, stored_at=None):
+    return CachedResponse(200, {'Content-Type': 'application/json'}, b'x' * size, stored_at)
+
+
+def embedding_key(authorization=''):
+    return proxy_cache.request_cache_key('POST', '/v1/embeddings',
+                                         b'{"model": "e", "input": "hi"}', authorization)
+
+
+def test_key_depends_on_credential_not_on_ignored_fields():
+    body = {'model': 'm', 'temperature': 0, 'messages': []}
+    with_user = dict(body, user='someone')
+    key = proxy_cache.request_cache_key('POST', '/v1/chat/completions',
+                                        json.dumps(body).encode(), 'Bearer A')
+    assert key == proxy_cache.request_cache_key('POST', '/v1/chat/completions',
+                                                json.dumps(with_user).encode(), 'Bearer A')
+    assert embedding_key('Bearer A') != embedding_key('Bearer B')
+
+
+def test_sampled_requests_are_not_cached():
+    body = json.dumps({'model': 'm', 'temperature': 0.7, 'messages': []}).encode()
+    assert proxy_cache.request_cache_key('POST', '/v1/chat/completions', body) is None
+    assert proxy_cache.request_cache_key('GET', '/v1/embeddings', b'') is None
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    async def run():
+        cache = ResponseCache(disk_dir=str(tmp_path))
+        cache.put('k', entry())
+        await cache.flush()
+        reopened = ResponseCache(disk_dir=str(tmp_path))
+        return await reopened.get('k'), reopened.stats()
+
+    found, stats = asyncio.run(run())
+    assert found is not None and found.body == b'x' * 10
+    assert stats['hits'] == 1 and stats['disk_entries'] == 1
+
+
+def test_disk_tier_evicts_oldest_over_byte_cap(tmp_path):
+    async def run():
+        cache = ResponseCache(disk_dir=str(tmp_path), disk_max_bytes=25)
+        for i in range(3):
+            cache.put(f'k{i}', entry(stored_at=time.time() + i))
+            await cache.flush()
+        return cache.stats()
+
+    stats = asyncio.run(run())
+    assert stats['disk_entries'] == 2 and stats['disk_bytes'] == 20
+    assert sorted(os.listdir(tmp_path)) == ['k1.body', 'k1.json', 'k2.body', 'k2.json']
+
+
+def test_disk_tier_drops_expired_entries(tmp_path):
+    async def run():
+        cache = ResponseCache(ttl=60, disk_dir=str(tmp_path))
+        cache.put('old', entry(stored_at=time.time() - 120))
+        await cache.flush()
+        fresh_process = ResponseCache(ttl=60, disk_dir=str(tmp_path))
+        return await fresh_process.get('old'), fresh_process.stats()
+
+    found, stats = asyncio.run(run())
+    assert found is None and stats['disk_entries'] == 0 and stats['misses'] == 1
+    assert os.listdir(tmp_path) == []
+
+
+def test_disk_tier_removes_torn_writes(tmp_path):
+    (tmp_path / 'half.body').write_bytes(b'partial')
+    cache = ResponseCache(disk_dir=str(tmp_path))
+    assert cache.stats()['disk_entries'] == 0
+    assert os.listdir(tmp_path) == []
+
+
+def test_memory_tier_is_lru_with_ttl():
+    async def run():
+        cache = ResponseCache(ttl=60, max_entries=2)
+        cache.put('a', entry())
+        cache.put('b', entry())
+        await cache.get('a')  # a is now the most recently used
+        cache.put('c', entry())
+        kept = [await cache.get(key) is not None for key in ('a', 'b', 'c')]
+        cache.put('stale', entry(stored_at=time.time() - 120))
+        return kept, await cache.get('stale')
+
+    kept, stale = asyncio.run(run())
+    assert kept == [True, False, True]
+    assert stale is None
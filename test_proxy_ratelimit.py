@@ -0,0 +1,110 @@
+"""
+Tests for token-bucket admission control (proxy_ratelimit.py): FIFO order on
+shared buckets, queue limits and deadlines, and pruning of idle buckets.
+
+    python -m pytest -q test_proxy_ratelimit.py
+"""
+
+import asyncio
+
+import pytest
+
+import proxy_ratelimit
+from proxy_ratelimit import AdmissionController, AdmissionRejected, TokenBucket
+
+
+def controller(model_rate, burst=1, **kwargs):
+    """Controller whose 'm' model bucket starts with `burst` tokens."""
+    admission = AdmissionController(model_rates={'*': model_rate}, **kwargs)
+    admission._model_buckets['m'] = TokenBucket(model_rate, burst=burst)
+    return admission
+
+
+def test_waiters_are_admitted_in_arrival_order_across_keys():
+    async def run():
+        admission = controller(50)
+        order = []
+
+        async def request(key, name, delay):
+            await asyncio.sleep(delay)
+            await admission.admit(key, 'm')
+            order.append(name)
+
+        await asyncio.gather(*(request('A', f'A{i}', 0) for i in range(3)),
+                             request('B', 'B0', 0.001), request('A', 'A3', 0.002))
+        return order, admission.stats()
+
+    order, stats = asyncio.run(run())
+    assert order == ['A0', 'A1', 'A2', 'B0', 'A3']
+    assert stats['admitted_total'] == 5 and stats['queued'] == 0
+
+
+def test_full_queue_is_rejected_with_retry_after():
+    async def run():
+        admission = controller(1, queue_size=1)
+        await admission.admit('k', 'm')  # takes the only token
+        waiting = asyncio.ensure_future(admission.admit('k', 'm'))
+        await asyncio.sleep(0)
+        try:
+            await admission.admit('k', 'm')
+        finally:
+            waiting.cancel()
+            await asyncio.gather(waiting, return_exceptions=True)
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        asyncio.run(run())
+    assert 'full' in str(rejected.value) and rejected.value.retry_after > 0
+
+
+def test_queue_timeout_rejects_and_leaves_the_queue():
+    async def run():
+        admission = controller(1, queue_timeout=0.2)
+        results = await asyncio.gather(*(admission.admit('k', 'm') for _ in range(3)),
+                                       return_exceptions=True)
+        return results, admission
+
+    results, admission = asyncio.run(run())
+    assert results[0] == 0.0
+    assert all(isinstance(result, AdmissionRejected) for result in results[1:])
+    assert admission.stats()['rejected_total'] == 2
+    assert not admission._model_buckets['m'].waiters
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def run():
+        admission = controller(1)
+        await admission.admit('k', 'm')
+        waiting = asyncio.ensure_future(admission.admit('k', 'm'))
+        await asyncio.sleep(0.05)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        return admission
+
+    admission = asyncio.run(run())
+    assert not admission._model_buckets['m'].waiters
+    assert admission.stats()['queued'] == 0
+
+
+def test_idle_buckets_are_pruned(monkeypatch):
+    monkeypatch.setattr(proxy_ratelimit, 'PRUNE_INTERVAL', 0)
+
+    async def run():
+        admission = AdmissionController(key_rate=1000)
+        for i in range(20):
+            await admission.admit(f'key {i}')
+        await asyncio.sleep(0.01)  # every bucket refills
+        await admission.admit('last key')
+        return admission
+
+    admission = asyncio.run(run())
+    assert len(admission._key_buckets) == 1
+
+
+def test_unlimited_requests_pass_without_buckets():
+    admission = AdmissionController()
+    assert asyncio.run(admission.admit('k', 'm')) == 0.0
+    assert admission.stats()['admitted_total'] == 0
+
+
+def test_parse_model_rates():
+    assert proxy_ratelimit.parse_model_rates(['2', 'gpt-4o=0.5']) == {'*': 2.0, 'gpt-4o': 0.5}
@@ -0,0 +1,111 @@
+"""
+Tests for single-flight request coalescing (proxy_singleflight.py): followers
+receive the leader's whole response, and the upstream call only stops once
+every subscriber has left.
+
+    python -m pytest -q test_proxy_singleflight.py
+"""
+
+import asyncio
+import json
+
+from proxy_singleflight import SingleFlight, flight_key
+
+
+def make_fetch(calls, chunks=(b'a', b'b', b'c'), gap=0.01, cancelled=None):
+    """Upstream stand-in that streams `chunks` into a flight."""
+    async def fetch(flight):
+        calls.append(1)
+        try:
+            await flight.start(200, 'OK', {'Content-Type': 'text/event-stream'})
+            for chunk in chunks:
+                await asyncio.sleep(gap)
+                await flight.feed(chunk)
+        except asyncio.CancelledError:
+            if cancelled is not None:
+                cancelled.set()
+            raise
+    return fetch
+
+
+async def collect(flight):
+    await flight.wait_started()
+    return [chunk async for chunk in flight.subscribe()]
+
+
+def test_flight_key_separates_credentials_and_skips_sampled_requests():
+    body = json.dumps({'model': 'm', 'temperature': 0, 'messages': []}).encode()
+    sampled = json.dumps({'model': 'm', 'temperature': 0.7, 'messages': []}).encode()
+    path = '/v1/chat/completions'
+    assert flight_key('POST', path, body, 'Bearer A') != flight_key('POST', path, body, 'Bearer B')
+    assert flight_key('POST', path, sampled, 'Bearer A') is None
+    assert flight_key('GET', '/v1/models', b'', 'Bearer A') is not None
+
+
+def test_followers_get_the_whole_response():
+    async def run():
+        single, calls = SingleFlight(), []
+        leader, is_leader = single.join('k', make_fetch(calls))
+        await asyncio.sleep(0.015)  # the first chunk has already gone by
+        follower, follower_is_leader = single.join('k', make_fetch(calls))
+        assert follower is leader and is_leader and not follower_is_leader
+        results = await asyncio.gather(collect(leader), collect(follower))
+        single.leave(leader)
+        single.leave(follower)
+        return results, calls, single.stats()
+
+    results, calls, stats = asyncio.run(run())
+    assert results == [[b'a', b'b', b'c']] * 2
+    assert len(calls) == 1
+    assert stats == {'in_flight': 0, 'flights_total': 1, 'coalesced_total': 1}
+
+
+def test_leader_leaving_keeps_the_flight_for_followers():
+    async def run():
+        single, calls, cancelled = SingleFlight(), [], asyncio.Event()
+        flight, _ = single.join('k', make_fetch(calls, cancelled=cancelled))
+        single.join('k', make_fetch(calls))
+        await flight.wait_started()
+        single.leave(flight)  # the leader's client disconnects
+        chunks = await collect(flight)
+        single.leave(flight)
+        return chunks, cancelled.is_set()
+
+    chunks, cancelled = asyncio.run(run())
+    assert chunks == [b'a', b'b', b'c']
+    assert not cancelled
+
+
+def test_upstream_call_is_cancelled_when_everyone_leaves():
+    async def run():
+        single, calls, cancelled = SingleFlight(), [], asyncio.Event()
+        flight, _ = single.join('k', make_fetch(calls, gap=1, cancelled=cancelled))
+        single.join('k', make_fetch(calls))
+        await flight.wait_started()
+        single.leave(flight)
+        single.leave(flight)
+        await asyncio.wait_for(cancelled.wait(), 1)
+        await asyncio.sleep(0)  # let the flight finish
+        try:
+            await collect(flight)
+        except ConnectionResetError:
+            return True, single.stats()['in_flight']
+        return False, single.stats()['in_flight']
+
+    raised, in_flight = asyncio.run(run())
+    assert raised and in_flight == 0
+
+
+def test_new_arrivals_after_completion_start_a_new_flight():
+    async def run():
+        single, calls = SingleFlight(), []
+        first, _ = single.join('k', make_fetch(calls, gap=0))
+        await collect(first)
+        single.leave(first)
+        await asyncio.sleep(0)
+        second, is_leader = single.join('k', make_fetch(calls, gap=0))
+        await collect(second)
+        single.leave(second)
+        return second is not first and is_leader, len(calls)
+
+    assert asyncio.run(run()) == (True, 2)
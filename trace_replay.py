@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Trace replay for OpenAI-compatible endpoints.
+
+Reads a JSONL request trace as written by `openai_proxy.py --request-log
+--log-bodies` (same shape as requests.jsonl) and resends every request
+against any base URL, keeping the original inter-arrival times. --speedup
+compresses the timeline and --concurrency caps requests in flight; requests
+that had to wait for a free slot are reported as late starts.
+
+At the end the recorded and the replayed run are compared: latency, first
+byte, completion tokens and throughput, side by side.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import aiohttp
+
+from latency_stats import percentile
+from proxy_requestlog import extract_usage
+
+LATE_START_THRESHOLD = 0.1  # seconds behind schedule that count as a late start
+TAIL_BYTES = 8 * 1024
+
+
+def load_trace(path: str, limit: Optional[int] = None) -> List[Dict]:
+    """Read trace records sorted by arrival, with `offset` seconds from the first."""
+    records = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if 'ts' not in record or 'path' not in record:
+                continue
+            record['arrival'] = datetime.fromisoformat(record['ts']).timestamp()
+            records.append(record)
+    records.sort(key=lambda r: r['arrival'])
+    if limit:
+        records = records[:limit]
+    if records:
+        first = records[0]['arrival']
+        for record in records:
+            record['offset'] = record['arrival'] - first
+    return records
+
+
+def join_url(base_url: str, path: str) -> str:
+    """Join base and logged path, tolerating a base URL that already ends in /v1."""
+    base_url = base_url.rstrip('/')
+    if base_url.endswith('/v1') and path.startswith('/v1/'):
+        path = path[3:]
+    return base_url + path
+
+
+async def replay_one(session, base_url, record, api_key):
+    """Send one recorded request and measure it like the proxy log does."""
+    result = {'model': record.get('model'), 'ok': False, 'status': None, 'error': None,
+              'first_byte': None, 'total': None, 'completion_tokens': None}
+    headers = {'Authorization': f"Bearer {api_key}"} if api_key else {}
+    body = record.get('request')
+    start = time.perf_counter()
+    try:
+        async with session.request(record.get('method', 'POST'),
+                                   join_url(base_url, record['path']),
+                                   json=body, headers=headers) as resp:
+            result['status'] = resp.status
+            tail = b''
+            events = 0
+            async for chunk in resp.content.iter_any():
+                if result['first_byte'] is None:
+                    result['first_byte'] = time.perf_counter() - start
+                tail = (tail + chunk)[-TAIL_BYTES:]
+                events += chunk.count(b'data:') - chunk.count(b'data: [DONE]')
+            usage = extract_usage(tail) or {}
+            result['completion_tokens'] = usage.get('completion_tokens') or events or None
+            result['ok'] = resp.status < 400
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['total'] = time.perf_counter() - start
+    return result
+
+
+async def replay(records, base_url, api_key=None, speedup=1.0, concurrency=32, timeout=300):
+    """Replay records on their (scaled) original schedule.
+
+    Returns:
+        (results, wall_time, late_starts, max_lag)
+    """
+    slots = asyncio.Semaphore(concurrency)
+    lags = []
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector,
+                                     timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        start = time.perf_counter()
+
+        async def scheduled(record):
+            due = start + record['offset'] / speedup
+            await asyncio.sleep(max(0, due - time.perf_counter()))
+            async with slots:
+                lags.append(time.perf_counter() - due)
+                return await replay_one(session, base_url, record, api_key)
+
+        results = await asyncio.gather(*(scheduled(r) for r in records))
+        wall_time = time.perf_counter() - start
+    late = sum(1 for lag in lags if lag > LATE_START_THRESHOLD)
+    return list(results), wall_time, late, max(lags, default=0.0)
+
+
+def describe(latencies, first_bytes, tokens, requests, duration):
+    def dist(values):
+        return {f"p{p}": percentile(values, p) for p in (50, 95, 99)}
+
+    return {
+        'requests': requests,
+        'duration': duration,
+        'requests_per_second': requests / duration if duration else None,
+        'completion_tokens_per_second': sum(tokens) / duration if duration else None,
+        'latency': dist(latencies),
+        'first_byte': dist(first_bytes),
+    }
+
+
+def compare(records, results, wall_time):
+    """Recorded vs replayed summary and their differences."""
+    recorded_duration = (records[-1]['offset'] + (records[-1].get('latency') or {}).get('total', 0)
+                         if records else 0)
+    # Latencies and tokens come from successful requests on both sides, so the
+    # deltas compare the same population
+    recorded_ok = [r for r in records if (r.get('status') or 0) < 400]
+    recorded = describe(
+        [r['latency']['total'] for r in recorded_ok
+         if r.get('latency', {}).get('total') is not None],
+        [r['latency']['first_byte'] for r in recorded_ok
+         if r.get('latency', {}).get('first_byte') is not None],
+        [r['completion_tokens'] for r in recorded_ok if r.get('completion_tokens')],
+        len(records), recorded_duration)
+    recorded['errors'] = len(records) - len(recorded_ok)
+    ok = [r for r in results if r['ok']]
+    replayed = describe(
+        [r['total'] for r in ok],
+        [r['first_byte'] for r in ok if r['first_byte'] is not None],
+        [r['completion_tokens'] for r in ok if r['completion_tokens']],
+        len(results), wall_time)
+    replayed['errors'] = len(results) - len(ok)
+
+    def delta(a, b):
+        return b - a if a is not None and b is not None else None
+
+    diff = {key: {p: delta(recorded[key][p], replayed[key][p]) for p in recorded[key]}
+            for key in ('latency', 'first_byte')}
+    for key in ('requests_per_second', 'completion_tokens_per_second'):
+        diff[key] = delta(recorded[key], replayed[key])
+    return {'recorded': recorded, 'replayed': replayed, 'delta': diff}
+
+
+def print_comparison(report):
+    def fmt(value, scale=1000, unit='ms', digits=0):
+        return f"{value * scale:10.{digits}f}{unit}" if value is not None else f"{'-':>12}"
+
+    rec, rep, diff = report['recorded'], report['replayed'], report['delta']
+    print(f"{'':<22} {'recorded':>12} {'replayed':>12} {'delta':>12}")
+    for key in ('latency', 'first_byte'):
+        for p in ('p50', 'p95', 'p99'):
+            print(f"{key + ' ' + p:<22} {fmt(rec[key][p])} {fmt(rep[key][p])} {fmt(diff[key][p])}")
+    for key, label in (('requests_per_second', 'req/s'),
+                       ('completion_tokens_per_second', 'tok/s')):
+        print(f"{label:<22} {fmt(rec[key], 1, '  ', 2)} {fmt(rep[key], 1, '  ', 2)} "
+              f"{fmt(diff[key], 1, '  ', 2)}")
+    print(f"\n{rec['requests']} recorded, {rec['errors']} errors; "
+          f"{rep['requests']} replayed, {rep['errors']} errors, "
+          f"{report['skipped']} skipped (no request body), "
+          f"{report['late_starts']} late starts (max lag {report['max_lag']:.2f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay a recorded request trace')
+    parser.add_argument('trace', help='JSONL trace, e.g. requests.jsonl from openai_proxy.py')
+    parser.add_argument('--base-url', required=True, help='OpenAI-compatible base URL')
+    parser.add_argument('--api-key', default=None, help='Bearer token for the target')
+    parser.add_argument('-s', '--speedup', type=float, default=1.0,
+                        help='Replay this many times faster than recorded')
+    parser.add_argument('-c', '--concurrency', type=int, default=32,
+                        help='Maximum requests in flight')
+    parser.add_argument('-n', '--limit', type=int, default=None,
+                        help='Only replay the first N records')
+    parser.add_argument('--json', metavar='PATH', help='Also write the report as JSON here')
+    args = parser.parse_args()
+
+    records = load_trace(args.trace, args.limit)
+    replayable = [r for r in records if r.get('request') is not None or r.get('method') == 'GET']
+    if not replayable:
+        print("No replayable records; record the trace with openai_proxy.py --log-bodies")
+        return 1
+
+    results, wall_time, late, max_lag = asyncio.run(replay(
+        replayable, args.base_url, args.api_key, args.speedup, args.concurrency))
+    report = compare(replayable, results, wall_time)
+    report.update({'skipped': len(records) - len(replayable), 'late_starts': late,
+                   'max_lag': max_lag, 'speedup': args.speedup})
+    print_comparison(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
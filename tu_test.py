@@ -1,6 +1,6 @@
 import argparse
-import os
-import requests
+import json
+from chat_client import ChatError, get_client, run
 from credgoo import get_api_key
 
 # Set your API key
@@ -10,28 +10,31 @@ from credgoo import get_api_key
 API_BASE = "https://aqueduct.ai.datalab.tuwien.ac.at/v1"
 TU_API_KEY = get_api_key("tu")
 
-def list_models():
+# Shared keep-alive client with the common timeout and retry policy
+client = get_client(API_BASE, api_key=TU_API_KEY)
+
+async def list_models():
     """Get available models from /v1/models endpoint"""
-    url = f"{API_BASE}/models"
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {TU_API_KEY}"
-    }
-    response = requests.get(url, headers=headers, timeout=30)
-    return response.json()
-
-def chat_completion(model, message):
+    return await client.list_models()
+
+async def chat_completion(model, message):
     """Send a chat completion request"""
-    url = f"{API_BASE}/chat/completions"
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {TU_API_KEY}"
-    }
-    data = {
-        "model": model,
-        "messages": [{"role": "user", "content": message}]
-    }
-    return requests.post(url, headers=headers, json=data, timeout=30)
+    return await client.complete(model, [{"role": "user", "content": message}])
+
+async def main(args):
+    if args.models:
+        print("Available models:")
+        for model in await list_models():
+            print(f"- {model}")
+    else:
+        try:
+            response = await chat_completion(args.model, args.message)
+        except ChatError as e:
+            print("Status:", e.status)
+            print("Response:", e.body)
+            return
+        print("Status:", 200)
+        print("Response:", json.dumps(response, indent=2, ensure_ascii=False))
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='TU Wien Inference Hub Client')
@@ -42,12 +45,4 @@ if __name__ == "__main__":
                         help='Message to send to the model')
     args = parser.parse_args()
 
-    if args.models:
-        print("Available models:")
-        models = list_models()
-        for model in models.get('data', []):
-            print(f"- {model['id']}")
-    else:
-        response = chat_completion(args.model, args.message)
-        print("Status:", response.status_code)
-        print("Response:", response.text)
\ No newline at end of file
+    run(main(args))
@@ -1,52 +1,54 @@
 import argparse
-from ollama import Client
+from chat_client import ainput, get_client, print_stream, run
+from chat_history import HISTORY_TOKENS, ChatHistory
 
-client = Client(
-    host="https://ollama.molodetz.nl"
-)
+MODEL = 'qwen2.5:3b'
 
-messages = []
+client = get_client("https://ollama.molodetz.nl", api='ollama')
 
+# Old turns are summarized in the background so each request stays under the token budget
+messages = ChatHistory(client, MODEL)
 
-def chat(message):
+
+async def chat(message):
     """
-    Sends a message to the Ollama client and prints the streamed response.
-    Appends user and assistant messages to the global messages list.
+    Sends a message to the Ollama server and prints the streamed response.
+    Adds user and assistant messages to the global, token-bounded history.
     """
     if message:
-        messages.append({'role': 'user', 'content': message})
-    content = ''
-    for response in client.chat(model='qwen2.5:3b', messages=messages, stream=True):
-        content += response.message.content
-        print(response.message.content, end='', flush=True)
-    messages.append({'role': 'assistant', 'content': content})
+        messages.add('user', message)
+    content = await print_stream(client, MODEL, messages.messages())
+    messages.add('assistant', content)
     print("")
 
 
-def main():
+async def main():
     """
     Parses command-line arguments and runs the chat in interactive or test mode.
     """
     parser = argparse.ArgumentParser(description="Ollama chat client with interactive and test modes.")
     parser.add_argument('-i', '--interactive', action='store_true', help='Run in interactive chat mode.')
     parser.add_argument('-t', '--test', type=str, help='Feed a standard test message to the client and return the answer.')
+    parser.add_argument('--history-tokens', type=int, default=HISTORY_TOKENS,
+                        help='Token budget for the history sent per turn; older turns are summarized.')
 
     args = parser.parse_args()
+    messages.budget = args.history_tokens
 
     if args.interactive:
         print("Starting interactive chat. Type 'exit' to quit.")
         while True:
-            user_message = input("You: ")
+            user_message = await ainput("You: ")
             if user_message.lower() == 'exit':
                 break
-            chat(user_message)
+            await chat(user_message)
     elif args.test:
         print(f"Sending test message: {args.test}")
-        chat(args.test)
+        await chat(args.test)
     else:
         print("Please specify either -i for interactive mode or -t for a test message.")
         parser.print_help()
 
 
 if __name__ == "__main__":
-    main()
+    run(main())
@@ -14,6 +14,11 @@ import time
 import logging
 import argparse
 import json
+import queue
+import re
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
 from colorama import Fore, Style, init
 from uniinfer import (
@@ -24,6 +29,15 @@ from uniinfer import (
 )
 from credgoo import get_api_key
 from providers_config import PROVIDER_CONFIGS
+from news_cache import NewsCache
+from near_duplicates import article_text, find_near_duplicates
+
+# Real tokenizer counts for the context packer, chars // 4 without them
+try:
+    from web_agentic.token_counter import get_token_counter
+    HAS_TOKEN_COUNTER = True
+except ImportError:
+    HAS_TOKEN_COUNTER = False
 
 # Initialize colorama
 init(autoreset=True)
@@ -39,10 +53,31 @@ logger = logging.getLogger(__name__)
 API_BASE_URL = "https://amd1.mooo.com/api/duck/news"
 CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')
 CACHE_EXPIRY = 1800  # 30 minutes in seconds
+CACHE_STALE_GRACE = 24 * 3600  # seconds past expiry a result is served while it is refreshed
+NEWS_CACHE_PATH = os.path.join(CACHE_DIR, 'news.sqlite3')
+HEDGE_DELAY = 3.0  # seconds without a first token before hedging, until stats exist
+HEDGE_DELAY_MIN = 0.5
+HEDGE_DELAY_MAX = 15.0
+HEDGE_EWMA_ALPHA = 0.3
+HEDGE_STATS_PATH = os.path.join(CACHE_DIR, 'hedge_stats.json')
+DEFAULT_CONTEXT_WINDOW = 8192  # tokens, for providers without 'context_window'
+CONTEXT_MARGIN = 0.05  # share of the window kept free for tokenizer mismatch and chat template
+MIN_ARTICLE_TOKENS = 48  # body tokens an article keeps before it is dropped instead
+TRIM_MARKER = " [...]"
+SUMMARY_PROMPT_VERSION = 1  # bump when create_summary_prompt or the packing changes
+NEAR_DUPLICATE_THRESHOLD = 0.6  # shingle Jaccard similarity from which articles are duplicates
+FETCH_WORKERS = 16  # concurrent news API requests with several topics
+SUMMARY_WORKERS = 4  # default concurrent summary streams with several topics
 
 # Ensure cache directory exists
 os.makedirs(CACHE_DIR, exist_ok=True)
 
+_news_cache: Optional[NewsCache] = None
+_refreshing: Dict[Tuple[str, int], threading.Thread] = {}
+_refresh_lock = threading.Lock()
+_news_cache_lock = threading.Lock()  # fetch workers may open the cache at once
+_hedge_stats_lock = threading.Lock()  # concurrent topics update the same stats file
+
 
 class ColorHandler:
     """Handles colored text output for the terminal."""
@@ -137,11 +172,14 @@ def get_provider(provider_name: str) -> ChatProvider:
         raise
 
 
-def filter_articles(articles: List[Dict]) -> List[Dict]:
+def filter_articles(articles: List[Dict],
+                    threshold: float = NEAR_DUPLICATE_THRESHOLD) -> List[Dict]:
     """Filter articles to remove duplicates and low-quality content.
 
     Args:
         articles: List of article dictionaries
+        threshold: Word-shingle Jaccard similarity from which an article
+            counts as a (near-)duplicate of an earlier one
 
     Returns:
         List[Dict]: Filtered list of articles
@@ -153,22 +191,9 @@ def filter_articles(articles: List[Dict]) -> List[Dict]:
     articles = [art for art in articles if art.get(
         'body', '').strip() and art.get('title', '').strip()]
 
-    # Remove duplicate articles (based on content similarity)
-    unique_articles = []
-    seen_content = set()
-
-    for article in articles:
-        # Create a simplified version of the content for comparison
-        # Using both title and first part of body for better duplication detection
-        content_hash = hashlib.md5(
-            (article.get('title', '') + article['body'][:100]).lower().encode()
-        ).hexdigest()
-
-        if content_hash not in seen_content:
-            seen_content.add(content_hash)
-            unique_articles.append(article)
-
-    return unique_articles
+    # Remove duplicates, also syndicated copies with another headline or small edits
+    duplicate_of = find_near_duplicates([article_text(art) for art in articles], threshold)
+    return [art for art, original in zip(articles, duplicate_of) if original is None]
 
 
 def create_summary_prompt(topic: str, articles_text: str) -> str:
@@ -191,7 +216,220 @@ def create_summary_prompt(topic: str, articles_text: str) -> str:
     )
 
 
-def summarize_articles(text: str, topic: str, provider_name: str, max_length: int = 1000) -> Generator[str, None, str]:
+def build_summary_request(provider_name: str, prompt: str, max_length: int) -> ChatCompletionRequest:
+    """Streaming request for a provider's default model."""
+    return ChatCompletionRequest(
+        messages=[ChatMessage(role="user", content=prompt)],
+        model=PROVIDER_CONFIGS[provider_name]['default_model'],
+        max_tokens=max_length,
+        streaming=True
+    )
+
+
+def load_hedge_stats() -> Dict[str, Dict[str, Any]]:
+    """Per-provider first-token latency and hedge outcomes from earlier runs."""
+    try:
+        with open(HEDGE_STATS_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logger.warning(f"Failed to load hedge stats: {e}")
+        return {}
+
+
+def hedge_delay_for(provider_name: str) -> float:
+    """Adaptive hedge delay: 1.5x the provider's recent time to first token.
+
+    A primary that keeps losing to its hedge gets a shorter delay, so the hedge
+    starts sooner; without history HEDGE_DELAY is used.
+    """
+    stats = load_hedge_stats().get(provider_name)
+    if not stats or stats.get('ttft') is None:
+        return HEDGE_DELAY
+    delay = 1.5 * stats['ttft']
+    races = stats.get('hedged', 0)
+    if races:
+        delay *= 1 - 0.5 * stats.get('hedge_wins', 0) / races
+    return min(HEDGE_DELAY_MAX, max(HEDGE_DELAY_MIN, delay))
+
+
+def record_hedge_result(primary: str, winner: Optional[str], ttft: Optional[float],
+                        hedged: bool, slow_after: Optional[float] = None):
+    """Update the primary provider's stats with the outcome of one summary."""
+    with _hedge_stats_lock:
+        _record_hedge_result(primary, winner, ttft, hedged, slow_after)
+
+
+def _record_hedge_result(primary, winner, ttft, hedged, slow_after):
+    all_stats = load_hedge_stats()
+    stats = all_stats.setdefault(primary, {'ttft': None, 'runs': 0, 'hedged': 0,
+                                           'hedge_wins': 0, 'wins_by': {}})
+    stats['runs'] += 1
+    if hedged:
+        stats['hedged'] += 1
+        if winner and winner != primary:
+            stats['hedge_wins'] += 1
+    if winner:
+        stats['wins_by'][winner] = stats['wins_by'].get(winner, 0) + 1
+    if winner == primary and ttft is not None:
+        stats['ttft'] = ttft if stats['ttft'] is None else (
+            HEDGE_EWMA_ALPHA * ttft + (1 - HEDGE_EWMA_ALPHA) * stats['ttft'])
+    elif slow_after is not None and winner:
+        # The primary lost the race after timing out, so its first token takes at least that long
+        stats['ttft'] = slow_after if stats['ttft'] is None else max(stats['ttft'], slow_after)
+    try:
+        with open(HEDGE_STATS_PATH, 'w', encoding='utf-8') as f:
+            json.dump(all_stats, f, indent=2)
+    except Exception as e:
+        logger.warning(f"Failed to save hedge stats: {e}")
+
+
+def _abort_stream(stream):
+    """Close the HTTP response a provider stream is blocked on, from another thread.
+
+    uniinfer providers do not expose their response, so it is looked up among
+    the locals of the stream generator and the generators it delegates to.
+    Closing it makes the blocked read fail, which ends the worker thread.
+    Best effort: a stream holding no recognizable response ends at its next
+    chunk or when the provider times out.
+    """
+    while stream is not None:
+        frame = getattr(stream, 'gi_frame', None)
+        if frame is None:
+            return
+        for value in list(frame.f_locals.values()):
+            if isinstance(value, requests.Response) or (
+                    hasattr(value, 'close') and hasattr(value, 'iter_lines')):
+                try:
+                    value.close()
+                except Exception as e:
+                    logger.debug(f"Could not close a stopped stream's response: {e}")
+        stream = getattr(stream, 'gi_yieldfrom', None)
+
+
+def _stream_worker(provider_name: str, request: ChatCompletionRequest,
+                   events: "queue.Queue", stop: threading.Event, streams: Dict[str, Any]):
+    """Push a provider's stream onto `events` until it ends or `stop` is set.
+
+    The stream is published in `streams` so the controller can abort it with
+    _abort_stream() while this thread waits for a chunk.
+    """
+    stream = None
+    try:
+        stream = streams[provider_name] = get_provider(provider_name).stream_complete(request)
+        if stop.is_set():
+            return
+        for chunk in stream:
+            if stop.is_set():
+                break
+            content = chunk.message.content
+            if content:
+                events.put(('chunk', provider_name, content))
+        events.put(('done', provider_name, None))
+    except Exception as e:
+        if not stop.is_set():
+            events.put(('error', provider_name, e))
+    finally:
+        if stream is not None and hasattr(stream, 'close'):
+            # Closing the generator releases the provider's HTTP response
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+
+def hedged_stream(prompt: str, provider_name: str, hedge_provider: str, max_length: int,
+                  delay: Optional[float] = None) -> Generator[str, None, Tuple[str, Optional[str]]]:
+    """Stream from `provider_name`, racing `hedge_provider` if the first token is late.
+
+    The hedge request is only sent when no token arrived within `delay` seconds
+    (or the primary failed first). The first provider to produce a token wins;
+    the other stream is stopped and its HTTP response closed right away, so a
+    stalled loser does not keep its thread and connection (see _abort_stream).
+
+    Yields:
+        String chunks of the winning stream
+
+    Returns:
+        (complete text of the winning stream, winning provider or None)
+    """
+    delay = hedge_delay_for(provider_name) if delay is None else delay
+    events: "queue.Queue" = queue.Queue()
+    stops = {}
+    streams = {}
+
+    def launch(name):
+        stops[name] = threading.Event()
+        threading.Thread(target=_stream_worker, daemon=True, name=f"stream-{name}",
+                         args=(name, build_summary_request(name, prompt, max_length),
+                               events, stops[name], streams)).start()
+
+    def stop(name):
+        stops[name].set()
+        _abort_stream(streams.get(name))
+
+    start = time.time()
+    launch(provider_name)
+    running = {provider_name}
+    hedged = False
+    timed_out = False
+    winner = None
+    ttft = None
+    summary = ""
+
+    try:
+        while running:
+            wait = None
+            if not hedged and winner is None:
+                wait = max(0.0, start + delay - time.time())
+            try:
+                kind, name, payload = events.get(timeout=wait)
+            except queue.Empty:
+                logger.info(f"No first token from {provider_name} after {delay:.1f}s, "
+                            f"hedging with {hedge_provider}")
+                hedged = timed_out = True
+                launch(hedge_provider)
+                running.add(hedge_provider)
+                continue
+
+            if kind == 'chunk':
+                if winner is None:
+                    winner, ttft = name, time.time() - start
+                    for other in running - {name}:
+                        stop(other)
+                    running = {name}
+                    logger.info(f"{winner} won the race after {ttft:.2f}s")
+                if name == winner:
+                    summary += payload
+                    yield payload
+                continue
+
+            if name not in running:
+                continue
+            running.discard(name)
+            if kind == 'error':
+                logger.warning(f"Stream from {name} failed: {payload}")
+                if name == winner:
+                    yield f"\n{ColorHandler.error(f'Error during streaming: {payload}')}"
+                elif not hedged and name == provider_name:
+                    # Primary failed before the delay: hedge right away
+                    hedged = True
+                    launch(hedge_provider)
+                    running.add(hedge_provider)
+                elif not running:
+                    yield ColorHandler.error(f"Summarization failed: {payload}")
+    finally:
+        for name in stops:
+            stop(name)
+        record_hedge_result(provider_name, winner, ttft, hedged,
+                            delay if timed_out else None)
+    return summary, winner
+
+
+def summarize_articles(text: str, topic: str, provider_name: str, max_length: int = 1000,
+                       hedge_provider: Optional[str] = None,
+                       hedge_delay: Optional[float] = None) -> Generator[str, None, Tuple[str, Optional[str]]]:
     """Summarize articles using the specified AI provider.
 
     Args:
@@ -199,28 +437,30 @@ def summarize_articles(text: str, topic: str, provider_name: str, max_length: in
         topic: The news topic
         provider_name: The AI provider to use
         max_length: Maximum summary length in tokens
+        hedge_provider: Second provider raced against a slow first token
+        hedge_delay: Seconds before hedging, adaptive per provider if None
 
     Yields:
         String chunks of the summary as they are generated
 
     Returns:
-        The complete summary
+        (complete summary, provider that wrote it or None); with a hedge
+        that is whichever provider won the race
     """
+    # Create optimized prompt
+    prompt = create_summary_prompt(topic, text)
+
+    if hedge_provider and hedge_provider != provider_name:
+        logger.info(f"Generating summary using {provider_name} (hedge: {hedge_provider})...")
+        return (yield from hedged_stream(prompt, provider_name, hedge_provider,
+                                         max_length, hedge_delay))
+
     try:
         # Get provider with caching
         provider = get_provider(provider_name)
 
-        # Create optimized prompt
-        prompt = create_summary_prompt(topic, text)
-
         # Prepare request
-        messages = [ChatMessage(role="user", content=prompt)]
-        request = ChatCompletionRequest(
-            messages=messages,
-            model=PROVIDER_CONFIGS[provider_name]['default_model'],
-            max_tokens=max_length,
-            streaming=True
-        )
+        request = build_summary_request(provider_name, prompt, max_length)
 
         logger.info(f"Generating summary using {provider_name}...")
         summary = ""
@@ -231,59 +471,158 @@ def summarize_articles(text: str, topic: str, provider_name: str, max_length: in
                 if content:  # Check if content is not empty
                     summary += content
                     yield content
-            return summary
+            return summary, provider_name
         except Exception as e:
             error_msg = f"Error during streaming: {e}"
             logger.error(error_msg)
             # Yield the error message so the user sees it
             yield f"\n{ColorHandler.error(error_msg)}"
-            return summary
+            return summary, provider_name
     except Exception as e:
         error_msg = f"Summarization failed: {e}"
         logger.error(error_msg)
         yield ColorHandler.error(error_msg)
-        return ""
+        return "", None
+
+
+def get_news_cache() -> NewsCache:
+    """The news search cache, opened on first use."""
+    global _news_cache
+    with _news_cache_lock:
+        if _news_cache is None:
+            _news_cache = NewsCache(NEWS_CACHE_PATH)
+        return _news_cache
+
+
+def refresh_news(topic: str, bearer_token: str, max_results: int) -> List[Dict]:
+    """Fetch news from the API and store them in the cache.
+
+    An empty result (also what search_news returns on errors) is not
+    stored, so a cached result is never replaced by nothing.
+    """
+    logger.info(f"Fetching news for topic: {topic}")
+    articles = search_news(topic, bearer_token, max_results=max_results)
+    if articles:
+        try:
+            get_news_cache().put(topic, {'max_results': max_results}, articles)
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to save cache: {e}")
+    return articles
+
+
+def refresh_news_in_background(topic: str, bearer_token: str, max_results: int) -> bool:
+    """Refresh a cached search on a background thread, at most one per search.
+
+    The thread is not a daemon, so a short-lived CLI run still finishes
+    the refresh before the interpreter exits and the next run finds it.
+
+    Returns:
+        bool: True if a refresh was started, False if one is already running
+    """
+    key = (topic, max_results)
+    with _refresh_lock:
+        if key in _refreshing and _refreshing[key].is_alive():
+            return False
+
+        def refresh():
+            try:
+                refresh_news(topic, bearer_token, max_results)
+            except Exception as e:
+                logger.warning(f"Background refresh for '{topic}' failed: {e}")
+            finally:
+                with _refresh_lock:
+                    _refreshing.pop(key, None)
 
+        thread = threading.Thread(target=refresh, name=f"refresh-{topic}")
+        _refreshing[key] = thread
+        thread.start()
+        return True
 
-def get_cached_news(topic: str, bearer_token: str, max_results: int) -> Tuple[List[Dict], bool]:
+
+def pending_refreshes() -> List[str]:
+    """Topics with a background refresh still running."""
+    with _refresh_lock:
+        return [topic for topic, _ in _refreshing]
+
+
+def get_cached_news(topic: str, bearer_token: str, max_results: int,
+                    stale_grace: float = CACHE_STALE_GRACE) -> Tuple[List[Dict], bool]:
     """Get news with caching to avoid redundant API calls.
 
+    Results younger than CACHE_EXPIRY are served as they are. Older results
+    within `stale_grace` seconds after that are served immediately too,
+    while a background thread refreshes them for the next run
+    (stale-while-revalidate). Only a miss or a too old result waits for
+    the news API.
+
     Args:
         topic: News topic to search for
         bearer_token: API authentication token
         max_results: Maximum number of results to return
+        stale_grace: Seconds past CACHE_EXPIRY a result is still served, 0 to always wait
 
     Returns:
         Tuple[List[Dict], bool]: (articles, from_cache) where from_cache indicates if results came from cache
     """
-    # Create a cache key based on the search parameters
-    cache_key = f"{hashlib.md5(f'{topic}_{max_results}'.encode(
-    )).hexdigest()}.cache"
-    cache_path = os.path.join(CACHE_DIR, cache_key)
-
-    # Check if we have a recent cache
-    if os.path.exists(cache_path):
-        cache_time = os.path.getmtime(cache_path)
-        if time.time() - cache_time < CACHE_EXPIRY:
-            try:
-                with open(cache_path, 'r', encoding='utf-8') as f:
-                    return json.load(f), True
-            except Exception as e:
-                logger.warning(f"Failed to load cache: {e}")
-
-    # No valid cache, fetch from API
-    logger.info(f"Fetching news for topic: {topic}")
-    articles = search_news(topic, bearer_token, max_results=max_results)
-
-    # Save to cache
-    if articles:
-        try:
-            with open(cache_path, 'w', encoding='utf-8') as f:
-                json.dump(articles, f)
-        except Exception as e:
-            logger.warning(f"Failed to save cache: {e}")
-
-    return articles, False
+    try:
+        cached = get_news_cache().lookup(topic, {'max_results': max_results})
+    except sqlite3.Error as e:
+        logger.warning(f"Failed to load cache: {e}")
+        cached = None
+
+    if cached is not None:
+        articles, fetched_at = cached
+        age = time.time() - fetched_at
+        if articles and age < CACHE_EXPIRY:
+            return articles, True
+        if articles and age < CACHE_EXPIRY + stale_grace:
+            logger.info(f"Serving {age / 60:.0f} min old news for '{topic}', refreshing")
+            refresh_news_in_background(topic, bearer_token, max_results)
+            return articles, True
+
+    # No usable cache, fetch from API
+    return refresh_news(topic, bearer_token, max_results), False
+
+
+def summary_cache_key(topic: str, articles: List[Dict], provider_name: str, model: str,
+                      max_length: int, context_window: int,
+                      hedge_provider: Optional[str] = None) -> str:
+    """Hash of everything that determines a summary request.
+
+    That is the filtered article set (in order), the topic, provider, model,
+    hedge provider and its model, summary length, the context window the
+    articles were packed into and SUMMARY_PROMPT_VERSION. Which provider won a
+    hedged race is stored with the summary, not part of the key.
+    """
+    hedge = None
+    if hedge_provider and hedge_provider != provider_name:
+        hedge = [hedge_provider, PROVIDER_CONFIGS[hedge_provider]['default_model']]
+    payload = json.dumps({
+        'version': SUMMARY_PROMPT_VERSION,
+        'topic': topic,
+        'provider': provider_name,
+        'model': model,
+        'hedge': hedge,
+        'max_length': max_length,
+        'context_window': context_window,
+        'articles': articles,
+    }, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def format_article(index: int, art: Dict, body: Optional[str] = None) -> str:
+    """Format one article; `body` replaces the article body if given."""
+    article_text = f"Article {index}:\n"
+    if 'title' in art:
+        article_text += f"Title: {art['title']}\n"
+    if 'source' in art:
+        article_text += f"Source: {art['source']}\n"
+    if 'date' in art:
+        article_text += f"Date: {art['date']}\n"
+    if body is None:
+        body = art.get('body', 'No content available')
+    article_text += f"Content: {body}\n\n"
+    return article_text
 
 
 def format_article_text(articles: List[Dict]) -> str:
@@ -295,33 +634,336 @@ def format_article_text(articles: List[Dict]) -> str:
     Returns:
         Formatted text containing all articles
     """
-    combined_text = ""
-    for i, art in enumerate(articles):
-        article_text = f"Article {i+1}:\n"
-        if 'title' in art:
-            article_text += f"Title: {art['title']}\n"
-        if 'source' in art:
-            article_text += f"Source: {art['source']}\n"
-        if 'date' in art:
-            article_text += f"Date: {art['date']}\n"
-        article_text += f"Content: {art.get('body', 'No content available')}\n\n"
-        combined_text += article_text
+    return "".join(format_article(i + 1, art) for i, art in enumerate(articles))
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Token count with the model's tokenizer if available, else chars // 4."""
+    if HAS_TOKEN_COUNTER:
+        return get_token_counter().count(text, model)
+    return len(text) // 4
+
+
+def context_window_for(provider_name: str) -> int:
+    """Context size of a provider's default model in tokens."""
+    config = PROVIDER_CONFIGS.get(provider_name) or {}
+    return config.get('context_window', DEFAULT_CONTEXT_WINDOW)
+
+
+def rank_articles(articles: List[Dict], topic: str) -> List[Dict]:
+    """Order articles by relevance to the topic, most relevant first.
+
+    Topic words in the title count three times as much as in the body; ties
+    keep the search engine's order.
+    """
+    terms = [t for t in re.findall(r'\w+', topic.lower()) if len(t) > 2] or [topic.lower()]
+
+    def score(item):
+        position, art = item
+        title = art.get('title', '').lower()
+        body = art.get('body', '').lower()
+        hits = sum(3 * title.count(t) + min(body.count(t), 10) for t in terms)
+        return (-hits, position)
+
+    return [art for _, art in sorted(enumerate(articles), key=score)]
+
+
+def trim_to_tokens(text: str, max_tokens: int, model: Optional[str] = None) -> str:
+    """Cut text to about `max_tokens` tokens at a sentence or word boundary."""
+    tokens = count_tokens(text, model)
+    if tokens <= max_tokens:
+        return text
+    limit = max(1, int(len(text) * max_tokens / tokens))
+    # Tokens per character vary; shrink until the count fits (usually once)
+    while True:
+        cut = text[:limit]
+        boundary = max(cut.rfind('. '), cut.rfind('\n'))
+        if boundary < limit * 0.7:
+            boundary = cut.rfind(' ')
+        if boundary > limit * 0.5:
+            cut = cut[:boundary + 1]
+        cut = cut.rstrip() + TRIM_MARKER
+        if count_tokens(cut, model) <= max_tokens or limit <= 1:
+            return cut
+        limit = int(limit * 0.9)
+
+
+def pack_articles(articles: List[Dict], topic: str, context_window: int, max_tokens: int,
+                  model: Optional[str] = None) -> Tuple[str, Dict[str, Any]]:
+    """Fit as much article text as possible into the model's context.
+
+    The budget is the context window minus the completion (max_tokens), the
+    prompt instructions and a safety margin. Articles are ranked by relevance;
+    if they do not fit, every body is trimmed by the same proportion, keeping
+    at least MIN_ARTICLE_TOKENS each. Only if even that does not fit are the
+    least relevant articles dropped.
+
+    Args:
+        articles: Filtered articles
+        topic: The news topic, used for ranking
+        context_window: Context size of the target model in tokens
+        max_tokens: Tokens reserved for the summary
+        model: Model name selecting the tokenizer
+
+    Returns:
+        Tuple[str, Dict[str, Any]]: (article text, packing stats)
+    """
+    overhead = count_tokens(create_summary_prompt(topic, ""), model)
+    budget = int(context_window * (1 - CONTEXT_MARGIN)) - max_tokens - overhead
+    ranked = rank_articles(articles, topic)
+
+    headers = [count_tokens(format_article(i + 1, art, body=""), model)
+               for i, art in enumerate(ranked)]
+    bodies = [count_tokens(art.get('body', ''), model) for art in ranked]
+    total = sum(headers) + sum(bodies)
+    stats = {'budget': budget, 'articles': len(ranked), 'dropped': 0, 'trimmed': 0,
+             'original_tokens': total, 'tokens': total, 'ratio': 1.0}
+
+    if total > budget:
+        # Drop from the bottom only while the minimum per article cannot fit
+        while ranked and sum(headers) + sum(min(b, MIN_ARTICLE_TOKENS) for b in bodies) > budget:
+            ranked, headers, bodies = ranked[:-1], headers[:-1], bodies[:-1]
+            stats['dropped'] += 1
+        # Same share of every body; short bodies that stay whole free room for the rest
+        available = budget - sum(headers)
+        ratio = available / sum(bodies) if sum(bodies) else 1.0
+        for _ in range(len(bodies)):
+            floors = [min(b, MIN_ARTICLE_TOKENS) for b in bodies]
+            scaled = [max(f, int(b * ratio)) for b, f in zip(bodies, floors)]
+            excess = sum(scaled) - available
+            if excess <= 0:
+                break
+            flexible = sum(b for b, s, f in zip(bodies, scaled, floors) if s > f)
+            if not flexible:
+                break
+            ratio = max(0.0, ratio - excess / flexible)
+        allowed = [max(min(b, MIN_ARTICLE_TOKENS), int(b * ratio)) for b in bodies]
+        stats['ratio'] = round(ratio, 3)
+    else:
+        allowed = bodies
+
+    parts = []
+    for i, (art, limit, body_tokens) in enumerate(zip(ranked, allowed, bodies)):
+        body = art.get('body', 'No content available')
+        if limit < body_tokens:
+            body = trim_to_tokens(body, limit, model)
+            stats['trimmed'] += 1
+        parts.append(format_article(i + 1, art, body))
+    text = "".join(parts)
+    stats['articles'] = len(ranked)
+    stats['tokens'] = count_tokens(text, model) if stats['trimmed'] or stats['dropped'] else total
+    return text, stats
+
+
+def load_topics(topics: List[str], topics_file: Optional[str]) -> List[str]:
+    """Topics from the command line, then from a file with one topic per line.
+
+    Blank lines and lines starting with '#' in the file are skipped.
+    """
+    topics = [topic.strip() for topic in topics if topic.strip()]
+    if topics_file:
+        with open(topics_file, 'r', encoding='utf-8') as f:
+            topics += [line.strip() for line in f
+                       if line.strip() and not line.lstrip().startswith('#')]
+    return topics
 
-    return combined_text
+
+def fetch_news(topic: str, args, bearer_token: str) -> Tuple[List[Dict], bool]:
+    """Articles for a topic, from the cache unless --no-cache is given."""
+    if args.no_cache:
+        return search_news(topic, bearer_token, max_results=args.num_articles), False
+    return get_cached_news(topic, bearer_token, max_results=args.num_articles,
+                           stale_grace=args.stale_grace)
+
+
+def summarize_topic(topic: str, args, provider_name: str, hedge_provider: Optional[str],
+                    news: Tuple[List[Dict], bool], emit) -> int:
+    """Filter, pack and summarize the articles of one topic.
+
+    Args:
+        topic: News topic
+        args: Parsed command line arguments
+        provider_name: Validated provider for the summary
+        hedge_provider: Validated hedge provider or None
+        news: (articles, from_cache) as returned by fetch_news
+        emit: Called with each piece of output text, newlines included
+
+    Returns:
+        int: Exit code for this topic
+    """
+    articles, from_cache = news
+    if from_cache and topic in pending_refreshes():
+        emit(ColorHandler.meta("Using cached news results, refreshing them in the background") + "\n")
+    elif from_cache:
+        emit(ColorHandler.meta("Using cached news results") + "\n")
+
+    if not articles:
+        emit(ColorHandler.error("No articles found for the topic: " + topic) + "\n")
+        return 1
+
+    # Filter articles to remove duplicates and low-quality content
+    filtered_articles = filter_articles(articles, args.dedup_threshold)
+    if len(filtered_articles) < len(articles):
+        emit(ColorHandler.meta(
+            f"Filtered out {len(articles) - len(filtered_articles)} duplicate or low-quality articles") + "\n")
+
+    if not filtered_articles:
+        emit(ColorHandler.error("No quality articles found after filtering") + "\n")
+        return 1
+
+    articles = filtered_articles
+
+    # Fit the articles into the model's context window
+    model = PROVIDER_CONFIGS[provider_name]['default_model']
+    context_window = args.context_window or context_window_for(provider_name)
+    if hedge_provider and not args.context_window:
+        # The prompt must also fit the hedge provider's model
+        context_window = min(context_window, context_window_for(hedge_provider))
+    combined_text, packing = pack_articles(articles, topic, context_window,
+                                           args.max_length, model)
+    if not packing['articles']:
+        emit(ColorHandler.error(
+            f"No room for articles: context window {context_window} tokens, "
+            f"summary {args.max_length} tokens") + "\n")
+        return 1
+    if packing['trimmed'] or packing['dropped']:
+        emit(ColorHandler.meta(
+            f"Packed {packing['original_tokens']} article tokens into {packing['tokens']} "
+            f"(budget {packing['budget']}): {packing['trimmed']} trimmed, "
+            f"{packing['dropped']} dropped") + "\n")
+
+    # Print summary header
+    emit("\n" + ColorHandler.title("=== News Summary ===") + "\n\n")
+    emit(f"Topic: {ColorHandler.title(topic)}\n")
+    emit(f"Provider: {ColorHandler.meta(provider_name)}@{ColorHandler.meta(model)}\n")
+    emit(f"Articles: {ColorHandler.meta(str(packing['articles']))}\n")
+    emit("\n" + ColorHandler.title("=== Generating Summary ===") + "\n\n")
+
+    # Replay an identical earlier summary instead of generating it again
+    start_time = time.time()
+    cache_key = summary_cache_key(topic, articles, provider_name, model,
+                                  args.max_length, context_window, hedge_provider)
+    cached = None
+    if not args.no_summary_cache:
+        try:
+            cached = get_news_cache().get_summary(cache_key)
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to load cached summary: {e}")
+    if cached is not None:
+        emit(cached['text'])
+        age = (time.time() - cached['created_at']) / 60
+        elapsed = time.time() - start_time
+        written_by = f"{cached['provider']}@{cached['model']}"
+        emit(f"\n\n{ColorHandler.meta(f'Cached summary from {age:.0f} min ago by {written_by}, replayed in {elapsed:.2f} seconds')}\n")
+        return 0
+
+    # Generate summary
+    try:
+        stream = summarize_articles(combined_text, topic, provider_name, args.max_length,
+                                    hedge_provider=hedge_provider,
+                                    hedge_delay=args.hedge_delay)
+        streamed = []
+        while True:
+            try:
+                chunk = next(stream)
+            except StopIteration as done:
+                summary, winner = done.value
+                break
+            emit(chunk)
+            streamed.append(chunk)
+
+        # Errors are yielded as extra text, so only a clean stream equals the summary
+        if summary and ''.join(streamed) == summary:
+            # Keyed by the request; the row records which provider wrote it
+            try:
+                get_news_cache().put_summary(cache_key, topic, winner,
+                                             PROVIDER_CONFIGS[winner]['default_model'], summary)
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to save summary: {e}")
+
+        # Show completion time
+        elapsed = time.time() - start_time
+        emit(f"\n\n{ColorHandler.meta(f'Summary generated in {elapsed:.2f} seconds')}\n")
+        return 0
+
+    except Exception as e:
+        emit(ColorHandler.error(f"\nError during summarization: {e}") + "\n")
+        return 1
+
+
+def summarize_topics(topics: List[str], args, bearer_token: str, provider_name: str,
+                     hedge_provider: Optional[str]) -> int:
+    """Summarize many topics in one process and print them in topic order.
+
+    All news fetches start at once on FETCH_WORKERS threads. Summaries run
+    on at most args.parallel threads, i.e. that many concurrent LLM streams,
+    started in topic order. Every topic writes into its own queue; the main
+    thread prints the queues one after the other, so the topic at the front
+    streams live while later ones are buffered and output never interleaves.
+
+    Returns:
+        int: 0 if every topic was summarized, else 1
+    """
+    outputs = [queue.Queue() for _ in topics]
+    with ThreadPoolExecutor(max_workers=min(len(topics), FETCH_WORKERS)) as fetch_pool, \
+            ThreadPoolExecutor(max_workers=max(1, args.parallel)) as summary_pool:
+        fetches = [fetch_pool.submit(fetch_news, topic, args, bearer_token) for topic in topics]
+
+        def run(index: int) -> int:
+            output = outputs[index]
+            try:
+                return summarize_topic(topics[index], args, provider_name, hedge_provider,
+                                       fetches[index].result(), output.put)
+            except Exception as e:
+                logger.exception(f"Topic '{topics[index]}' failed")
+                output.put(ColorHandler.error(f"Error for topic '{topics[index]}': {e}") + "\n")
+                return 1
+            finally:
+                output.put(None)
+
+        jobs = [summary_pool.submit(run, index) for index in range(len(topics))]
+        for topic, output in zip(topics, outputs):
+            print("\n" + ColorHandler.title(f"##### {topic} #####"))
+            for text in iter(output.get, None):
+                print(text, end="", flush=True)
+        failed = [topic for topic, job in zip(topics, jobs) if job.result() != 0]
+
+    if failed:
+        print(ColorHandler.error(f"\n{len(failed)} of {len(topics)} topics failed: {', '.join(failed)}"))
+        return 1
+    return 0
 
 
 def main():
     """Main function to run the UniDuck application."""
     parser = argparse.ArgumentParser(description='Search and summarize news')
-    parser.add_argument('topic', help='News topic to search and summarize')
+    parser.add_argument('topics', nargs='*', metavar='topic',
+                        help='News topics to search and summarize')
+    parser.add_argument('-f', '--topics-file', type=str, default=None,
+                        help='File with one topic per line (# starts a comment)')
+    parser.add_argument('--parallel', type=int, default=SUMMARY_WORKERS,
+                        help='Concurrent summaries (LLM streams) with several topics')
     parser.add_argument('-n', '--num-articles', type=int, default=5,
                         help='Number of articles to summarize')
     parser.add_argument('-l', '--max-length', type=int, default=1000,
                         help='Maximum summary length in tokens')
+    parser.add_argument('--context-window', type=int, default=None,
+                        help='Context size of the model in tokens (default: from provider config)')
     parser.add_argument('--no-cache', action='store_true',
                         help='Disable caching of API responses')
+    parser.add_argument('--stale-grace', type=float, default=CACHE_STALE_GRACE,
+                        help='Seconds past expiry cached news are still used while they '
+                             'refresh in the background (0: always wait for fresh news)')
+    parser.add_argument('--no-summary-cache', action='store_true',
+                        help='Always generate a new summary instead of replaying a cached one')
+    parser.add_argument('--dedup-threshold', type=float, default=NEAR_DUPLICATE_THRESHOLD,
+                        help='Similarity (0-1) from which articles count as near-duplicates')
     parser.add_argument('-p', '--provider', type=str, default='internlm',
                         help='AI provider to use for summarization')
+    parser.add_argument('--hedge', type=str, default=None, metavar='PROVIDER',
+                        help='Second provider to race when the first token is slow')
+    parser.add_argument('--hedge-delay', type=float, default=None,
+                        help='Seconds before hedging (default: adaptive per provider)')
     parser.add_argument('-v', '--verbose', action='store_true',
                         help='Enable verbose logging')
 
@@ -331,6 +973,13 @@ def main():
     if args.verbose:
         logging.getLogger().setLevel(logging.DEBUG)
 
+    try:
+        topics = load_topics(args.topics, args.topics_file)
+    except OSError as e:
+        parser.error(f"cannot read topics file: {e}")
+    if not topics:
+        parser.error("give at least one topic or --topics-file")
+
     try:
         # Get API token
         bearer_token = get_api_key('amd1')
@@ -338,37 +987,6 @@ def main():
             print(ColorHandler.error("Failed to get API token"))
             return 1
 
-        # Get articles (from cache if available and not disabled)
-        if args.no_cache:
-            articles, from_cache = search_news(args.topic, bearer_token,
-                                               max_results=args.num_articles), False
-        else:
-            articles, from_cache = get_cached_news(args.topic, bearer_token,
-                                                   max_results=args.num_articles)
-
-        if from_cache:
-            print(ColorHandler.meta("Using cached news results"))
-
-        if not articles:
-            print(ColorHandler.error(
-                "No articles found for the topic: " + args.topic))
-            return 1
-
-        # Filter articles to remove duplicates and low-quality content
-        filtered_articles = filter_articles(articles)
-        if len(filtered_articles) < len(articles):
-            print(ColorHandler.meta(
-                f"Filtered out {len(articles) - len(filtered_articles)} duplicate or low-quality articles"))
-
-        if not filtered_articles:
-            print(ColorHandler.error("No quality articles found after filtering"))
-            return 1
-
-        articles = filtered_articles
-
-        # Format the articles for summarization
-        combined_text = format_article_text(articles)
-
         # Validate provider exists in config
         provider_name = args.provider
         if provider_name not in PROVIDER_CONFIGS:
@@ -380,32 +998,21 @@ def main():
             print(ColorHandler.meta(
                 f"Falling back to default provider: {provider_name}"))
 
-        # Print summary header
-        print("\n" + ColorHandler.title("=== News Summary ===") + "\n")
-        print(f"Topic: {ColorHandler.title(args.topic)}")
-        print(
-            f"Provider: {ColorHandler.meta(provider_name)}@{ColorHandler.meta(PROVIDER_CONFIGS[provider_name]['default_model'])}")
-        print(f"Articles: {ColorHandler.meta(str(len(articles)))}")
-        print("\n" + ColorHandler.title("=== Generating Summary ===") + "\n")
-
-        # Generate summary
-        start_time = time.time()
-        summary = ""
+        hedge_provider = args.hedge
+        if hedge_provider and hedge_provider not in PROVIDER_CONFIGS:
+            print(ColorHandler.error(
+                f"Hedge provider '{hedge_provider}' not found in configuration, not hedging"))
+            hedge_provider = None
 
-        try:
-            for chunk in summarize_articles(combined_text, args.topic, provider_name, args.max_length):
-                print(chunk, end="", flush=True)
-                summary += chunk
+        if len(topics) > 1:
+            return summarize_topics(topics, args, bearer_token, provider_name, hedge_provider)
 
-            # Show completion time
-            elapsed = time.time() - start_time
-            print(
-                f"\n\n{ColorHandler.meta(f'Summary generated in {elapsed:.2f} seconds')}")
-            return 0
+        def emit(text):
+            print(text, end="", flush=True)
 
-        except Exception as e:
-            print(ColorHandler.error(f"\nError during summarization: {e}"))
-            return 1
+        topic = topics[0]
+        return summarize_topic(topic, args, provider_name, hedge_provider,
+                               fetch_news(topic, args, bearer_token), emit)
 
     except KeyboardInterrupt:
         print(ColorHandler.meta("\nOperation cancelled by user"))
@@ -9,6 +9,7 @@ import re
 from typing import Dict, List, Any, Optional
 from urllib.parse import unquote
 from credgoo import get_api_key
+from token_counter import count_tokens, get_token_counter
 from uniinfer import (
     ChatMessage,
     ChatCompletionRequest,
@@ -339,12 +340,13 @@ def display_results(formatted_results: List[Dict[str, Any]]) -> None:
         print(f"{item['id']}. {item['title']}\n{item['description']}\n")
 
 
-def get_filestats(filepath: str) -> Dict[str, Any]:
+def get_filestats(filepath: str, model: Optional[str] = None) -> Dict[str, Any]:
     """
     Get file statistics for a given file
 
     Args:
         filepath: Path to the file
+        model: Model whose tokenizer is used for the token count
 
     Returns:
         Dictionary containing file statistics
@@ -356,9 +358,9 @@ def get_filestats(filepath: str) -> Dict[str, Any]:
             stats['crawldate'] = datetime.fromtimestamp(
                 os.path.getmtime(filepath)).strftime('%Y-%m-%d %H:%M:%S')
             with open(filepath, 'r', encoding='utf-8') as f:
-                chars = len(f.read())
-                stats['Chars'] = chars
-                stats['Tokens'] = chars // 4
+                text = f.read()
+                stats['Chars'] = len(text)
+                stats['Tokens'] = count_tokens(text, model)
         else:
             logger.warning(f"File not found: {filepath}")
     except Exception as e:
@@ -391,6 +393,7 @@ def main():
     filepath = os.path.join(os.path.dirname(__file__), filename)
 
 
+    crawled_file = None  # stats are printed once the model is chosen
     # Ask user if they want to skip web crawling
     skip_flow = inquirer.prompt([
         inquirer.Confirm('crawl_flow',
@@ -457,8 +460,7 @@ def main():
                 filename = store_url_content(url, content)
                 logger.info(f"Stored content to {filename}")
 
-        filestats = get_filestats(filename)
-        print(f"File stats: {filestats}")
+        crawled_file = filename
         # Print the first 400 characters of the file
         with open(filename, 'r', encoding='utf-8') as f:
             content = f.read(40)
@@ -475,6 +477,7 @@ def main():
                         default=True)
     ])
     
+    selected_model = None  # default model: token counts use the default tokenizer
     if not skip_flow['model_flow']:
         # Will prompt user to select LLM provider and model
         try:
@@ -507,6 +510,10 @@ def main():
         except ImportError:
             logger.error("Inquirer module not installed, skipping model selection")
 
+    if crawled_file is not None:
+        # Token count with the selected model's tokenizer
+        filestats = get_filestats(crawled_file, selected_model)
+        print(f"File stats: {filestats}")
         
     skip_flow = inquirer.prompt([
         inquirer.Confirm('file_flow',
@@ -516,14 +523,12 @@ def main():
     
     if not skip_flow['file_flow']:        
         # Get list of markdown files in current directory with token counts
-        md_files = []
-        for f in os.listdir(os.path.dirname(__file__)):
-            if f.endswith('.md'):
-                filepath = os.path.join(os.path.dirname(__file__), f)
-                with open(filepath, 'r', encoding='utf-8') as file:
-                    chars = len(file.read())
-                    tokens = chars // 4
-                    md_files.append(f"{f} ({tokens} tokens)")
+        md_dir = os.path.dirname(os.path.abspath(__file__))
+        md_paths = sorted(os.path.join(md_dir, f) for f in os.listdir(md_dir) if f.endswith('.md'))
+        # One batched pass over all files, counted with the selected model's tokenizer
+        token_counts = get_token_counter().count_files(md_paths, model=selected_model)
+        md_files = [f"{os.path.basename(path)} ({token_counts[path]} tokens)"
+                    for path in md_paths if token_counts[path] is not None]
         if not md_files:
             logger.warning("No markdown files found in directory")
             sys.exit(1)